@@ -4,5 +4,10 @@ set -o errexit
 pip install -r requirements.txt
 python manage.py collectstatic --noinput
 python manage.py migrate
+python manage.py createcachetable
 python manage.py seed_roles
-python manage.py seed_market_prices --days 30
\ No newline at end of file
+python manage.py seed_market_prices --days 30
+python manage.py publish_yield_factors --if-empty --note "Initial import from settings"
+# Ships a regression_v1 model in the release (YIELD_MODEL_DIR defaults to var/yield_models)
+python manage.py train_yield_model
+python manage.py warm_recommendations --no-cache
@@ -2,15 +2,23 @@ from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from django.urls import reverse
 from django.conf import settings
+from core import single_flight
 from core.exceptions import APIResponse
 from crops.models import Crop
 from prices.models import MarketPrice
+from regions.models import Region
 from users.models import User
+from yields.engines import engine_status
+from yields.factors import current_factors
+from yields.persistence import persistence_stats
 from django.utils import timezone
 import logging
 
 logger = logging.getLogger(__name__)
 
+STATUS_CACHE_KEY = 'api_status_statistics'
+STATUS_CACHE_TIMEOUT = getattr(settings, 'API_STATUS_CACHE_TIMEOUT', 60)
+
 
 class APIStatusView(APIView):
     """
@@ -20,8 +28,14 @@ class APIStatusView(APIView):
     
     def get(self, request):
         try:
-            # Get basic statistics
-            stats = self._get_statistics()
+            # Get basic statistics; the counts scan whole tables, so one worker
+            # refreshes them while the rest serve the previous figures
+            stats, _ = single_flight.get_or_compute(
+                STATUS_CACHE_KEY,
+                lambda: self._get_statistics() or None,
+                STATUS_CACHE_TIMEOUT,
+            )
+            stats = stats or {}
             
             # Get endpoint information
             endpoints = self._get_endpoints_info()
@@ -42,7 +56,7 @@ class APIStatusView(APIView):
                 'configuration': config,
                 'features': {
                     'authentication': 'JWT',
-                    'pagination': 'Page-based',
+                    'pagination': 'Page-based; keyset via ?cursor= on market prices',
                     'caching': 'Enabled',
                     'rate_limiting': 'Disabled',
                     'api_versioning': 'URL-based'
@@ -68,7 +82,9 @@ class APIStatusView(APIView):
                 'total_users': User.objects.count(),
                 'total_crops': Crop.objects.count(),
                 'total_market_prices': MarketPrice.objects.count(),
-                'active_regions': list(Crop.objects.values_list('regions', flat=True).distinct()),
+                'active_regions': list(
+                    Region.objects.filter(crops__isnull=False).distinct().values_list('name', flat=True)
+                ),
                 'available_seasons': [choice[0] for choice in Crop.Season.choices]
             }
         except Exception as e:
@@ -88,14 +104,23 @@ class APIStatusView(APIView):
             'crops': {
                 'list': '/api/crops/',
                 'detail': '/api/crops/{id}/',
-                'recommendations': '/api/recommendations/'
+                'recommendations': '/api/recommendations/',
+                'recommendations_batch': '/api/recommendations/batch/'
             },
             'market_data': {
                 'prices': '/api/prices/',
-                'price_analytics': '/api/prices/analytics/'
+                'price_analytics': '/api/prices/analytics/',
+                'price_analytics_batch': '/api/prices/analytics/batch/',
+                'price_stats': '/api/prices/stats/',
+                'price_export': '/api/prices/export/',
+                'price_latest': '/api/prices/latest/',
+                'bulk_ingest': '/api/prices/bulk/'
             },
             'forecasting': {
-                'yield_forecast': '/api/yield/forecast/'
+                'yield_forecast': '/api/yield/forecast/',
+                'yield_forecast_batch': '/api/yield/forecast/batch/',
+                'yield_sweep': '/api/yield/sweep/',
+                'yield_supply': '/api/yield/supply/'
             },
             'support': {
                 'tickets': '/api/support/',
@@ -111,6 +136,7 @@ class APIStatusView(APIView):
     
     def _get_configuration_info(self):
         """Get API configuration information"""
+        factors = current_factors()
         return {
             'pagination': {
                 'default_page_size': getattr(settings, 'REST_FRAMEWORK', {}).get('PAGE_SIZE', 10),
@@ -125,8 +151,14 @@ class APIStatusView(APIView):
                 'allow_credentials': getattr(settings, 'CORS_ALLOW_CREDENTIALS', False)
             },
             'yield_forecast': {
-                'supported_crops': list(getattr(settings, 'YIELD_BASE_YIELDS', {}).keys()),
-                'supported_regions': list(getattr(settings, 'YIELD_REGION_MULTIPLIERS', {}).keys()),
-                'supported_seasons': list(getattr(settings, 'YIELD_SEASON_FACTORS', {}).keys())
+                # 0 while the YIELD_* settings defaults are in use
+                'factors_version': factors.version,
+                'supported_crops': list(factors.base_yields),
+                'supported_regions': list(factors.region_multipliers),
+                'supported_seasons': list(factors.season_factors),
+                # Forecast methods and the factors/model version each one uses
+                'methods': engine_status(),
+                # Live write-behind buffer depth and flush counters for this worker
+                'persistence': persistence_stats()
             }
         }
\ No newline at end of file
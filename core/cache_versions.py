@@ -0,0 +1,97 @@
+"""
+Generation-based cache invalidation.
+
+Cached results embed the current generation of every scope they depend on
+(a crop, a region, a crop/region price series) in their key. Writes bump the
+generations of the scopes they touch, which retires exactly the affected
+entries; everything else keeps hitting. Retired entries are never deleted,
+they simply stop being read and age out with their TTL.
+"""
+import time
+from typing import Dict, Iterable, List
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.text import slugify
+
+GENERATION_PREFIX = 'cachegen'
+
+
+def crop_scope(crop_name: str) -> str:
+    return f"crop:{crop_name.lower()}"
+
+
+def region_scope(region: str) -> str:
+    # Same normalization as regions.models.region_key
+    return f"region:{slugify(region)}"
+
+
+def series_scope(crop_name: str, region: str) -> str:
+    return f"series:{crop_name.lower()}:{region.lower()}"
+
+
+def _generation_key(scope: str) -> str:
+    return f"{GENERATION_PREFIX}:{scope}"
+
+
+def _seed() -> int:
+    # A lost generation restarts from the clock rather than 0, so it can never
+    # line up again with entries cached before it was lost.
+    return time.time_ns() // 1000
+
+
+def get_generations(scopes: Iterable[str]) -> Dict[str, int]:
+    """Current generation of each scope, fetched with one ``get_many``."""
+    scopes = list(dict.fromkeys(scopes))
+    found = cache.get_many([_generation_key(s) for s in scopes])
+    generations = {}
+    for scope in scopes:
+        key = _generation_key(scope)
+        if key not in found:
+            cache.add(key, _seed(), None)
+            found[key] = cache.get(key)
+        generations[scope] = found[key]
+    return generations
+
+
+def versioned_key(base: str, scopes: List[str], generations: Dict[str, int] = None) -> str:
+    """
+    ``base`` suffixed with the generations of ``scopes``. Pass ``generations``
+    from :func:`get_generations` to build many keys from one lookup.
+    """
+    if generations is None:
+        generations = get_generations(scopes)
+    return f"{base}_v{'.'.join(str(generations[s]) for s in scopes)}"
+
+
+def stale_key(base: str) -> str:
+    """
+    Key outside every generation, for keeping the last value built under
+    ``base`` to serve while its replacement is computed (see core.single_flight).
+    """
+    return f"{base}_stale"
+
+
+def bump(scopes: Iterable[str]) -> None:
+    """Retire every cache entry built on any of ``scopes``."""
+    for scope in set(scopes):
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+            # Backends without a native incr (the database cache) store the
+            # new value with the default timeout; generations never expire
+            cache.touch(key, None)
+        except ValueError:
+            cache.add(key, _seed(), None)
+
+
+def bump_on_commit(scopes: Iterable[str]) -> None:
+    """
+    Bump now, so reads inside the writing transaction see fresh results, and
+    again once it commits, so anything another reader cached from pre-commit
+    data in between is retired too.
+    """
+    scopes = set(scopes)
+    if scopes:
+        bump(scopes)
+        transaction.on_commit(lambda: bump(scopes))
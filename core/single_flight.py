@@ -0,0 +1,121 @@
+"""
+Single-flight cache reads with stale-while-revalidate.
+
+:func:`get_or_compute` puts an expensive computation behind a cache entry
+so that a burst of misses on one key costs one computation:
+
+- The value is cached for ``timeout + stale_ttl``. A small sidecar entry
+  records when it goes stale (after ``timeout``) and how long it took to
+  compute. Values written by plain ``cache.set`` calls stay readable and
+  count as fresh.
+- One caller refreshes a stale or missing value while holding a lock taken
+  with ``cache.add``. Everyone else serves the stale value meanwhile. With
+  nothing to serve, they wait briefly for the lock holder's result.
+- Before a value goes stale, callers refresh it early with a probability
+  that grows as staleness nears and with the compute time ("XFetch"). Busy
+  keys are therefore usually refreshed before anyone sees them go stale.
+- ``stale_key`` names a fallback copy outside the key's cache generation.
+  A result retired by a generation bump can still be served while its
+  replacement is computed.
+
+The lock is only as wide as the cache. With a backend shared by all workers
+and an atomic ``add`` (Redis, Memcached, or the database cache, whose
+``add`` is an insert on a unique key), one caller across all processes
+recomputes. With the default local-memory cache, each process takes its own
+lock. Threads in a process are then coalesced, but every worker process
+still recomputes once. See ``CACHE_URL`` in the settings.
+"""
+import math
+import random
+import time
+from typing import Any, Callable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+HIT = 'hit'
+STALE = 'stale'
+MISS = 'miss'
+
+POLL_INTERVAL = 0.05
+
+
+def _meta_key(key: str) -> str:
+    return f"{key}:sf"
+
+
+def _lock_key(key: str) -> str:
+    return f"{key}:sf-lock"
+
+
+def _refresh_due(meta, now: float, beta: float) -> bool:
+    if meta is None:
+        return False
+    stale_at, delta = meta
+    # XFetch: -log(U) is exponential, so early refreshes are rare far from
+    # the deadline and near certain just before it
+    return now - delta * beta * math.log(1.0 - random.random()) >= stale_at
+
+
+def _store(key: str, value, delta: float, timeout: int, stale_ttl: int, stale_key: Optional[str]) -> None:
+    entries = {key: value}
+    if stale_key:
+        entries[stale_key] = value
+    cache.set_many(entries, timeout + stale_ttl)
+    cache.set(_meta_key(key), (time.time() + timeout, delta), timeout + stale_ttl)
+
+
+def _compute_and_store(key, compute, timeout, stale_ttl, stale_key):
+    started = time.monotonic()
+    value = compute()
+    if value is not None:
+        _store(key, value, time.monotonic() - started, timeout, stale_ttl, stale_key)
+    return value
+
+
+def get_or_compute(key: str, compute: Callable[[], Any], timeout: int, *,
+                   stale_key: Optional[str] = None, stale_ttl: Optional[int] = None,
+                   lock_timeout: Optional[float] = None, wait: Optional[float] = None,
+                   beta: float = 1.0) -> Tuple[Any, str]:
+    """
+    The cached value of ``key``, computing it with ``compute()`` when needed.
+    Returns ``(value, state)`` with state :data:`HIT`, :data:`STALE` or
+    :data:`MISS`. A ``None`` result is returned but not cached.
+    """
+    if stale_ttl is None:
+        stale_ttl = getattr(settings, 'SINGLE_FLIGHT_STALE_TTL', 300)
+    if lock_timeout is None:
+        lock_timeout = getattr(settings, 'SINGLE_FLIGHT_LOCK_TIMEOUT', 30)
+    if wait is None:
+        wait = getattr(settings, 'SINGLE_FLIGHT_WAIT', 5)
+
+    found = cache.get_many([key, _meta_key(key)])
+    value = found.get(key)
+    if value is not None and not _refresh_due(found.get(_meta_key(key)), time.time(), beta):
+        return value, HIT
+
+    lock = _lock_key(key)
+    if cache.add(lock, 1, lock_timeout):
+        try:
+            return _compute_and_store(key, compute, timeout, stale_ttl, stale_key), MISS
+        finally:
+            cache.delete(lock)
+
+    # Someone else is refreshing: serve what there is
+    if value is not None:
+        return value, STALE
+    if stale_key:
+        stale = cache.get(stale_key)
+        if stale is not None:
+            return stale, STALE
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value, HIT
+        if cache.get(lock) is None:
+            break
+    # The holder produced nothing cacheable, failed or is too slow
+    return _compute_and_store(key, compute, timeout, stale_ttl, stale_key), MISS
@@ -1,3 +1,76 @@
+import threading
+import time
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from core import single_flight
+
+
+class SingleFlightTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='fresh', delay=0.0):
+        def run():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+        return run
+
+    def test_miss_then_hit(self):
+        self.assertEqual(single_flight.get_or_compute('k', self.compute(), 60), ('fresh', single_flight.MISS))
+        self.assertEqual(single_flight.get_or_compute('k', self.compute(), 60), ('fresh', single_flight.HIT))
+        self.assertEqual(self.calls, 1)
+
+        # Values written without single-flight metadata count as fresh
+        cache.set('plain', 'value', 60)
+        self.assertEqual(single_flight.get_or_compute('plain', self.compute(), 60), ('value', single_flight.HIT))
+        self.assertEqual(self.calls, 1)
+
+    def test_none_is_not_cached(self):
+        self.assertEqual(single_flight.get_or_compute('k', self.compute(None), 60), (None, single_flight.MISS))
+        single_flight.get_or_compute('k', self.compute(None), 60)
+        self.assertEqual(self.calls, 2)
+
+    def test_stale_value_served_while_another_worker_refreshes(self):
+        single_flight.get_or_compute('k', self.compute('old'), 60, stale_key='k_stale')
+        cache.set('k:sf', (time.time() - 1, 0.0), 60)
+
+        cache.add('k:sf-lock', 1, 30)
+        self.assertEqual(single_flight.get_or_compute('k', self.compute('new'), 60), ('old', single_flight.STALE))
+        # A retired (e.g. re-versioned) key falls back to the stale copy
+        cache.add('k2:sf-lock', 1, 30)
+        self.assertEqual(
+            single_flight.get_or_compute('k2', self.compute('new'), 60, stale_key='k_stale'),
+            ('old', single_flight.STALE),
+        )
+        self.assertEqual(self.calls, 1)
+
+        cache.delete('k:sf-lock')
+        self.assertEqual(single_flight.get_or_compute('k', self.compute('new'), 60), ('new', single_flight.MISS))
+
+    def test_early_refresh_before_expiry(self):
+        single_flight.get_or_compute('k', self.compute('old'), 60)
+        # 10s of compute time against 1s left: XFetch refreshes early
+        cache.set('k:sf', (time.time() + 1, 10.0), 60)
+        self.assertEqual(
+            single_flight.get_or_compute('k', self.compute('new'), 60, beta=1e6),
+            ('new', single_flight.MISS),
+        )
+        self.assertEqual(single_flight.get_or_compute('k', self.compute('newer'), 60, beta=0.0)[0], 'new')
+
+    def test_concurrent_misses_compute_once(self):
+        results = []
+
+        def request():
+            results.append(single_flight.get_or_compute('k', self.compute('value', delay=0.2), 60)[0])
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(self.calls, 1)
@@ -0,0 +1,130 @@
+"""
+Per-process, read-only index of the crop catalog.
+
+The catalog is small and changes rarely, so each worker keeps every crop as
+a compact tuple plus inverted maps (region, season and soil type to crop
+ids) and answers candidate lookups with set intersections. Crop and region
+writes bump a shared cache generation; a worker rebuilds its index the next
+time it sees a new generation. The hot path costs one cache read and no
+database query.
+"""
+import threading
+from collections import defaultdict
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+from core.cache_versions import get_generations
+from regions.models import RegionAlias, region_key
+from regions.resolver import resolve_region_slug
+from .models import Crop
+
+CATALOG_SCOPE = 'crop_catalog'
+
+
+class CropEntry(NamedTuple):
+    """The crop fields recommendations need; attribute-compatible with :class:`Crop` for scoring."""
+    id: int
+    name: str
+    season: str
+    soil_type: str
+    regions: Tuple[str, ...]
+    maturity_days: int
+    recommended_inputs: dict
+
+
+class CropIndex:
+    def __init__(self, generation, crops, aliases: Dict[str, str]):
+        self.generation = generation
+        self.aliases = aliases
+        self.crops: Dict[int, CropEntry] = {}
+        by_region, by_season, by_soil = defaultdict(set), defaultdict(set), defaultdict(set)
+        for crop in crops:
+            self.crops[crop.id] = crop
+            for region in crop.regions:
+                by_region[self.region_slug(region)].add(crop.id)
+            by_season[crop.season].add(crop.id)
+            by_soil[crop.soil_type.lower()].add(crop.id)
+        self.all_ids = frozenset(self.crops)
+        self.by_region: Dict[str, FrozenSet[int]] = {k: frozenset(v) for k, v in by_region.items()}
+        self.by_season: Dict[str, FrozenSet[int]] = {k: frozenset(v) for k, v in by_season.items()}
+        self.by_soil: Dict[str, FrozenSet[int]] = {k: frozenset(v) for k, v in by_soil.items()}
+
+    def __len__(self) -> int:
+        return len(self.crops)
+
+    def region_slug(self, name: str) -> str:
+        key = region_key(name)
+        return self.aliases.get(key, key)
+
+    @classmethod
+    def build(cls, generation=None) -> 'CropIndex':
+        rows = Crop.objects.order_by('id').values_list(
+            'id', 'name', 'season', 'soil_type', 'regions', 'maturity_days', 'recommended_inputs'
+        )
+        crops = [
+            CropEntry(
+                id=pk,
+                name=name,
+                season=season,
+                soil_type=soil_type or '',
+                regions=tuple(r for r in regions if isinstance(r, str)) if isinstance(regions, list) else (),
+                maturity_days=maturity_days,
+                recommended_inputs=recommended_inputs or {},
+            )
+            for pk, name, season, soil_type, regions, maturity_days, recommended_inputs in rows
+        ]
+        aliases = dict(RegionAlias.objects.values_list('key', 'region__slug'))
+        return cls(generation, crops, aliases)
+
+    def candidate_ids(self, region: Optional[str] = None, season: Optional[str] = None,
+                      soil_type: Optional[str] = None) -> FrozenSet[int]:
+        """Ids of crops grown in ``region`` that match ``season`` and ``soil_type`` (case-insensitive) when given."""
+        ids = self.all_ids
+        if region is not None:
+            ids = ids & self.by_region.get(self.region_slug(region), frozenset())
+        if season:
+            ids = ids & self.by_season.get(season, frozenset())
+        if soil_type:
+            ids = ids & self.by_soil.get(soil_type.lower(), frozenset())
+        return ids
+
+    def candidates(self, region: Optional[str] = None, season: Optional[str] = None,
+                   soil_type: Optional[str] = None):
+        # Name order, like the Crop queryset, so equal scores keep a stable order
+        return sorted((self.crops[pk] for pk in self.candidate_ids(region, season, soil_type)), key=lambda c: c.name)
+
+
+_index: Optional[CropIndex] = None
+_lock = threading.Lock()
+
+
+def current_crop_index() -> Optional[CropIndex]:
+    """This process's index if it is up to date, without building one."""
+    index = _index
+    if index is not None and index.generation == get_generations([CATALOG_SCOPE])[CATALOG_SCOPE]:
+        return index
+    return None
+
+
+def canonical_region_slug(name: str) -> str:
+    """
+    Canonical region slug for ``name``, which may be an alias. Uses this
+    process's index when it is current, the database otherwise. Unknown
+    names keep their own key.
+    """
+    index = current_crop_index()
+    if index is not None:
+        return index.region_slug(name)
+    return resolve_region_slug(name) or region_key(name)
+
+
+def get_crop_index() -> CropIndex:
+    """This process's index, rebuilt first if the catalog generation moved on."""
+    global _index
+    generation = get_generations([CATALOG_SCOPE])[CATALOG_SCOPE]
+    index = _index
+    if index is None or index.generation != generation:
+        with _lock:
+            index = _index
+            if index is None or index.generation != generation:
+                index = _index = CropIndex.build(generation)
+    return index
@@ -0,0 +1,19 @@
+# Generated by Django 5.0 on 2026-10-17 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crops', '0002_alter_crop_recommended_inputs'),
+        ('regions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crop',
+            name='canonical_regions',
+            field=models.ManyToManyField(blank=True, help_text='Canonical regions matching the names in regions; kept in sync on save', related_name='crops', to='regions.region'),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from django.db import models as dj_models  # alias to avoid confusion
 
+from regions.resolver import ensure_region_ids
+
 
 class Season(models.TextChoices):
     MAJOR = 'major', _('Major Season')
@@ -39,6 +41,13 @@ class Crop(models.Model):
         help_text=_("List of regions where this crop is commonly grown (array of strings)")
     )
     
+    canonical_regions = models.ManyToManyField(
+        'regions.Region',
+        blank=True,
+        related_name='crops',
+        help_text=_("Canonical regions matching the names in regions; kept in sync on save")
+    )
+
     recommended_inputs = models.JSONField(
         default=dict,
         blank=True,
@@ -75,3 +84,9 @@ class Crop(models.Model):
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
+        self.sync_canonical_regions()
+
+    def sync_canonical_regions(self):
+        """Point ``canonical_regions`` at the regions named in ``regions``, creating new ones."""
+        names = [r for r in self.regions if isinstance(r, str)] if isinstance(self.regions, list) else []
+        self.canonical_regions.set(ensure_region_ids(names).values())
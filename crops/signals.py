@@ -0,0 +1,63 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.cache_versions import bump_on_commit, crop_scope, region_scope
+from regions.models import Region, RegionAlias, region_key
+from regions.resolver import resolve_region_slugs
+from .index import CATALOG_SCOPE
+from .models import Crop
+
+
+def _scopes(name, regions):
+    scopes = {CATALOG_SCOPE, crop_scope(name)}
+    if isinstance(regions, list):
+        # Readers key entries by canonical region slug, so listing a crop
+        # under an alias retires the canonical region's entries
+        names = [r for r in regions if isinstance(r, str)]
+        slugs = resolve_region_slugs(names)
+        scopes.update(region_scope(slugs.get(region_key(r), r)) for r in names)
+    return scopes
+
+
+@receiver(pre_save, sender=Crop)
+def remember_previous_crop(sender, instance, raw=False, **kwargs):
+    # A rename or region change must also retire entries cached under the old values.
+    instance._previous_crop = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_crop = Crop.objects.filter(pk=instance.pk).values_list('name', 'regions').first()
+
+
+@receiver(post_save, sender=Crop)
+def invalidate_crop_caches_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    scopes = _scopes(instance.name, instance.regions)
+    previous = getattr(instance, '_previous_crop', None)
+    if previous:
+        scopes |= _scopes(*previous)
+    bump_on_commit(scopes)
+
+
+@receiver(post_delete, sender=Crop)
+def invalidate_crop_caches_on_delete(sender, instance, **kwargs):
+    bump_on_commit(_scopes(instance.name, instance.regions))
+
+
+@receiver(post_save, sender=Region)
+@receiver(post_delete, sender=Region)
+@receiver(post_save, sender=RegionAlias)
+@receiver(post_delete, sender=RegionAlias)
+def invalidate_crop_catalog_on_region_change(sender, instance, raw=False, **kwargs):
+    # Renamed slugs and new aliases change which crops a region name finds
+    if raw:
+        return
+    scopes = {CATALOG_SCOPE}
+    if isinstance(instance, RegionAlias):
+        scopes.add(region_scope(instance.key))
+        slug = Region.objects.filter(pk=instance.region_id).values_list('slug', flat=True).first()
+        if slug:
+            scopes.add(region_scope(slug))
+    else:
+        scopes.add(region_scope(instance.slug))
+    bump_on_commit(scopes)
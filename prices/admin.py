@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import MarketPrice
+from .models import LatestMarketPrice, MarketPrice, MarketPriceRollup
 
 
 @admin.register(MarketPrice)
@@ -8,3 +8,29 @@ class MarketPriceAdmin(admin.ModelAdmin):
     search_fields = ("crop__name", "region")
     list_filter = ("region", "date")
     autocomplete_fields = ("crop",)
+
+
+@admin.register(MarketPriceRollup)
+class MarketPriceRollupAdmin(admin.ModelAdmin):
+    list_display = ("crop", "region", "granularity", "bucket_start", "count", "min_price", "max_price", "last_price")
+    list_filter = ("granularity", "region")
+    search_fields = ("crop__name", "region")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LatestMarketPrice)
+class LatestMarketPriceAdmin(admin.ModelAdmin):
+    list_display = ("crop", "region", "date", "price", "previous_date", "previous_price")
+    list_filter = ("region",)
+    search_fields = ("crop__name", "region")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
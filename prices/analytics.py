@@ -0,0 +1,202 @@
+"""
+Vectorized rolling statistics over market price series.
+
+Series are loaded straight from ``values_list`` tuples into contiguous NumPy
+arrays (no model instances), all series back to back with an offsets array
+marking where each one starts. Every statistic is then computed over the
+concatenated arrays in a handful of vectorized passes; values whose window
+would reach into the previous series are masked to NaN. Windows count
+observations, not calendar days.
+"""
+import math
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from crops.models import Crop
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+DEFAULT_WINDOWS = (7, 30)
+DEFAULT_PERCENTILES = (10, 50, 90)
+PERCENTILE_CHUNK_ROWS = 65536
+
+
+class PriceSeriesBatch:
+    """
+    Many price series stored back to back.
+
+    ``keys[i]`` is ``(crop_id, crop_name, region)`` and its rows are
+    ``dates[offsets[i]:offsets[i + 1]]`` (int32 days since 1970-01-01) and the
+    matching slice of ``prices`` (float64), oldest first.
+    """
+
+    def __init__(self, keys: List[Tuple[int, str, str]], offsets: np.ndarray,
+                 dates: np.ndarray, prices: np.ndarray):
+        self.keys = keys
+        self.offsets = offsets
+        self.dates = dates
+        self.prices = prices
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def positions(self) -> np.ndarray:
+        """Index of every row within its own series."""
+        n = self.prices.shape[0]
+        return np.arange(n, dtype=np.int64) - np.repeat(self.offsets[:-1], self.lengths)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, str, date, object]]) -> 'PriceSeriesBatch':
+        """
+        Build a batch from ``(crop_id, region, date, price)`` rows sorted by
+        crop, region and date. Crop names are left blank; see :func:`load_series`.
+        """
+        keys, offsets, ordinals, prices = [], [], [], []
+        current = None
+        for i, (crop_id, region, d, price) in enumerate(rows):
+            if (crop_id, region) != current:
+                current = (crop_id, region)
+                keys.append((crop_id, '', region))
+                offsets.append(i)
+            ordinals.append(d.toordinal())
+            prices.append(price)
+        offsets.append(len(prices))
+        return cls(
+            keys=keys,
+            offsets=np.asarray(offsets, dtype=np.int64),
+            dates=(np.asarray(ordinals, dtype=np.int64) - EPOCH_ORDINAL).astype(np.int32),
+            prices=np.asarray(prices, dtype=np.float64),
+        )
+
+
+def load_series(queryset, chunk_size: int = 20000) -> PriceSeriesBatch:
+    """
+    Stream ``queryset`` (MarketPrice rows) into a :class:`PriceSeriesBatch`
+    without instantiating models.
+    """
+    rows = (
+        queryset.order_by('crop_id', 'region', 'date')
+        .values_list('crop_id', 'region', 'date', 'price')
+        .iterator(chunk_size=chunk_size)
+    )
+    batch = PriceSeriesBatch.from_rows(rows)
+    crop_names = dict(Crop.objects.filter(id__in={key[0] for key in batch.keys}).values_list('id', 'name'))
+    batch.keys = [(crop_id, crop_names.get(crop_id, ''), region) for crop_id, _, region in batch.keys]
+    return batch
+
+
+def moving_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing sum over ``window`` rows; the first ``window - 1`` entries are NaN."""
+    out = np.full(values.shape[0], np.nan)
+    if values.shape[0] >= window:
+        cs = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+        out[window - 1:] = cs[window:] - cs[:-window]
+    return out
+
+
+def rolling_percentiles(values: np.ndarray, window: int, percentiles: Sequence[float],
+                        chunk_rows: int = PERCENTILE_CHUNK_ROWS) -> np.ndarray:
+    """
+    Trailing percentiles over ``window`` rows, shape ``(len(percentiles), n)``.
+
+    Windows are strided views (no copy) reduced in chunks, so memory stays
+    bounded at ``chunk_rows * window`` values. Each chunk is sorted once and
+    every percentile is read off with linear interpolation, which matches
+    ``np.percentile``'s default method at a fraction of the cost.
+    """
+    n = values.shape[0]
+    out = np.full((len(percentiles), n), np.nan)
+    if n < window:
+        return out
+    ranks = np.asarray(percentiles, dtype=np.float64) / 100.0 * (window - 1)
+    lo = np.floor(ranks).astype(np.int64)
+    hi = np.ceil(ranks).astype(np.int64)
+    frac = ranks - lo
+    windows = sliding_window_view(values, window)
+    for start in range(0, windows.shape[0], chunk_rows):
+        block = np.sort(windows[start:start + chunk_rows], axis=1)
+        below, above = block[:, lo], block[:, hi]
+        out[:, start + window - 1:start + window - 1 + block.shape[0]] = (below + (above - below) * frac).T
+    return out
+
+
+def rolling_stats(batch: PriceSeriesBatch, windows: Sequence[int] = DEFAULT_WINDOWS,
+                  percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, np.ndarray]:
+    """
+    Compute, for every row of every series in ``batch``:
+
+    - ``pct_change``: change versus the previous observation
+    - ``ma_{w}``: moving average over ``w`` observations
+    - ``volatility_{w}``: sample standard deviation of ``pct_change`` over ``w`` observations
+    - ``p{q}_{w}``: the ``q``-th percentile of price over ``w`` observations
+
+    Returns flat arrays aligned with ``batch.prices``.
+    """
+    prices = batch.prices
+    pos = batch.positions()
+    stats: Dict[str, np.ndarray] = {}
+
+    pct = np.full(prices.shape[0], np.nan)
+    if prices.shape[0] > 1:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct[1:] = prices[1:] / prices[:-1] - 1.0
+    pct[pos == 0] = np.nan
+    stats['pct_change'] = pct
+    # A zero price makes the next change infinite; it must not reach the
+    # cumulative sums, where inf - inf would turn every later row into NaN
+    returns = np.where(np.isfinite(pct), pct, 0.0)
+
+    for w in windows:
+        ma = moving_sum(prices, w) / w
+        ma[pos < w - 1] = np.nan
+        stats[f'ma_{w}'] = ma
+
+        if w > 1:
+            s1 = moving_sum(returns, w)
+            s2 = moving_sum(returns * returns, w)
+            var = np.maximum((s2 - s1 * s1 / w) / (w - 1), 0.0)
+            vol = np.sqrt(var)
+            # The first return of each series is undefined, so a full window needs w + 1 prices
+            vol[pos < w] = np.nan
+            stats[f'volatility_{w}'] = vol
+
+        bands = rolling_percentiles(prices, w, percentiles)
+        bands[:, pos < w - 1] = np.nan
+        for q, band in zip(percentiles, bands):
+            stats[f'p{q:g}_{w}'] = band
+
+    return stats
+
+
+def _to_json_list(values: np.ndarray, digits: int = 4) -> List:
+    rounded = np.round(values, digits)
+    return [v if math.isfinite(v) else None for v in rounded.tolist()]
+
+
+def serialize_series(batch: PriceSeriesBatch, stats: Dict[str, np.ndarray], tail: Optional[int] = None) -> List[Dict]:
+    """Split flat stat arrays back into per-series JSON-ready dicts."""
+    epoch = np.datetime64('1970-01-01', 'D')
+    result = []
+    for i, (crop_id, crop_name, region) in enumerate(batch.keys):
+        lo, hi = int(batch.offsets[i]), int(batch.offsets[i + 1])
+        if tail:
+            lo = max(lo, hi - tail)
+        item = {
+            'crop_id': crop_id,
+            'crop': crop_name,
+            'region': region,
+            'count': int(batch.offsets[i + 1] - batch.offsets[i]),
+            'dates': [str(d) for d in (epoch + batch.dates[lo:hi].astype('timedelta64[D]'))],
+            'price': _to_json_list(batch.prices[lo:hi], 2),
+        }
+        for name, values in stats.items():
+            item[name] = _to_json_list(values[lo:hi])
+        result.append(item)
+    return result
@@ -0,0 +1,89 @@
+"""
+Constant-memory streaming export of market prices as CSV or NDJSON.
+"""
+import csv
+import io
+import json
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+
+EXPORT_FIELDS = ('id', 'crop', 'crop_name', 'region', 'price', 'date')
+EXPORT_VALUES = ('id', 'crop_id', 'crop__name', 'region', 'price', 'date')
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def get_chunk_size() -> int:
+    return getattr(settings, 'PRICE_EXPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def iter_rows(queryset, chunk_size: int) -> Iterator[tuple]:
+    """Raw value tuples from the database cursor; no model instances are built."""
+    return queryset.values_list(*EXPORT_VALUES).iterator(chunk_size=chunk_size)
+
+
+def _chunks(rows: Iterable[tuple], size: int) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv(rows: Iterable[tuple], chunk_size: int) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for chunk in _chunks(rows, chunk_size):
+        writer.writerows(
+            (pk, crop_id, crop_name, region, price, d.isoformat())
+            for pk, crop_id, crop_name, region, price, d in chunk
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header-only output when nothing matched
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def iter_ndjson(rows: Iterable[tuple], chunk_size: int) -> Iterator[bytes]:
+    for chunk in _chunks(rows, chunk_size):
+        yield ''.join(
+            json.dumps({
+                'id': pk,
+                'crop': crop_id,
+                'crop_name': crop_name,
+                'region': region,
+                'price': str(price),
+                'date': d.isoformat(),
+            }) + '\n'
+            for pk, crop_id, crop_name, region, price, d in chunk
+        ).encode()
+
+
+def gzip_stream(blocks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress a byte stream incrementally into a single gzip member."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(queryset, fmt: str, compress: bool = False, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    chunk_size = chunk_size or get_chunk_size()
+    rows = iter_rows(queryset, chunk_size)
+    blocks = iter_csv(rows, chunk_size) if fmt == 'csv' else iter_ndjson(rows, chunk_size)
+    return gzip_stream(blocks) if compress else blocks
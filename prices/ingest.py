@@ -0,0 +1,289 @@
+"""
+Streaming bulk ingestion of market prices.
+
+Rows are parsed lazily from a CSV or NDJSON byte stream, validated in chunks
+and upserted with ``bulk_create(update_conflicts=True)`` on the
+``(crop, region, date)`` unique constraint, so a feed never has to be held
+in memory or written row by row through the ORM.
+"""
+import codecs
+import csv
+import json
+import logging
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from crops.models import Crop
+from regions.models import region_key
+from regions.resolver import ensure_region_ids
+from .models import MarketPrice
+from .latest import merge_latest
+from .rollups import refresh_for_keys
+
+logger = logging.getLogger(__name__)
+
+FORMAT_CSV = 'csv'
+FORMAT_NDJSON = 'ndjson'
+
+CONTENT_TYPE_FORMATS = {
+    'text/csv': FORMAT_CSV,
+    'application/csv': FORMAT_CSV,
+    'application/x-ndjson': FORMAT_NDJSON,
+    'application/ndjson': FORMAT_NDJSON,
+    'application/jsonlines': FORMAT_NDJSON,
+    'application/x-jsonlines': FORMAT_NDJSON,
+}
+
+DEFAULT_BATCH_SIZE = 5000
+MAX_BATCH_SIZE = 50000
+DEFAULT_MAX_ERRORS = 100
+
+PRICE_QUANTUM = Decimal('0.01')
+MAX_PRICE = Decimal('99999999.99')
+
+
+def get_batch_size(requested: Optional[str] = None) -> int:
+    """Resolve the upsert batch size from a query value or settings."""
+    default = getattr(settings, 'PRICE_BULK_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    if requested:
+        try:
+            value = int(requested)
+        except (TypeError, ValueError):
+            return default
+        if value > 0:
+            return min(value, MAX_BATCH_SIZE)
+    return default
+
+
+def detect_format(content_type: str) -> Optional[str]:
+    """Map a request Content-Type header to an ingest format."""
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    return CONTENT_TYPE_FORMATS.get(media_type)
+
+
+def iter_csv_rows(stream: Iterable[bytes]) -> Iterator[Tuple[int, Dict]]:
+    """Yield ``(line_number, row)`` pairs from a CSV byte stream with a header row."""
+    reader = csv.DictReader(codecs.iterdecode(stream, 'utf-8-sig'))
+    for row in reader:
+        yield reader.line_num, row
+
+
+def iter_ndjson_rows(stream: Iterable[bytes]) -> Iterator[Tuple[int, Dict]]:
+    """Yield ``(line_number, row)`` pairs from an NDJSON byte stream, skipping blank lines."""
+    for line_number, raw in enumerate(stream, start=1):
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        if not isinstance(row, dict):
+            # Surface the line as a row-level rejection rather than aborting the stream
+            row = {'__invalid__': 'Line is not a JSON object'}
+        yield line_number, row
+
+
+def iter_rows(stream: Iterable[bytes], fmt: str) -> Iterator[Tuple[int, Dict]]:
+    if fmt == FORMAT_CSV:
+        return iter_csv_rows(stream)
+    return iter_ndjson_rows(stream)
+
+
+def iter_chunks(rows: Iterator[Tuple[int, Dict]], size: int) -> Iterator[List[Tuple[int, Dict]]]:
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class CropResolver:
+    """
+    Resolves crop ids and names to primary keys with one query per chunk of unseen ids.
+    """
+
+    def __init__(self):
+        self._by_id: Dict[int, Optional[int]] = {}
+        self._by_name: Optional[Dict[str, int]] = None
+
+    @staticmethod
+    def _key(value) -> Tuple[Optional[int], Optional[str]]:
+        text = str(value).strip()
+        if not text:
+            return None, None
+        if text.isdigit():
+            return int(text), None
+        return None, text.lower()
+
+    def prime(self, values: Iterable) -> None:
+        ids, names = set(), set()
+        for value in values:
+            crop_id, name = self._key(value)
+            if crop_id is not None and crop_id not in self._by_id:
+                ids.add(crop_id)
+            elif name is not None:
+                names.add(name)
+
+        if ids:
+            found = set(Crop.objects.filter(id__in=ids).values_list('id', flat=True))
+            for crop_id in ids:
+                self._by_id[crop_id] = crop_id if crop_id in found else None
+
+        if names and self._by_name is None:
+            # The crop catalogue is small; load it once and match names
+            # case-insensitively in Python for the rest of the stream.
+            self._by_name = {name.lower(): pk for pk, name in Crop.objects.values_list('id', 'name')}
+
+    def resolve(self, value) -> Optional[int]:
+        crop_id, name = self._key(value)
+        if crop_id is not None:
+            return self._by_id.get(crop_id)
+        if name is not None and self._by_name is not None:
+            return self._by_name.get(name)
+        return None
+
+
+def validate_row(row: Dict, resolver: CropResolver):
+    """
+    Validate a raw row, returning ``(MarketPrice, None)`` or ``(None, errors)``.
+    """
+    errors = {}
+    if '__invalid__' in row:
+        return None, {'row': [row['__invalid__']]}
+
+    crop_value = row.get('crop') or row.get('crop_id') or row.get('crop_name')
+    crop_id = None
+    if crop_value in (None, ''):
+        errors['crop'] = ['This field is required.']
+    else:
+        crop_id = resolver.resolve(crop_value)
+        if crop_id is None:
+            errors['crop'] = ['Crop not found by id or name']
+
+    region = str(row.get('region') or '').strip()
+    if not region:
+        errors['region'] = ['This field is required.']
+    elif len(region) > 100:
+        errors['region'] = ['Ensure this field has no more than 100 characters.']
+
+    price = None
+    raw_price = row.get('price')
+    try:
+        price = Decimal(str(raw_price).strip()).quantize(PRICE_QUANTUM)
+        if not price.is_finite() or price < 0 or price > MAX_PRICE:
+            raise InvalidOperation
+    except (InvalidOperation, ValueError):
+        errors['price'] = ['A valid non-negative price is required.']
+
+    the_date = None
+    raw_date = row.get('date')
+    try:
+        the_date = parse_date(str(raw_date).strip()) if raw_date else None
+    except ValueError:
+        the_date = None
+    if the_date is None:
+        errors['date'] = ['A valid date in YYYY-MM-DD format is required.']
+
+    if errors:
+        return None, errors
+    return MarketPrice(crop_id=crop_id, region=region, price=price, date=the_date), None
+
+
+def upsert_batch(objs: List[MarketPrice]) -> int:
+    """
+    Upsert a validated batch on ``(crop, region, date)`` and refresh the
+    rollup buckets and latest prices it touches. Returns the number of rows
+    written.
+    """
+    # ON CONFLICT cannot touch the same row twice in one statement; last row wins.
+    unique = {}
+    for obj in objs:
+        unique[(obj.crop_id, obj.region, obj.date)] = obj
+    objs = list(unique.values())
+    region_ids = ensure_region_ids({obj.region for obj in objs})
+    for obj in objs:
+        obj.canonical_region_id = region_ids.get(region_key(obj.region))
+
+    with transaction.atomic():
+        MarketPrice.objects.bulk_create(
+            objs,
+            update_conflicts=True,
+            unique_fields=['crop', 'region', 'date'],
+            update_fields=['price', 'canonical_region', 'updated_at'],
+        )
+        refresh_for_keys(unique.keys())
+        merge_latest((obj.crop_id, obj.region, obj.date, obj.price) for obj in objs)
+    return len(objs)
+
+
+def ingest_stream(stream: Iterable[bytes], fmt: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                  max_errors: Optional[int] = None) -> Dict:
+    """
+    Validate and upsert rows from ``stream`` in batches of ``batch_size``.
+
+    Each batch is committed on its own, so a bad row only rejects itself and a
+    failure part-way through keeps the batches already written.
+    """
+    if max_errors is None:
+        max_errors = getattr(settings, 'PRICE_BULK_MAX_ERRORS', DEFAULT_MAX_ERRORS)
+
+    started = time.monotonic()
+    resolver = CropResolver()
+    batches = []
+    rejected_rows = []
+    totals = {'received': 0, 'upserted': 0, 'rejected': 0}
+
+    for number, chunk in enumerate(iter_chunks(iter_rows(stream, fmt), batch_size), start=1):
+        resolver.prime(
+            row.get('crop') or row.get('crop_id') or row.get('crop_name')
+            for _, row in chunk
+            if isinstance(row, dict) and '__invalid__' not in row
+        )
+
+        valid = []
+        rejected = 0
+        for line_number, row in chunk:
+            obj, errors = validate_row(row, resolver)
+            if errors:
+                rejected += 1
+                if len(rejected_rows) < max_errors:
+                    rejected_rows.append({'line': line_number, 'errors': errors})
+                continue
+            valid.append(obj)
+
+        upserted = upsert_batch(valid) if valid else 0
+
+        batches.append({
+            'batch': number,
+            'received': len(chunk),
+            'upserted': upserted,
+            'rejected': rejected,
+        })
+        totals['received'] += len(chunk)
+        totals['upserted'] += upserted
+        totals['rejected'] += rejected
+
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Bulk price ingest ({fmt}): {totals['upserted']} upserted, "
+        f"{totals['rejected']} rejected in {elapsed:.2f}s"
+    )
+    return {
+        'format': fmt,
+        'batch_size': batch_size,
+        'totals': totals,
+        'batches': batches,
+        'rejected_rows': rejected_rows,
+        'rejected_rows_truncated': totals['rejected'] > len(rejected_rows),
+        'duration_seconds': round(elapsed, 3),
+        'rows_per_second': round(totals['received'] / elapsed) if elapsed > 0 else None,
+    }
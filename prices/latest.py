@@ -0,0 +1,163 @@
+"""
+Denormalized latest-price snapshot.
+
+:class:`~prices.models.LatestMarketPrice` keeps one row per (crop, region)
+with its newest price and the observation before it, so "the current price of
+X everywhere" is a single indexed read.
+
+Inserts and updates go through :func:`merge_latest`, which folds the written
+observations into the stored rows without reading any history: the newest
+two dates of a series can only come from its old newest two and the new
+rows. Deletes, and edits that move a price to another date or series, can
+remove one of the newest two; :func:`refresh_latest` re-reads the last two
+observations of those series with one ``ROW_NUMBER()`` window query, which
+SQLite and PostgreSQL both support. Both hold the series locks of
+:mod:`prices.locks` from the read to the write.
+"""
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, Tuple
+
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from core.cache_versions import bump_on_commit
+from .locks import lock_series
+from .models import LatestMarketPrice, MarketPrice
+
+LATEST_SCOPE = 'latest_prices'
+
+
+def last_two(queryset):
+    """``(crop_id, region, date, price, rank)`` for the newest two rows of each series in ``queryset``."""
+    return (
+        queryset.order_by()
+        .annotate(rank=Window(
+            RowNumber(),
+            partition_by=[F('crop_id'), F('region')],
+            order_by=[F('date').desc()],
+        ))
+        .filter(rank__lte=2)
+        .values_list('crop_id', 'region', 'date', 'price', 'rank')
+    )
+
+
+def build_snapshot_objects(rows, latest_model=LatestMarketPrice):
+    snapshot = {}
+    for crop_id, region, d, price, rank in rows:
+        obj = snapshot.setdefault((crop_id, region), latest_model(crop_id=crop_id, region=region))
+        if rank == 1:
+            obj.date, obj.price = d, price
+        else:
+            obj.previous_date, obj.previous_price = d, price
+    return snapshot
+
+
+def _upsert(objs, latest_model=LatestMarketPrice):
+    latest_model.objects.bulk_create(
+        objs,
+        update_conflicts=True,
+        unique_fields=['crop', 'region'],
+        update_fields=['date', 'price', 'previous_date', 'previous_price', 'updated_at'],
+        batch_size=1000,
+    )
+
+
+def refresh_latest(series: Iterable[Tuple[int, str]]) -> int:
+    """
+    Recompute the snapshot rows of the given ``(crop_id, region)`` series.
+    Series left without prices are dropped. Returns the number of rows written.
+    """
+    series = set(series)
+    if not series:
+        return 0
+    rows = last_two(MarketPrice.objects.filter(
+        crop_id__in={crop_id for crop_id, _ in series},
+        region__in={region for _, region in series},
+    ))
+    with transaction.atomic():
+        lock_series(series)
+        snapshot = {
+            key: obj for key, obj in build_snapshot_objects(rows).items() if key in series
+        }
+        if snapshot:
+            _upsert(list(snapshot.values()))
+        gone = series - snapshot.keys()
+        if gone:
+            stale_ids = [
+                pk for pk, crop_id, region in LatestMarketPrice.objects.filter(
+                    crop_id__in={crop_id for crop_id, _ in gone},
+                    region__in={region for _, region in gone},
+                ).values_list('id', 'crop_id', 'region')
+                if (crop_id, region) in gone
+            ]
+            if stale_ids:
+                LatestMarketPrice.objects.filter(id__in=stale_ids).delete()
+    bump_on_commit([LATEST_SCOPE])
+    return len(snapshot)
+
+
+def merge_latest(observations: Iterable[Tuple[int, str, date, Decimal]]) -> int:
+    """
+    Fold inserted or updated ``(crop_id, region, date, price)`` observations
+    into the snapshot with one read of the affected snapshot rows. Series
+    without a row yet fall back to :func:`refresh_latest`. Returns the number
+    of rows written.
+    """
+    incoming: Dict[Tuple[int, str], Dict[date, Decimal]] = {}
+    for crop_id, region, d, price in observations:
+        incoming.setdefault((crop_id, region), {})[d] = price
+    if not incoming:
+        return 0
+
+    written = 0
+    with transaction.atomic():
+        # The stored pair must not change between this read and the write
+        lock_series(incoming)
+        stored = {
+            (row.crop_id, row.region): row
+            for row in LatestMarketPrice.objects.filter(
+                crop_id__in={crop_id for crop_id, _ in incoming},
+                region__in={region for _, region in incoming},
+            )
+            if (row.crop_id, row.region) in incoming
+        }
+        merged = []
+        for key, prices in incoming.items():
+            row = stored.get(key)
+            if row is None:
+                continue
+            # Older observations rank below both stored ones, so these are enough
+            candidates = {row.date: row.price}
+            if row.previous_date is not None:
+                candidates[row.previous_date] = row.previous_price
+            candidates.update(prices)
+            newest = sorted(candidates.items(), reverse=True)[:2]
+            obj = LatestMarketPrice(crop_id=key[0], region=key[1], date=newest[0][0], price=newest[0][1])
+            if len(newest) > 1:
+                obj.previous_date, obj.previous_price = newest[1]
+            if (obj.date, obj.price, obj.previous_date, obj.previous_price) != (
+                    row.date, row.price, row.previous_date, row.previous_price):
+                merged.append(obj)
+
+        if merged:
+            _upsert(merged)
+            bump_on_commit([LATEST_SCOPE])
+            written = len(merged)
+        new_series = incoming.keys() - stored.keys()
+        if new_series:
+            written += refresh_latest(new_series)
+    return written
+
+
+def rebuild_latest(price_model=MarketPrice, latest_model=LatestMarketPrice) -> int:
+    """
+    Rebuild the whole snapshot from scratch. Accepts historical models so
+    data migrations can reuse it.
+    """
+    snapshot = build_snapshot_objects(last_two(price_model.objects.all()), latest_model)
+    with transaction.atomic():
+        latest_model.objects.all().delete()
+        _upsert(list(snapshot.values()), latest_model)
+    return len(snapshot)
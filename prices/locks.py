@@ -0,0 +1,36 @@
+"""
+Per-series write locks for derived price tables.
+
+Rollups and the latest-price snapshot are computed from rows read back from
+the database and then written. Two transactions touching the same
+``(crop_id, region)`` series could each read without the other's prices,
+and the last one to write would win. :func:`lock_series` takes a PostgreSQL
+advisory lock per series before the read, held until commit or rollback,
+so writers of the same series run one after the other. Locks are taken in
+ascending id order, so writers of overlapping series do not deadlock.
+
+Other backends take no lock. SQLite, used in development and tests,
+allows a single writing transaction at a time.
+"""
+import hashlib
+from typing import Iterable, Tuple
+
+from django.db import connection
+
+
+def series_lock_id(crop_id: int, region: str) -> int:
+    """Signed 64-bit advisory lock key of a series."""
+    digest = hashlib.blake2b(f"price-series:{crop_id}:{region}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def lock_series(series: Iterable[Tuple[int, str]]) -> None:
+    """Block until the current transaction holds the lock of every ``(crop_id, region)`` series."""
+    if connection.vendor != 'postgresql':
+        return
+    ids = sorted({series_lock_id(crop_id, region) for crop_id, region in series})
+    if not ids:
+        return
+    with connection.cursor() as cursor:
+        # unnest keeps the array order, so the locks are taken in ascending order
+        cursor.execute("SELECT pg_advisory_xact_lock(id) FROM unnest(%s::bigint[]) AS id", [ids])
@@ -0,0 +1,72 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from prices.analytics import DEFAULT_WINDOWS, PriceSeriesBatch, load_series, rolling_stats
+from prices.models import MarketPrice
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the vectorized rolling statistics engine. Uses a synthetic batch "
+        "by default, or the MarketPrice table with --from-db."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic rows to generate")
+        parser.add_argument("--series", type=int, default=1000, help="Synthetic series the rows are split across")
+        parser.add_argument("--windows", type=str, default=",".join(str(w) for w in DEFAULT_WINDOWS),
+                            help="Comma-separated rolling windows")
+        parser.add_argument("--repeat", type=int, default=3, help="Timed runs; the best is reported")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed for the synthetic batch")
+        parser.add_argument("--from-db", action="store_true", help="Load every MarketPrice row instead of generating")
+
+    def handle(self, *args, **options):
+        try:
+            windows = tuple(int(w) for w in options["windows"].split(",") if w.strip())
+        except ValueError:
+            raise CommandError("--windows must be comma-separated integers")
+        if options["rows"] < 1 or options["series"] < 1 or options["repeat"] < 1:
+            raise CommandError("--rows, --series and --repeat must be at least 1")
+
+        if options["from_db"]:
+            started = time.perf_counter()
+            batch = load_series(MarketPrice.objects.all())
+            load_seconds = time.perf_counter() - started
+            rows = batch.prices.shape[0]
+            if not rows:
+                raise CommandError("No MarketPrice rows to benchmark; seed some with seed_market_prices")
+            self.stdout.write(
+                f"Loaded {rows} rows in {len(batch)} series in {load_seconds:.3f}s "
+                f"({rows / load_seconds / 1e6:.2f}M rows/s)"
+            )
+        else:
+            batch = self._synthetic_batch(options["rows"], options["series"], options["seed"])
+            rows = options["rows"]
+
+        best = None
+        for _ in range(options["repeat"]):
+            started = time.perf_counter()
+            rolling_stats(batch, windows)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"rolling_stats windows={list(windows)}: {rows} rows in {len(batch)} series, "
+            f"best {best:.3f}s ({rows / best / 1e6:.2f}M rows/s, {best / rows * 1e6:.3f}s per million rows)"
+        ))
+
+    @staticmethod
+    def _synthetic_batch(rows, series, seed):
+        rng = np.random.default_rng(seed)
+        lengths = np.full(series, rows // series, dtype=np.int64)
+        lengths[: rows % series] += 1
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        # Random walks, one per series
+        steps = rng.normal(0, 0.01, rows)
+        prices = 100.0 * np.exp(np.cumsum(steps))
+        positions = np.arange(rows) - np.repeat(offsets[:-1], lengths)
+        dates = (19000 + positions).astype(np.int32)
+        keys = [(i, f"Crop {i}", "Region") for i in range(series)]
+        return PriceSeriesBatch(keys=keys, offsets=offsets, dates=dates, prices=prices)
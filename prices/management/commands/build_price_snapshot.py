@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from prices.snapshot import build_snapshot, get_snapshot_dir
+
+
+class Command(BaseCommand):
+    help = (
+        "Export every MarketPrice into a columnar snapshot (int32 date ordinals, float64 prices "
+        "and an offsets index per crop/region) that price statistics read through numpy.memmap. "
+        "Run it after the daily price load."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", type=str, default=None,
+                            help="Snapshot directory (defaults to settings.PRICE_SNAPSHOT_DIR)")
+
+    def handle(self, *args, **options):
+        directory = options["output"] or get_snapshot_dir()
+        if not directory:
+            raise CommandError("No snapshot directory: pass --output or set PRICE_SNAPSHOT_DIR")
+
+        started = time.monotonic()
+        meta = build_snapshot(directory)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote price snapshot {meta['build_id']} to {directory}: "
+            f"{meta['rows']} rows in {len(meta['keys'])} series in {elapsed:.2f}s"
+        ))
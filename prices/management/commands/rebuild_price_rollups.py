@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.cache_versions import bump
+from prices.latest import LATEST_SCOPE, rebuild_latest
+from prices.rollups import rebuild_all
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the day/week/month market price rollups and the latest-price snapshot "
+        "from scratch. Needed only after "
+        "writes that bypass the ORM and bulk ingest paths (raw SQL, queryset.update())."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=20000, help="Rows fetched and rollups written per chunk")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = rebuild_all(chunk_size=options["chunk_size"])
+        latest = rebuild_latest()
+        bump([LATEST_SCOPE])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} price rollups and {latest} latest prices in {elapsed:.2f}s"
+        ))
@@ -1,10 +1,23 @@
 import random
+import time
 from datetime import date, timedelta
-from django.core.management.base import BaseCommand
+from itertools import islice
+from multiprocessing import Pool
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models.functions import Lower
 from faker import Faker
 
+from core.cache_versions import bump, crop_scope, region_scope
+from crops.index import CATALOG_SCOPE
 from crops.models import Crop, Season
-from prices.models import MarketPrice
+from prices.ingest import upsert_batch
+from prices.latest import LATEST_SCOPE
+from prices.models import LatestMarketPrice, MarketPrice, MarketPriceRollup
+from recommendations.snapshot import retire_snapshot
 
 
 COMMON_CROPS = [
@@ -24,59 +37,171 @@ REGIONS = [
 ]
 
 
+def build_names(base, count, fake_name):
+    """Return ``count`` names, starting with ``base`` and topping up with generated ones."""
+    names = list(base[:count])
+    seen = {n.lower() for n in names}
+    while len(names) < count:
+        name = fake_name()
+        if name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    return names
+
+
+def crops_by_name(names):
+    """Existing crops matching ``names`` case-insensitively, keyed by lower-case name."""
+    crops = Crop.objects.annotate(name_key=Lower('name')).filter(name_key__in={n.lower() for n in names})
+    return {c.name_key: c for c in crops.order_by('id')}
+
+
+def iter_series(crop_id, crop_index, region_index, region, days, seed, today):
+    """
+    Yield one (crop, region) random-walk price series as unsaved MarketPrice rows.
+
+    Each series draws from its own RNG keyed on the seed and series position, so
+    output is identical however the work is split across batches or workers.
+    """
+    crop_rng = random.Random(f"{seed}:crop:{crop_index}")
+    base_price = crop_rng.uniform(10, 200)
+    rng = random.Random(f"{seed}:series:{crop_index}:{region_index}")
+    price = base_price * rng.uniform(0.8, 1.2)
+    for i in range(days):
+        # small day-to-day variation
+        price = max(1.0, price * rng.uniform(0.98, 1.02))
+        yield MarketPrice(
+            crop_id=crop_id,
+            region=region,
+            price=round(price, 2),
+            date=today - timedelta(days=i),
+        )
+
+
+def seed_task(task):
+    """Generate and upsert every series in ``task``; returns the number of rows written."""
+    crop_id, crop_index, regions, days, seed, today, batch_size = task
+    rows = (
+        row
+        for region_index, region in regions
+        for row in iter_series(crop_id, crop_index, region_index, region, days, seed, today)
+    )
+    written = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        written += upsert_batch(batch)
+    return written
+
+
+def init_worker():
+    # Children must not reuse the parent's database connections.
+    django.setup()
+    connections.close_all()
+
+
 class Command(BaseCommand):
-    help = "Seed market prices for common crops across regions. Deterministic via --seed."
+    help = (
+        "Seed market prices for crops across regions in batched upserts. "
+        "Deterministic via --seed; scale with --crops, --regions, --days and --workers."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument("--seed", type=int, default=42, help="Random seed for determinism")
         parser.add_argument("--days", type=int, default=30, help="Number of past days to generate")
         parser.add_argument("--clear", action="store_true", help="Clear existing MarketPrice entries before seeding")
+        parser.add_argument("--crops", type=int, default=len(COMMON_CROPS),
+                            help="Number of crops to seed (generated names are added beyond the common list)")
+        parser.add_argument("--regions", type=int, default=len(REGIONS),
+                            help="Number of regions to seed (generated names are added beyond the default list)")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per bulk upsert")
+        parser.add_argument("--workers", type=int, default=1,
+                            help="Worker processes for generation and inserts (use 1 on SQLite)")
 
     def handle(self, *args, **options):
         seed = options["seed"]
         days = options["days"]
         clear = options["clear"]
+        crop_count = options["crops"]
+        region_count = options["regions"]
+        batch_size = options["batch_size"]
+        workers = options["workers"]
+
+        for name in ("days", "crops", "regions", "batch_size", "workers"):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1")
 
         fake = Faker()
-        Faker.seed(seed)
-        random.seed(seed)
+        fake.seed_instance(seed)
+        rng = random.Random(seed)
 
         if clear:
-            MarketPrice.objects.all().delete()
+            # MarketPrice.delete() would load every row and send post_delete for
+            # each, and the handlers would recompute rollups and latest prices
+            # row by row. Those derived tables are emptied in the same statement
+            # instead (TRUNCATE on PostgreSQL), and the caches are retired below.
+            tables = [model._meta.db_table for model in (MarketPriceRollup, LatestMarketPrice, MarketPrice)]
+            with transaction.atomic(), connection.cursor() as cursor:
+                for sql in connection.ops.sql_flush(no_style(), tables):
+                    cursor.execute(sql)
+            bump([LATEST_SCOPE, *(crop_scope(name) for name in Crop.objects.values_list('name', flat=True))])
 
-        # Ensure crops exist
-        crops = []
-        for name in COMMON_CROPS:
-            crop, _ = Crop.objects.get_or_create(
+        crop_names = build_names(COMMON_CROPS, crop_count, lambda: fake.unique.word().title())
+        regions = build_names(REGIONS, region_count, fake.unique.city)
+
+        # Ensure crops exist, creating any missing ones in one statement
+        existing = crops_by_name(crop_names)
+        missing = [
+            Crop(
                 name=name,
-                defaults={
-                    "season": Season.MAJOR,
-                    "soil_type": "loamy",
-                    "regions": REGIONS,
-                    "recommended_inputs": {"fertilizer": "NPK"},
-                    "maturity_days": random.randint(60, 180),
-                },
+                season=Season.MAJOR,
+                soil_type="loamy",
+                regions=regions,
+                recommended_inputs={"fertilizer": "NPK"},
+                maturity_days=rng.randint(60, 180),
             )
-            crops.append(crop)
+            for name in crop_names
+            if name.lower() not in existing
+        ]
+        if missing:
+            Crop.objects.bulk_create(missing, batch_size=1000)
+            # bulk_create skips save() and signals: link regions and retire recommendations by hand
+            existing = crops_by_name(crop_names)
+            for crop in missing:
+                existing[crop.name.lower()].sync_canonical_regions()
+            bump([CATALOG_SCOPE, *(region_scope(region) for region in regions)])
+            retire_snapshot(regions)
+        crops = [existing[name.lower()] for name in crop_names]
 
         today = date.today()
-        created = 0
-
-        for crop in crops:
-            # baseline price per crop to keep values plausible
-            base_price = random.uniform(10, 200)
-            for region in REGIONS:
-                price = base_price * random.uniform(0.8, 1.2)
-                for i in range(days):
-                    the_date = today - timedelta(days=i)
-                    # small day-to-day variation
-                    price = max(1.0, price * random.uniform(0.98, 1.02))
-                    MarketPrice.objects.update_or_create(
-                        crop=crop,
-                        region=region,
-                        date=the_date,
-                        defaults={"price": round(price, 2)},
-                    )
-                    created += 1
-
-        self.stdout.write(self.style.SUCCESS(f"Seeded market prices. Entries affected ~{created}"))
+        # Split each crop's regions so a task holds roughly one batch of rows
+        regions_per_task = max(1, batch_size // days)
+        indexed_regions = list(enumerate(regions))
+        tasks = [
+            (crop.id, crop_index, indexed_regions[start:start + regions_per_task], days, seed, today, batch_size)
+            for crop_index, crop in enumerate(crops)
+            for start in range(0, len(indexed_regions), regions_per_task)
+        ]
+
+        expected = len(crops) * len(regions) * days
+        self.stdout.write(
+            f"Seeding {expected} rows ({len(crops)} crops x {len(regions)} regions x {days} days) "
+            f"in batches of {batch_size} with {workers} worker(s)"
+        )
+
+        started = time.monotonic()
+        written = 0
+        if workers == 1:
+            for task in tasks:
+                written += seed_task(task)
+        else:
+            connections.close_all()
+            with Pool(processes=workers, initializer=init_worker) as pool:
+                for count in pool.imap_unordered(seed_task, tasks):
+                    written += count
+        elapsed = time.monotonic() - started
+
+        rate = written / elapsed if elapsed > 0 else float(written)
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded market prices. Entries affected ~{written} in {elapsed:.2f}s ({rate:,.0f} rows/s)"
+        ))
@@ -0,0 +1,34 @@
+# Generated by Django 5.0 on 2026-10-17 11:15
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_prices(apps, schema_editor):
+    """Keep only the most recent row for each (crop, region, date) before adding the constraint."""
+    MarketPrice = apps.get_model('prices', 'MarketPrice')
+    duplicates = (
+        MarketPrice.objects.values('crop_id', 'region', 'date')
+        .annotate(n=Count('id'), keep_id=Max('id'))
+        .filter(n__gt=1)
+    )
+    for dup in duplicates.iterator():
+        MarketPrice.objects.filter(
+            crop_id=dup['crop_id'], region=dup['region'], date=dup['date']
+        ).exclude(id=dup['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crops', '0002_alter_crop_recommended_inputs'),
+        ('prices', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_prices, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='marketprice',
+            constraint=models.UniqueConstraint(fields=('crop', 'region', 'date'), name='unique_market_price_crop_region_date'),
+        ),
+    ]
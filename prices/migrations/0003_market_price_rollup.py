@@ -0,0 +1,51 @@
+# Generated by Django 5.0 on 2026-10-17 11:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_rollups(apps, schema_editor):
+    from prices.rollups import rebuild_all
+
+    rebuild_all(
+        price_model=apps.get_model('prices', 'MarketPrice'),
+        rollup_model=apps.get_model('prices', 'MarketPriceRollup'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crops', '0002_alter_crop_recommended_inputs'),
+        ('prices', '0002_market_price_unique_crop_region_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketPriceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('region', models.CharField(max_length=100, verbose_name='region')),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=5, verbose_name='granularity')),
+                ('bucket_start', models.DateField(verbose_name='bucket start')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='count')),
+                ('price_sum', models.DecimalField(decimal_places=2, max_digits=18, verbose_name='price sum')),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='min price')),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='max price')),
+                ('first_date', models.DateField(verbose_name='first date')),
+                ('first_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='first price')),
+                ('last_date', models.DateField(verbose_name='last date')),
+                ('last_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='last price')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('crop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_rollups', to='crops.crop')),
+            ],
+            options={
+                'ordering': ['crop', 'region', 'granularity', 'bucket_start'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='marketpricerollup',
+            constraint=models.UniqueConstraint(fields=('crop', 'region', 'granularity', 'bucket_start'), name='unique_market_price_rollup_bucket'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-17 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crops', '0002_alter_crop_recommended_inputs'),
+        ('prices', '0003_market_price_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='marketprice',
+            index=models.Index(fields=['date', 'id'], name='prices_mark_date_a5b731_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0 on 2026-10-17 11:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_latest(apps, schema_editor):
+    from prices.latest import rebuild_latest
+
+    rebuild_latest(
+        price_model=apps.get_model('prices', 'MarketPrice'),
+        latest_model=apps.get_model('prices', 'LatestMarketPrice'),
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crops', '0002_alter_crop_recommended_inputs'),
+        ('prices', '0004_market_price_date_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestMarketPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('region', models.CharField(max_length=100, verbose_name='region')),
+                ('date', models.DateField(verbose_name='date')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='price')),
+                ('previous_date', models.DateField(blank=True, null=True, verbose_name='previous date')),
+                ('previous_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='previous price')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('crop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='latest_prices', to='crops.crop')),
+            ],
+            options={
+                'ordering': ['crop', 'region'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='latestmarketprice',
+            constraint=models.UniqueConstraint(fields=('crop', 'region'), name='unique_latest_market_price_series'),
+        ),
+        migrations.RunPython(build_latest, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0 on 2026-10-17 11:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crops', '0003_crop_canonical_regions'),
+        ('prices', '0005_latest_market_price'),
+        ('regions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marketprice',
+            name='canonical_region',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='market_prices', to='regions.region'),
+        ),
+        migrations.AddIndex(
+            model_name='marketprice',
+            index=models.Index(fields=['canonical_region', 'crop'], name='prices_mark_canonic_5f782e_idx'),
+        ),
+    ]
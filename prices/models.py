@@ -1,10 +1,15 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from regions.resolver import ensure_region_id
+
 
 class MarketPrice(models.Model):
     crop = models.ForeignKey('crops.Crop', on_delete=models.CASCADE, related_name='market_prices')
     region = models.CharField(_('region'), max_length=100)
+    canonical_region = models.ForeignKey(
+        'regions.Region', on_delete=models.PROTECT, null=True, blank=True, related_name='market_prices'
+    )
     price = models.DecimalField(_('price'), max_digits=10, decimal_places=2)
     date = models.DateField(_('date'))
     created_at = models.DateTimeField(auto_now_add=True)
@@ -14,8 +19,82 @@ class MarketPrice(models.Model):
         ordering = ['-date', '-id']
         indexes = [
             models.Index(fields=['crop', 'region']),
+            models.Index(fields=['canonical_region', 'crop']),
             models.Index(fields=['date']),
+            # Serves keyset pagination over (-date, -id)
+            models.Index(fields=['date', 'id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['crop', 'region', 'date'], name='unique_market_price_crop_region_date'),
         ]
 
     def __str__(self) -> str:
         return f"{self.crop.name} - {self.region} - {self.date}: {self.price}"
+
+    def save(self, *args, **kwargs):
+        self.canonical_region_id = ensure_region_id(self.region)
+        super().save(*args, **kwargs)
+
+
+class RollupGranularity(models.TextChoices):
+    DAY = 'day', _('Day')
+    WEEK = 'week', _('Week')
+    MONTH = 'month', _('Month')
+
+
+class MarketPriceRollup(models.Model):
+    """
+    Pre-aggregated price statistics for one (crop, region) series over a day,
+    ISO week or calendar month bucket. Maintained by ``prices.rollups``.
+    """
+    crop = models.ForeignKey('crops.Crop', on_delete=models.CASCADE, related_name='price_rollups')
+    region = models.CharField(_('region'), max_length=100)
+    granularity = models.CharField(_('granularity'), max_length=5, choices=RollupGranularity.choices)
+    bucket_start = models.DateField(_('bucket start'))
+
+    count = models.PositiveIntegerField(_('count'), default=0)
+    price_sum = models.DecimalField(_('price sum'), max_digits=18, decimal_places=2)
+    min_price = models.DecimalField(_('min price'), max_digits=10, decimal_places=2)
+    max_price = models.DecimalField(_('max price'), max_digits=10, decimal_places=2)
+    first_date = models.DateField(_('first date'))
+    first_price = models.DecimalField(_('first price'), max_digits=10, decimal_places=2)
+    last_date = models.DateField(_('last date'))
+    last_price = models.DecimalField(_('last price'), max_digits=10, decimal_places=2)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['crop', 'region', 'granularity', 'bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['crop', 'region', 'granularity', 'bucket_start'],
+                name='unique_market_price_rollup_bucket',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.crop_id} - {self.region} - {self.granularity} {self.bucket_start}: {self.count} prices"
+
+
+class LatestMarketPrice(models.Model):
+    """
+    The most recent price of each (crop, region) series together with the
+    observation before it. Maintained by ``prices.latest``.
+    """
+    crop = models.ForeignKey('crops.Crop', on_delete=models.CASCADE, related_name='latest_prices')
+    region = models.CharField(_('region'), max_length=100)
+    date = models.DateField(_('date'))
+    price = models.DecimalField(_('price'), max_digits=10, decimal_places=2)
+    previous_date = models.DateField(_('previous date'), null=True, blank=True)
+    previous_price = models.DecimalField(_('previous price'), max_digits=10, decimal_places=2, null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['crop', 'region']
+        constraints = [
+            models.UniqueConstraint(fields=['crop', 'region'], name='unique_latest_market_price_series'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.crop_id} - {self.region} - {self.date}: {self.price}"
@@ -0,0 +1,89 @@
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class MarketPriceKeysetPagination(BasePagination):
+    """
+    Keyset ("cursor") pagination over the ``(-date, -id)`` ordering of market prices.
+
+    Each page is fetched with ``(date, id) < (last_date, last_id)`` instead of
+    an OFFSET, so page 500 costs the same as page 1. The total count is only
+    computed when ``?count=true`` is passed.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    page_size = api_settings.PAGE_SIZE or 10
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    @staticmethod
+    def encode_cursor(last_date, last_id) -> str:
+        raw = f"{last_date.isoformat()}:{last_id}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, token: str):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+            date_part, id_part = raw.split(':', 1)
+            last_date = parse_date(date_part)
+            last_id = int(id_part)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise ValidationError({self.cursor_query_param: [self.invalid_cursor_message]})
+        if last_date is None:
+            raise ValidationError({self.cursor_query_param: [self.invalid_cursor_message]})
+        return last_date, last_id
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value:
+            try:
+                size = int(value)
+            except ValueError:
+                return self.page_size
+            if size > 0:
+                return min(size, self.max_page_size)
+        return self.page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes'):
+            self.count = queryset.order_by().count()
+
+        token = request.query_params.get(self.cursor_query_param)
+        qs = queryset.order_by('-date', '-id')
+        if token:
+            last_date, last_id = self.decode_cursor(token)
+            qs = qs.filter(Q(date__lt=last_date) | Q(date=last_date, id__lt=last_id))
+
+        # One extra row tells us whether another page exists without a COUNT.
+        rows = list(qs[:size + 1])
+        self.has_next = len(rows) > size
+        self.page = rows[:size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        last = self.page[-1]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(last.date, last.id))
+
+    def get_paginated_data(self, data):
+        return {
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        }
@@ -0,0 +1,362 @@
+"""
+Incrementally maintained day/week/month rollups of market prices.
+
+Every write path (ORM saves and deletes via signals, the bulk upsert used by
+ingestion and seeding) calls :func:`refresh_for_keys` with the
+``(crop_id, region, date)`` keys it touched. Only the buckets containing
+those dates are re-aggregated, so the cost of a write is bounded by the size
+of the buckets it lands in rather than by the length of the series.
+
+Analytics then read a handful of rollup rows instead of every price:
+:func:`summarize` answers an arbitrary ``[start, end]`` window from whole
+months plus the daily buckets at its edges.
+
+Each refresh locks its series (see :mod:`prices.locks`) before reading the
+prices, so concurrent writers of a series cannot overwrite each other's
+buckets with aggregates that miss their rows.
+
+The same call bumps the cache generation of each touched crop/region series
+(see :mod:`core.cache_versions`), so cached analytics for those series, and
+only those, are recomputed on the next request.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+
+from core.cache_versions import bump_on_commit, series_scope
+from crops.models import Crop
+from .locks import lock_series
+from .models import MarketPrice, MarketPriceRollup, RollupGranularity
+
+GRANULARITIES = (RollupGranularity.DAY, RollupGranularity.WEEK, RollupGranularity.MONTH)
+
+ROLLUP_UPDATE_FIELDS = [
+    'count', 'price_sum', 'min_price', 'max_price',
+    'first_date', 'first_price', 'last_date', 'last_price', 'updated_at',
+]
+
+BucketKey = Tuple[int, str, str, date]
+
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def next_month(d: date) -> date:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def bucket_start(d: date, granularity: str) -> date:
+    if granularity == RollupGranularity.WEEK:
+        return d - timedelta(days=d.weekday())
+    if granularity == RollupGranularity.MONTH:
+        return month_start(d)
+    return d
+
+
+def bucket_end(start: date, granularity: str) -> date:
+    """Last date (inclusive) of the bucket beginning at ``start``."""
+    if granularity == RollupGranularity.WEEK:
+        return start + timedelta(days=6)
+    if granularity == RollupGranularity.MONTH:
+        return next_month(start) - timedelta(days=1)
+    return start
+
+
+def aggregate_rows(rows: Iterable[Tuple[int, str, date, Decimal]],
+                   granularities: Iterable[str] = GRANULARITIES,
+                   only: Optional[Set[BucketKey]] = None) -> Dict[BucketKey, Dict]:
+    """
+    Fold ``(crop_id, region, date, price)`` rows into per-bucket statistics.
+
+    When ``only`` is given, buckets outside it are skipped.
+    """
+    granularities = tuple(granularities)
+    stats: Dict[BucketKey, Dict] = {}
+    for crop_id, region, d, price in rows:
+        for granularity in granularities:
+            key = (crop_id, region, granularity, bucket_start(d, granularity))
+            if only is not None and key not in only:
+                continue
+            s = stats.get(key)
+            if s is None:
+                stats[key] = {
+                    'count': 1, 'price_sum': price, 'min_price': price, 'max_price': price,
+                    'first_date': d, 'first_price': price, 'last_date': d, 'last_price': price,
+                }
+                continue
+            s['count'] += 1
+            s['price_sum'] += price
+            if price < s['min_price']:
+                s['min_price'] = price
+            if price > s['max_price']:
+                s['max_price'] = price
+            if d < s['first_date']:
+                s['first_date'], s['first_price'] = d, price
+            if d >= s['last_date']:
+                s['last_date'], s['last_price'] = d, price
+    return stats
+
+
+def build_rollup_objects(stats: Dict[BucketKey, Dict], rollup_model=MarketPriceRollup) -> List:
+    return [
+        rollup_model(crop_id=crop_id, region=region, granularity=granularity, bucket_start=start, **values)
+        for (crop_id, region, granularity, start), values in stats.items()
+    ]
+
+
+def _date_spans(dates: Iterable[date]) -> List[Tuple[date, date]]:
+    """Merged date ranges covering every bucket that contains one of ``dates``."""
+    spans = set()
+    for d in dates:
+        lo = min(bucket_start(d, g) for g in GRANULARITIES)
+        hi = max(bucket_end(bucket_start(d, g), g) for g in GRANULARITIES)
+        spans.add((lo, hi))
+    merged: List[Tuple[date, date]] = []
+    for lo, hi in sorted(spans):
+        if merged and lo <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(hi, merged[-1][1]))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def refresh_for_keys(keys: Iterable[Tuple[int, str, date]]) -> int:
+    """
+    Re-aggregate every rollup bucket touched by the given price keys.
+
+    Returns the number of rollup rows written. Buckets left without any
+    prices (after deletes or moves) are removed.
+    """
+    targets: Set[BucketKey] = set()
+    series = set()
+    dates = set()
+    for crop_id, region, d in keys:
+        series.add((crop_id, region))
+        dates.add(d)
+        for granularity in GRANULARITIES:
+            targets.add((crop_id, region, granularity, bucket_start(d, granularity)))
+    if not targets:
+        return 0
+
+    span_filter = Q()
+    for lo, hi in _date_spans(dates):
+        span_filter |= Q(date__range=(lo, hi))
+    rows = (
+        MarketPrice.objects.order_by()
+        .filter(span_filter,
+                crop_id__in={crop_id for crop_id, _ in series},
+                region__in={region for _, region in series})
+        .values_list('crop_id', 'region', 'date', 'price')
+    )
+
+    with transaction.atomic():
+        # Read and write under the series locks, so a concurrent write to the
+        # same buckets either sees these prices or waits for this commit
+        lock_series(series)
+        stats = aggregate_rows(
+            (row for row in rows.iterator(chunk_size=5000) if (row[0], row[1]) in series),
+            only=targets,
+        )
+        if stats:
+            MarketPriceRollup.objects.bulk_create(
+                build_rollup_objects(stats),
+                update_conflicts=True,
+                unique_fields=['crop', 'region', 'granularity', 'bucket_start'],
+                update_fields=ROLLUP_UPDATE_FIELDS,
+            )
+        empty = targets - stats.keys()
+        if empty:
+            existing = (
+                MarketPriceRollup.objects.order_by()
+                .filter(crop_id__in={key[0] for key in empty},
+                        region__in={key[1] for key in empty},
+                        bucket_start__in={key[3] for key in empty})
+                .values_list('id', 'crop_id', 'region', 'granularity', 'bucket_start')
+            )
+            stale_ids = [row[0] for row in existing if tuple(row[1:]) in empty]
+            if stale_ids:
+                MarketPriceRollup.objects.filter(id__in=stale_ids).delete()
+    invalidate_series(series)
+    return len(stats)
+
+
+def invalidate_series(series: Iterable[Tuple[int, str]]) -> None:
+    """Retire cached analytics for the given ``(crop_id, region)`` series once the write commits."""
+    series = set(series)
+    if not series:
+        return
+    names = dict(Crop.objects.filter(id__in={crop_id for crop_id, _ in series}).values_list('id', 'name'))
+    bump_on_commit(
+        series_scope(names[crop_id], region) for crop_id, region in series if crop_id in names
+    )
+
+
+def rebuild_all(price_model=MarketPrice, rollup_model=MarketPriceRollup, chunk_size: int = 20000) -> int:
+    """
+    Recompute every rollup from scratch, one series at a time so memory stays
+    bounded. Accepts historical models so data migrations can reuse it.
+    """
+    rows = (
+        price_model.objects.order_by('crop_id', 'region', 'date')
+        .values_list('crop_id', 'region', 'date', 'price')
+        .iterator(chunk_size=chunk_size)
+    )
+    written = 0
+    pending = []
+    with transaction.atomic():
+        rollup_model.objects.all().delete()
+        for _, series_rows in groupby(rows, key=itemgetter(0, 1)):
+            pending.extend(build_rollup_objects(aggregate_rows(series_rows), rollup_model))
+            if len(pending) >= chunk_size:
+                rollup_model.objects.bulk_create(pending, batch_size=chunk_size)
+                written += len(pending)
+                pending = []
+        if pending:
+            rollup_model.objects.bulk_create(pending, batch_size=chunk_size)
+            written += len(pending)
+    return written
+
+
+def _window_filter(start: Optional[date], end: Optional[date]) -> Q:
+    """
+    Select the fewest rollup rows that exactly cover ``[start, end]``: whole
+    months inside the window plus daily buckets for the partial months at
+    either edge. Open bounds extend to the ends of the series.
+    """
+    day = Q(granularity=RollupGranularity.DAY)
+    month = Q(granularity=RollupGranularity.MONTH)
+    if start is None and end is None:
+        return month
+
+    full_lo = None
+    if start is not None:
+        full_lo = start if start.day == 1 else next_month(start)
+    full_hi = month_start(end + timedelta(days=1)) if end is not None else None  # exclusive
+
+    if full_lo is not None and full_hi is not None and full_lo >= full_hi:
+        return day & Q(bucket_start__gte=start, bucket_start__lte=end)
+
+    months = month
+    if full_lo is not None:
+        months &= Q(bucket_start__gte=full_lo)
+    if full_hi is not None:
+        months &= Q(bucket_start__lt=full_hi)
+
+    window = months
+    if start is not None and start < full_lo:
+        window |= day & Q(bucket_start__gte=start, bucket_start__lt=full_lo)
+    if end is not None and full_hi <= end:
+        window |= day & Q(bucket_start__gte=full_hi, bucket_start__lte=end)
+    return window
+
+
+SUMMARY_FIELDS = (
+    'count', 'price_sum', 'min_price', 'max_price',
+    'first_date', 'first_price', 'last_date', 'last_price',
+)
+
+
+def _empty_summary() -> Dict:
+    return {
+        'count': 0, 'price_sum': Decimal('0'), 'min_price': None, 'max_price': None,
+        'first_date': None, 'first_price': None, 'last_date': None, 'last_price': None,
+    }
+
+
+def _fold(total: Dict, row) -> None:
+    count, price_sum, min_price, max_price, first_date, first_price, last_date, last_price = row
+    total['count'] += count
+    total['price_sum'] += price_sum
+    if total['min_price'] is None or min_price < total['min_price']:
+        total['min_price'] = min_price
+    if total['max_price'] is None or max_price > total['max_price']:
+        total['max_price'] = max_price
+    if total['first_date'] is None or first_date < total['first_date']:
+        total['first_date'], total['first_price'] = first_date, first_price
+    if total['last_date'] is None or last_date >= total['last_date']:
+        total['last_date'], total['last_price'] = last_date, last_price
+
+
+def _finish(total: Dict) -> Dict:
+    total['avg_price'] = total['price_sum'] / total['count'] if total['count'] else None
+    return total
+
+
+def series_key(crop_name: str, region: str) -> Tuple[str, str]:
+    """Case-insensitive identity of a series, matching the ``__iexact`` API filters."""
+    return crop_name.lower(), region.lower()
+
+
+def summarize(rollups, start: Optional[date] = None, end: Optional[date] = None) -> Dict:
+    """
+    Combine rollups (already filtered to the series of interest) into
+    count/avg/min/max/first/last over ``[start, end]`` in O(buckets).
+    """
+    total = _empty_summary()
+    for row in rollups.filter(_window_filter(start, end)).values_list(*SUMMARY_FIELDS):
+        _fold(total, row)
+    return _finish(total)
+
+
+def summarize_many(rollups, start: Optional[date] = None, end: Optional[date] = None) -> Dict[Tuple[str, str], Dict]:
+    """
+    Like :func:`summarize` for many series at once, keyed by :func:`series_key`.
+    All series are read in a single query.
+    """
+    totals: Dict[Tuple[str, str], Dict] = {}
+    rows = rollups.filter(_window_filter(start, end)).values_list('crop__name', 'region', *SUMMARY_FIELDS)
+    for crop_name, region, *row in rows.iterator(chunk_size=5000):
+        key = series_key(crop_name, region)
+        total = totals.get(key)
+        if total is None:
+            total = totals[key] = _empty_summary()
+        _fold(total, row)
+    return {key: _finish(total) for key, total in totals.items()}
+
+
+def _bucket_rows(rollups, granularity: str, start: Optional[date], end: Optional[date]):
+    qs = rollups.filter(granularity=granularity)
+    if start is not None:
+        # Keep the bucket that overlaps the start of the window
+        qs = qs.filter(bucket_start__gte=bucket_start(start, granularity))
+    if end is not None:
+        qs = qs.filter(bucket_start__lte=end)
+    return qs
+
+
+def _point(d: date, count: int, price_sum: Decimal) -> Dict:
+    return {'date': d.isoformat(), 'price': round(float(price_sum) / count, 2)}
+
+
+def bucket_points(rollups, start: Optional[date] = None, end: Optional[date] = None,
+                  granularity: str = RollupGranularity.DAY) -> List[Dict]:
+    """
+    ``{'date', 'price'}`` points, oldest first, one per bucket overlapping
+    ``[start, end]``. The price is the bucket's average, which for daily
+    buckets is the day's price.
+    """
+    qs = _bucket_rows(rollups, granularity, start, end)
+    return [
+        _point(d, count, price_sum)
+        for d, count, price_sum in qs.order_by('bucket_start', 'id').values_list('bucket_start', 'count', 'price_sum')
+    ]
+
+
+def bucket_points_many(rollups, start: Optional[date] = None, end: Optional[date] = None,
+                       granularity: str = RollupGranularity.DAY) -> Dict[Tuple[str, str], List[Dict]]:
+    """Per-series :func:`bucket_points` keyed by :func:`series_key`, read in a single query."""
+    points: Dict[Tuple[str, str], List[Dict]] = {}
+    rows = (
+        _bucket_rows(rollups, granularity, start, end)
+        .order_by('bucket_start', 'id')
+        .values_list('crop__name', 'region', 'bucket_start', 'count', 'price_sum')
+    )
+    for crop_name, region, d, count, price_sum in rows.iterator(chunk_size=5000):
+        points.setdefault(series_key(crop_name, region), []).append(_point(d, count, price_sum))
+    return points
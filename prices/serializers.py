@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import MarketPrice
+from .models import LatestMarketPrice, MarketPrice
 
 
 class MarketPriceSerializer(serializers.ModelSerializer):
@@ -9,3 +9,25 @@ class MarketPriceSerializer(serializers.ModelSerializer):
         model = MarketPrice
         fields = ['id', 'crop', 'crop_name', 'region', 'price', 'date', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
+
+
+class LatestMarketPriceSerializer(serializers.ModelSerializer):
+    crop_name = serializers.CharField(source='crop.name', read_only=True)
+    change = serializers.SerializerMethodField()
+    change_percent = serializers.SerializerMethodField()
+
+    class Meta:
+        model = LatestMarketPrice
+        fields = ['crop', 'crop_name', 'region', 'price', 'date', 'previous_price', 'previous_date',
+                  'change', 'change_percent']
+        read_only_fields = fields
+
+    def get_change(self, obj):
+        if obj.previous_price is None:
+            return None
+        return str(obj.price - obj.previous_price)
+
+    def get_change_percent(self, obj):
+        if not obj.previous_price:
+            return None
+        return round(float((obj.price - obj.previous_price) / obj.previous_price * 100), 2)
@@ -0,0 +1,56 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.cache_versions import bump_on_commit
+from crops.models import Crop
+from .models import MarketPrice
+from .latest import LATEST_SCOPE, merge_latest, refresh_latest
+from .rollups import refresh_for_keys
+
+
+def _key(instance):
+    return (instance.crop_id, instance.region, instance.date)
+
+
+@receiver(pre_save, sender=MarketPrice)
+def remember_previous_price_key(sender, instance, raw=False, **kwargs):
+    # An edit can move a price to another region or date; both buckets need refreshing.
+    instance._previous_price_key = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_price_key = (
+        MarketPrice.objects.filter(pk=instance.pk).values_list('crop_id', 'region', 'date').first()
+    )
+
+
+@receiver(post_save, sender=MarketPrice)
+def refresh_rollups_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    keys = {_key(instance)}
+    previous = getattr(instance, '_previous_price_key', None)
+    if previous:
+        keys.add(previous)
+    refresh_for_keys(keys)
+    if previous and previous != _key(instance):
+        # The old date or series lost this price, which only a re-read can tell
+        refresh_latest((crop_id, region) for crop_id, region, _ in keys)
+    else:
+        merge_latest([(instance.crop_id, instance.region, instance.date, instance.price)])
+
+
+@receiver(post_delete, sender=MarketPrice)
+def refresh_rollups_on_delete(sender, instance, origin=None, **kwargs):
+    # Rollups and latest prices cascade with their crop, so only direct price deletes need a refresh.
+    if origin is not None and not isinstance(origin, MarketPrice) and getattr(origin, 'model', None) is not MarketPrice:
+        return
+    refresh_for_keys({_key(instance)})
+    refresh_latest({(instance.crop_id, instance.region)})
+
+
+@receiver(post_save, sender=Crop)
+@receiver(post_delete, sender=Crop)
+def invalidate_latest_on_crop_change(sender, instance, raw=False, **kwargs):
+    # The ticker shows crop names, and its rows cascade with their crop.
+    if not raw:
+        bump_on_commit([LATEST_SCOPE])
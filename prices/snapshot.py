@@ -0,0 +1,202 @@
+"""
+Columnar, memory-mapped snapshot of the market price history.
+
+``build_price_snapshot`` writes every series back to back, in the same layout
+as :class:`~prices.analytics.PriceSeriesBatch`:
+
+- ``dates.i32``: int32 days since 1970-01-01
+- ``prices.f64``: float64 prices
+- ``index.json``: series keys, the canonical region id of each series and
+  the offsets of each series in both arrays
+
+Each build goes into its own directory and a ``CURRENT`` pointer file is
+swapped in atomically, so readers never see a half-written snapshot. Readers
+open the arrays with ``numpy.memmap``: every worker process maps the same
+files, the OS page cache holds one shared copy, and selecting a series is a
+slice rather than a query.
+"""
+import json
+import os
+import re
+import shutil
+import time
+from datetime import date
+from pathlib import Path
+from typing import Collection, Optional
+
+import numpy as np
+from django.conf import settings
+
+from .analytics import EPOCH_ORDINAL, PriceSeriesBatch, load_series
+from .models import MarketPrice
+
+SNAPSHOT_FORMAT = 2
+CURRENT_FILE = 'CURRENT'
+INDEX_FILE = 'index.json'
+DATES_FILE = 'dates.i32'
+PRICES_FILE = 'prices.f64'
+KEEP_BUILDS = 2
+BUILD_ID_PATTERN = re.compile(r'^\d{8}T\d{6}-\d{9}$')
+
+_open_snapshots = {}
+
+
+def get_snapshot_dir() -> Optional[Path]:
+    directory = getattr(settings, 'PRICE_SNAPSHOT_DIR', None)
+    return Path(directory) if directory else None
+
+
+def build_snapshot(directory: Path, queryset=None) -> dict:
+    """
+    Export ``queryset`` (all market prices by default) into a new snapshot
+    build under ``directory`` and make it current. Returns the index metadata.
+    """
+    if queryset is None:
+        queryset = MarketPrice.objects.all()
+    batch = load_series(queryset)
+    # Region filters match the canonical region, like the database path
+    region_ids = dict(queryset.order_by().values_list('region', 'canonical_region_id').distinct())
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    build_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{time.time_ns() % 10**9:09d}"
+    build_dir = directory / build_id
+    build_dir.mkdir()
+
+    batch.dates.astype(np.int32).tofile(build_dir / DATES_FILE)
+    batch.prices.astype(np.float64).tofile(build_dir / PRICES_FILE)
+    meta = {
+        'format': SNAPSHOT_FORMAT,
+        'build_id': build_id,
+        'built_at': time.time(),
+        'rows': int(batch.prices.shape[0]),
+        'keys': [list(key) for key in batch.keys],
+        'region_ids': [region_ids.get(key[2]) for key in batch.keys],
+        'offsets': batch.offsets.tolist(),
+    }
+    with open(build_dir / INDEX_FILE, 'w') as fh:
+        json.dump(meta, fh)
+
+    pointer = directory / f".{CURRENT_FILE}.{os.getpid()}"
+    pointer.write_text(build_id)
+    os.replace(pointer, directory / CURRENT_FILE)
+
+    # Mapped files stay readable after unlink, so older builds can go at once.
+    # Only finished builds are pruned: nothing else in the directory, and no
+    # build another process is still writing.
+    builds = sorted(
+        p for p in directory.iterdir()
+        if p.is_dir() and BUILD_ID_PATTERN.match(p.name) and (p / INDEX_FILE).is_file()
+    )
+    for old in builds[:-KEEP_BUILDS]:
+        if old.name != build_id:
+            shutil.rmtree(old, ignore_errors=True)
+    return meta
+
+
+class PriceSnapshot:
+    """A snapshot build opened read-only through ``numpy.memmap``."""
+
+    def __init__(self, build_dir: Path):
+        with open(build_dir / INDEX_FILE) as fh:
+            meta = json.load(fh)
+        if meta.get('format') != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported price snapshot format: {meta.get('format')}")
+        self.build_id = meta['build_id']
+        self.built_at = meta['built_at']
+        self.keys = [tuple(key) for key in meta['keys']]
+        self.region_ids = meta['region_ids']
+        self.offsets = np.asarray(meta['offsets'], dtype=np.int64)
+        rows = meta['rows']
+        # np.memmap refuses empty files, so an empty snapshot gets plain empty arrays
+        if rows:
+            self.dates = np.memmap(build_dir / DATES_FILE, dtype=np.int32, mode='r', shape=(rows,))
+            self.prices = np.memmap(build_dir / PRICES_FILE, dtype=np.float64, mode='r', shape=(rows,))
+        else:
+            self.dates = np.empty(0, dtype=np.int32)
+            self.prices = np.empty(0, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+    def select(self, crop_id: Optional[int] = None, crop_name: Optional[str] = None,
+               region_ids: Optional[Collection[int]] = None, date_after: Optional[date] = None,
+               date_before: Optional[date] = None) -> PriceSeriesBatch:
+        """
+        Series matching the list filters (crop names compared
+        case-insensitively, regions by canonical region id; an empty
+        ``region_ids`` matches nothing), trimmed to ``[date_after, date_before]``
+        with a binary search per series.
+        """
+        crop_name = crop_name.lower() if crop_name else None
+        lo_day = date_after.toordinal() - EPOCH_ORDINAL if date_after else None
+        hi_day = date_before.toordinal() - EPOCH_ORDINAL if date_before else None
+
+        keys, slices = [], []
+        for i, key in enumerate(self.keys):
+            if crop_id is not None and key[0] != crop_id:
+                continue
+            if crop_name is not None and key[1].lower() != crop_name:
+                continue
+            if region_ids is not None and self.region_ids[i] not in region_ids:
+                continue
+            lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+            dates = self.dates[lo:hi]
+            if lo_day is not None:
+                lo += int(np.searchsorted(dates, lo_day, side='left'))
+            if hi_day is not None:
+                hi = int(self.offsets[i]) + int(np.searchsorted(dates, hi_day, side='right'))
+            if hi > lo:
+                keys.append(key)
+                slices.append((lo, hi))
+
+        lengths = np.array([hi - lo for lo, hi in slices], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        if slices and all(slices[j][1] == slices[j + 1][0] for j in range(len(slices) - 1)):
+            # One contiguous range (a single series, or every series): a view, no copy
+            lo, hi = slices[0][0], slices[-1][1]
+            dates, prices = self.dates[lo:hi], self.prices[lo:hi]
+        elif slices:
+            dates = np.concatenate([self.dates[lo:hi] for lo, hi in slices])
+            prices = np.concatenate([self.prices[lo:hi] for lo, hi in slices])
+        else:
+            dates = np.empty(0, dtype=np.int32)
+            prices = np.empty(0, dtype=np.float64)
+        return PriceSeriesBatch(keys=keys, offsets=offsets, dates=dates, prices=prices)
+
+
+def open_snapshot(directory: Optional[Path] = None, max_age: Optional[float] = None) -> Optional[PriceSnapshot]:
+    """
+    The current snapshot, or None when there is none or it is older than
+    ``max_age`` seconds. Builds stay mapped for the life of the process, so
+    repeated calls cost one read of the ``CURRENT`` pointer.
+    """
+    directory = directory or get_snapshot_dir()
+    if directory is None:
+        return None
+    if max_age is None:
+        max_age = getattr(settings, 'PRICE_SNAPSHOT_MAX_AGE', None)
+    try:
+        build_id = (Path(directory) / CURRENT_FILE).read_text().strip()
+    except FileNotFoundError:
+        return None
+
+    cache_key = (str(directory), build_id)
+    snapshot = _open_snapshots.get(cache_key)
+    if snapshot is None:
+        try:
+            snapshot = PriceSnapshot(Path(directory) / build_id)
+        except (FileNotFoundError, ValueError):
+            # A build in an older format is ignored until the next build replaces it
+            return None
+        # Keep only the newest build per directory mapped
+        for key in [k for k in _open_snapshots if k[0] == cache_key[0]]:
+            del _open_snapshots[key]
+        _open_snapshots[cache_key] = snapshot
+
+    if max_age is not None and snapshot.age() > max_age:
+        return None
+    return snapshot
@@ -1,11 +1,37 @@
+import gzip
+import json
+import shutil
+import tempfile
 from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.test import TestCase
+from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
 from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
 
 from crops.models import Crop, Season
-from prices.models import MarketPrice
+from prices.analytics import load_series, rolling_stats
+from prices.downsample import lttb_indices
+from prices.ingest import upsert_batch
+from prices.latest import rebuild_latest
+from prices.locks import series_lock_id
+from prices.models import LatestMarketPrice, MarketPrice, MarketPriceRollup, RollupGranularity
+from prices.rollups import rebuild_all
+from prices.snapshot import open_snapshot
+from regions.models import Region, RegionAlias
+
+User = get_user_model()
 
 
 class MarketPriceAPITest(APITestCase):
@@ -69,3 +95,673 @@ class MarketPriceAPITest(APITestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         dates = {item['date'] for item in res.data['results']}
         self.assertTrue(all(start <= d <= end for d in dates))
+
+
+class MarketPriceBulkIngestTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ingest', email='ingest@example.com', password='pass12345')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.maize = Crop.objects.create(
+            name="Maize",
+            season=Season.MAJOR,
+            soil_type="loamy",
+            regions=["Nairobi"],
+            recommended_inputs={},
+            maturity_days=120,
+        )
+        self.url = reverse('marketprice-bulk')
+
+    def auth(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def test_requires_authentication(self):
+        res = self.client.post(self.url, data="crop,region,price,date\n", content_type='text/csv')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_csv_upsert_and_rejections(self):
+        self.auth()
+        body = (
+            "crop,region,price,date\n"
+            "Maize,Nairobi,100.50,2024-01-01\n"
+            f"{self.maize.id},Nairobi,101.00,2024-01-02\n"
+            "Unknown,Nairobi,10,2024-01-01\n"
+            "maize,Kisumu,abc,2024-01-01\n"
+            "Maize,Kisumu,90,2024-01-03\n"
+        )
+        res = self.client.post(f"{self.url}?batch_size=2", data=body, content_type='text/csv')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        data = res.json()['data']
+        self.assertEqual(data['totals'], {'received': 5, 'upserted': 3, 'rejected': 2})
+        self.assertEqual(len(data['batches']), 3)
+        self.assertEqual([r['line'] for r in data['rejected_rows']], [4, 5])
+        self.assertIn('crop', data['rejected_rows'][0]['errors'])
+        self.assertIn('price', data['rejected_rows'][1]['errors'])
+        self.assertEqual(MarketPrice.objects.count(), 3)
+
+    def test_ndjson_updates_existing_rows(self):
+        MarketPrice.objects.create(crop=self.maize, region="Nairobi", price=50, date=date(2024, 1, 1))
+        self.auth()
+        body = (
+            '{"crop": "Maize", "region": "Nairobi", "price": "75.25", "date": "2024-01-01"}\n'
+            '\n'
+            'not json\n'
+            '{"crop": "Maize", "region": "Nairobi", "price": 80, "date": "2024-01-02"}\n'
+        )
+        res = self.client.post(self.url, data=body, content_type='application/x-ndjson')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        data = res.json()['data']
+        self.assertEqual(data['totals']['upserted'], 2)
+        self.assertEqual(data['rejected_rows'][0]['line'], 3)
+        self.assertEqual(MarketPrice.objects.count(), 2)
+        self.assertEqual(
+            str(MarketPrice.objects.get(crop=self.maize, region="Nairobi", date=date(2024, 1, 1)).price),
+            '75.25'
+        )
+
+    def test_unsupported_content_type(self):
+        self.auth()
+        res = self.client.post(self.url, data={'crop': 'Maize'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+
+class SeedMarketPricesCommandTest(TestCase):
+    def test_seeds_requested_grid_and_is_idempotent(self):
+        call_command('seed_market_prices', days=3, crops=6, regions=7, batch_size=4, stdout=StringIO())
+        self.assertEqual(Crop.objects.count(), 6)
+        self.assertEqual(MarketPrice.objects.count(), 6 * 7 * 3)
+        first = list(MarketPrice.objects.order_by('crop_id', 'region', 'date').values_list('price', flat=True))
+
+        # Re-running upserts the same deterministic values instead of duplicating rows
+        call_command('seed_market_prices', days=3, crops=6, regions=7, batch_size=50, stdout=StringIO())
+        self.assertEqual(MarketPrice.objects.count(), 6 * 7 * 3)
+        second = list(MarketPrice.objects.order_by('crop_id', 'region', 'date').values_list('price', flat=True))
+        self.assertEqual(first, second)
+
+    def test_matches_existing_crops_case_insensitively(self):
+        maize = Crop.objects.create(
+            name="maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Nairobi"], recommended_inputs={}, maturity_days=120,
+        )
+        call_command('seed_market_prices', days=2, crops=2, regions=1, stdout=StringIO())
+        self.assertEqual(sorted(Crop.objects.values_list('name', flat=True)), ["Beans", "maize"])
+        self.assertEqual(MarketPrice.objects.filter(crop=maize).count(), 2)
+
+    def test_clear_empties_prices_and_derived_tables(self):
+        call_command('seed_market_prices', days=3, crops=2, regions=2, stdout=StringIO())
+        maize = Crop.objects.get(name="Maize")
+        MarketPrice.objects.create(crop=maize, region="Elsewhere", price=Decimal("5.00"), date=date(2020, 1, 1))
+        self.assertTrue(LatestMarketPrice.objects.filter(region="Elsewhere").exists())
+
+        call_command('seed_market_prices', days=2, crops=1, regions=1, clear=True, stdout=StringIO())
+        self.assertEqual(MarketPrice.objects.count(), 2)
+        self.assertFalse(MarketPrice.objects.filter(region="Elsewhere").exists())
+        self.assertFalse(LatestMarketPrice.objects.filter(region="Elsewhere").exists())
+        self.assertFalse(MarketPriceRollup.objects.filter(region="Elsewhere").exists())
+
+
+class MarketPriceRollupTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.maize = Crop.objects.create(
+            name="Maize",
+            season=Season.MAJOR,
+            soil_type="loamy",
+            regions=["Nairobi"],
+            recommended_inputs={},
+            maturity_days=120,
+        )
+        self.url = reverse('marketprice-analytics')
+
+    def add(self, d, price, region="Nairobi"):
+        return MarketPrice.objects.create(crop=self.maize, region=region, price=price, date=d)
+
+    def test_rollups_follow_saves_updates_and_deletes(self):
+        p1 = self.add(date(2024, 1, 30), 10)
+        self.add(date(2024, 1, 31), 20)
+        self.add(date(2024, 2, 1), 30)
+
+        jan = MarketPriceRollup.objects.get(granularity=RollupGranularity.MONTH, bucket_start=date(2024, 1, 1))
+        self.assertEqual((jan.count, jan.price_sum, jan.min_price, jan.max_price), (2, 30, 10, 20))
+        self.assertEqual((jan.first_price, jan.last_price), (10, 20))
+        # 2024-01-29 is a Monday; the week spans both months
+        week = MarketPriceRollup.objects.get(granularity=RollupGranularity.WEEK, bucket_start=date(2024, 1, 29))
+        self.assertEqual(week.count, 3)
+
+        # Moving a price to another month refreshes both the old and new buckets
+        p1.date = date(2024, 2, 2)
+        p1.price = 5
+        p1.save()
+        jan.refresh_from_db()
+        self.assertEqual((jan.count, jan.min_price), (1, 20))
+        self.assertFalse(MarketPriceRollup.objects.filter(granularity=RollupGranularity.DAY, bucket_start=date(2024, 1, 30)).exists())
+        feb = MarketPriceRollup.objects.get(granularity=RollupGranularity.MONTH, bucket_start=date(2024, 2, 1))
+        self.assertEqual((feb.count, feb.min_price, feb.last_price), (2, 5, 5))
+
+        p1.delete()
+        feb.refresh_from_db()
+        self.assertEqual(feb.count, 1)
+
+    def test_bulk_upsert_refreshes_rollups_and_matches_rebuild(self):
+        upsert_batch([
+            MarketPrice(crop=self.maize, region="Nairobi", price=Decimal(str(p)), date=date(2024, 3, 1) + timedelta(days=i))
+            for i, p in enumerate([10, 12, 14, 9, 11] * 10)
+        ])
+        incremental = set(MarketPriceRollup.objects.values_list('granularity', 'bucket_start', 'count', 'price_sum', 'min_price', 'max_price'))
+        rebuild_all()
+        rebuilt = set(MarketPriceRollup.objects.values_list('granularity', 'bucket_start', 'count', 'price_sum', 'min_price', 'max_price'))
+        self.assertEqual(incremental, rebuilt)
+
+    def test_analytics_window_matches_raw_rows(self):
+        start = date(2024, 1, 20)
+        for i in range(70):
+            self.add(start + timedelta(days=i), 50 + (i * 7) % 13)
+
+        for after, before in [(None, None), ('2024-01-25', '2024-03-10'), ('2024-02-01', '2024-02-29'), ('2024-02-05', '2024-02-06')]:
+            params = {'crop_name': 'maize', 'region': 'nairobi'}
+            raw = MarketPrice.objects.filter(crop=self.maize)
+            if after:
+                params['date_after'] = after
+                raw = raw.filter(date__gte=after)
+            if before:
+                params['date_before'] = before
+                raw = raw.filter(date__lte=before)
+            res = self.client.get(self.url, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            analytics = res.json()['data']['analytics']
+            prices = [float(p) for p in raw.values_list('price', flat=True)]
+            self.assertEqual(analytics['total_records'], len(prices))
+            self.assertEqual(analytics['highest_price'], max(prices))
+            self.assertEqual(analytics['lowest_price'], min(prices))
+            self.assertAlmostEqual(analytics['average_price'], round(sum(prices) / len(prices), 2))
+
+
+class MarketPriceCursorPaginationTest(APITestCase):
+    def setUp(self):
+        self.maize = Crop.objects.create(
+            name="Maize",
+            season=Season.MAJOR,
+            soil_type="loamy",
+            regions=["Nairobi", "Kisumu"],
+            recommended_inputs={},
+            maturity_days=120,
+        )
+        today = date.today()
+        # Several rows share each date so the id tie-breaker is exercised
+        for i in range(8):
+            for region in ("Nairobi", "Kisumu", "Mombasa"):
+                MarketPrice.objects.create(crop=self.maize, region=region, price=100 + i, date=today - timedelta(days=i))
+        self.list_url = reverse('marketprice-list')
+
+    def test_walks_all_rows_in_order_without_duplicates(self):
+        expected = list(MarketPrice.objects.order_by('-date', '-id').values_list('id', flat=True))
+        seen = []
+        res = self.client.get(self.list_url, {'cursor': '', 'page_size': 5})
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            data = res.json()['data']
+            self.assertIsNone(data['count'])
+            seen.extend(item['id'] for item in data['results'])
+            if not data['next']:
+                break
+            res = self.client.get(data['next'])
+        self.assertEqual(seen, expected)
+
+    def test_page_is_a_single_query_and_count_is_opt_in(self):
+        with self.assertNumQueries(1):
+            res = self.client.get(self.list_url, {'cursor': '', 'region': 'Nairobi'})
+        self.assertEqual(len(res.json()['data']['results']), 8)
+
+        res = self.client.get(self.list_url, {'cursor': '', 'page_size': 2, 'count': 'true'})
+        self.assertEqual(res.json()['data']['count'], 24)
+
+    def test_invalid_cursor(self):
+        res = self.client.get(self.list_url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MarketPriceBatchAnalyticsTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Nairobi", "Kisumu"], recommended_inputs={}, maturity_days=120,
+        )
+        self.beans = Crop.objects.create(
+            name="Beans", season=Season.MINOR, soil_type="clay",
+            regions=["Nairobi"], recommended_inputs={}, maturity_days=90,
+        )
+        today = date.today()
+        for i in range(5):
+            MarketPrice.objects.create(crop=self.maize, region="Nairobi", price=100 + i, date=today - timedelta(days=i))
+            MarketPrice.objects.create(crop=self.maize, region="Kisumu", price=90 + i, date=today - timedelta(days=i))
+            MarketPrice.objects.create(crop=self.beans, region="Nairobi", price=50 + i, date=today - timedelta(days=i))
+        self.url = reverse('marketprice-analytics-batch')
+        self.single_url = reverse('marketprice-analytics')
+
+    def test_matches_single_pair_endpoint(self):
+        res = self.client.get(self.url, {'crops': 'Maize,Beans', 'regions': 'Nairobi,Kisumu'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        data = res.json()['data']
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(data['no_data'], [{'crop': 'Beans', 'region': 'Kisumu'}])
+
+        by_pair = {(r['crop'], r['region']): r for r in data['results']}
+        cache.clear()
+        single = self.client.get(self.single_url, {'crop_name': 'Maize', 'region': 'Kisumu'}).json()['data']
+        self.assertEqual(by_pair[('Maize', 'Kisumu')], single)
+        self.assertEqual(len(single['recent_trend']), 5)
+
+    def test_reuses_cache_written_by_single_pair_endpoint(self):
+        self.client.get(self.single_url, {'crop_name': 'Maize', 'region': 'Nairobi'})
+        res = self.client.get(self.url, {'crops': 'maize', 'regions': 'nairobi,kisumu'})
+        self.assertEqual(res.json()['data']['cache'], {'hits': 1, 'misses': 1})
+
+        res = self.client.get(self.single_url, {'crop_name': 'maize', 'region': 'kisumu'})
+        self.assertIn('cached', res.json()['message'])
+
+    def test_all_expands_to_pairs_with_data(self):
+        res = self.client.get(self.url, {'crops': 'all', 'regions': 'all'})
+        pairs = {(r['crop'], r['region']) for r in res.json()['data']['results']}
+        self.assertEqual(pairs, {('Maize', 'Nairobi'), ('Maize', 'Kisumu'), ('Beans', 'Nairobi')})
+
+    def test_requires_crops_and_regions(self):
+        res = self.client.get(self.url, {'crops': 'Maize'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PriceTrendDownsamplingTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Nairobi"], recommended_inputs={}, maturity_days=120,
+        )
+        today = date.today()
+        upsert_batch([
+            MarketPrice(crop=self.maize, region="Nairobi", price=Decimal(100 + (i % 7)), date=today - timedelta(days=i))
+            for i in range(400)
+        ])
+        self.url = reverse('marketprice-analytics')
+
+    def test_lttb_keeps_endpoints_and_extremes(self):
+        x = np.arange(1000, dtype=float)
+        y = np.sin(x / 50.0)
+        y[437] = 25.0
+        idx = lttb_indices(x, y, 50)
+        self.assertEqual(len(idx), 50)
+        self.assertEqual((idx[0], idx[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(idx) > 0))
+        self.assertIn(437, idx)
+        # Short series are returned untouched
+        self.assertEqual(list(lttb_indices(x[:10], y[:10], 50)), list(range(10)))
+
+    def test_weekly_resolution_averages_buckets(self):
+        res = self.client.get(self.url, {'crop_name': 'Maize', 'region': 'Nairobi', 'resolution': 'week', 'trend_days': 365})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        trend = res.json()['data']['recent_trend']
+        self.assertTrue(53 <= len(trend) <= 54)
+        week = MarketPriceRollup.objects.get(granularity=RollupGranularity.WEEK, bucket_start=date.fromisoformat(trend[5]['date']))
+        self.assertAlmostEqual(trend[5]['price'], round(float(week.price_sum) / week.count, 2))
+
+    def test_max_points_downsamples_daily_trend(self):
+        res = self.client.get(self.url, {'crop_name': 'Maize', 'region': 'Nairobi', 'trend_days': 365, 'max_points': 40})
+        trend = res.json()['data']['recent_trend']
+        self.assertEqual(len(trend), 40)
+        self.assertEqual(trend[-1]['date'], date.today().isoformat())
+
+    def test_invalid_trend_parameters(self):
+        res = self.client.get(self.url, {'crop_name': 'Maize', 'region': 'Nairobi', 'resolution': 'hour'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.get(self.url, {'crop_name': 'Maize', 'region': 'Nairobi', 'max_points': '2'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PriceStatsEngineTest(APITestCase):
+    def setUp(self):
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Nairobi", "Kisumu"], recommended_inputs={}, maturity_days=120,
+        )
+        rng = np.random.default_rng(7)
+        start = date(2024, 1, 1)
+        self.raw = {}
+        rows = []
+        for region, length in (("Kisumu", 12), ("Nairobi", 40)):
+            prices = np.round(100 + np.cumsum(rng.normal(0, 2, length)), 2)
+            self.raw[region] = prices
+            rows.extend(
+                MarketPrice(crop=self.maize, region=region, price=Decimal(str(p)), date=start + timedelta(days=i))
+                for i, p in enumerate(prices)
+            )
+        upsert_batch(rows)
+        self.url = reverse('marketprice-stats')
+
+    def test_matches_naive_per_series_computation(self):
+        batch = load_series(MarketPrice.objects.all())
+        self.assertEqual([key[2] for key in batch.keys], ["Kisumu", "Nairobi"])
+        stats = rolling_stats(batch, windows=(5,))
+        for i, (_, _, region) in enumerate(batch.keys):
+            lo, hi = batch.offsets[i], batch.offsets[i + 1]
+            prices = self.raw[region]
+            returns = prices[1:] / prices[:-1] - 1
+            for j in range(len(prices)):
+                ma = stats['ma_5'][lo + j]
+                vol = stats['volatility_5'][lo + j]
+                p90 = stats['p90_5'][lo + j]
+                if j < 4:
+                    self.assertTrue(np.isnan(ma) and np.isnan(p90))
+                else:
+                    self.assertAlmostEqual(ma, prices[j - 4:j + 1].mean())
+                    self.assertAlmostEqual(p90, np.percentile(prices[j - 4:j + 1], 90))
+                if j < 5:
+                    self.assertTrue(np.isnan(vol))
+                else:
+                    self.assertAlmostEqual(vol, returns[j - 5:j].std(ddof=1))
+            self.assertTrue(np.isnan(stats['pct_change'][lo]))
+
+    def test_stats_endpoint(self):
+        res = self.client.get(self.url, {'crop_name': 'Maize', 'region': 'Nairobi', 'windows': '3,7', 'tail': 10})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        data = res.json()['data']
+        self.assertEqual(data['windows'], [3, 7])
+        series = data['series'][0]
+        self.assertEqual((series['region'], series['count'], len(series['dates'])), ("Nairobi", 40, 10))
+        self.assertEqual(series['dates'][-1], '2024-02-09')
+        self.assertAlmostEqual(series['ma_3'][-1], round(self.raw["Nairobi"][-3:].mean(), 4))
+        for key in ('pct_change', 'volatility_7', 'p10_7', 'p50_7', 'p90_7'):
+            self.assertEqual(len(series[key]), 10)
+
+        res = self.client.get(self.url, {'windows': '0'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_zero_price_does_not_poison_later_rows(self):
+        MarketPrice.objects.filter(region="Kisumu", date=date(2024, 1, 3)).update(price=Decimal("0.00"))
+        batch = load_series(MarketPrice.objects.all())
+        stats = rolling_stats(batch, windows=(3,))
+        kisumu = slice(batch.offsets[0], batch.offsets[1])
+        self.assertTrue(np.isinf(stats['pct_change'][kisumu][3]))
+        # Rows whose window has left the zero, and the other series, are unaffected
+        self.assertTrue(np.isfinite(stats['volatility_3'][kisumu][7:]).all())
+        nairobi = slice(batch.offsets[1], batch.offsets[2])
+        self.assertTrue(np.isfinite(stats['volatility_3'][nairobi][3:]).all())
+
+        res = self.client.get(self.url, {'crop_name': 'Maize', 'region': 'Kisumu', 'windows': '3'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        series = res.json()['data']['series'][0]
+        self.assertIsNone(series['pct_change'][3])
+        self.assertEqual(series['price'][2], 0.0)
+
+
+class MarketPriceExportTest(APITestCase):
+    def setUp(self):
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Nairobi", "Kisumu"], recommended_inputs={}, maturity_days=120,
+        )
+        today = date.today()
+        for i in range(5):
+            MarketPrice.objects.create(crop=self.maize, region="Nairobi", price=100 + i, date=today - timedelta(days=i))
+            MarketPrice.objects.create(crop=self.maize, region="Kisumu", price=90 + i, date=today - timedelta(days=i))
+        self.url = reverse('marketprice-export')
+
+    def read(self, res):
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return b''.join(res.streaming_content)
+
+    def test_csv_applies_list_filters(self):
+        res = self.client.get(self.url, {'format': 'csv', 'region': 'kisumu'})
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        lines = self.read(res).decode().splitlines()
+        self.assertEqual(lines[0], 'id,crop,crop_name,region,price,date')
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(all(',Maize,Kisumu,' in line for line in lines[1:]))
+        self.assertIn(f",90.00,{date.today().isoformat()}", lines[1])
+
+    def test_ndjson_gzip(self):
+        res = self.client.get(self.url, {'format': 'ndjson', 'gzip': 'true'})
+        self.assertEqual(res['Content-Type'], 'application/gzip')
+        rows = [json.loads(line) for line in gzip.decompress(self.read(res)).decode().splitlines()]
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(set(rows[0]), {'id', 'crop', 'crop_name', 'region', 'price', 'date'})
+
+    def test_unknown_format(self):
+        res = self.client.get(self.url, {'format': 'xml'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PriceCacheInvalidationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Nairobi", "Kisumu"], recommended_inputs={}, maturity_days=120,
+        )
+        self.today = date.today()
+        with self.captureOnCommitCallbacks(execute=True):
+            MarketPrice.objects.create(crop=self.maize, region="Nairobi", price=100, date=self.today - timedelta(days=1))
+            MarketPrice.objects.create(crop=self.maize, region="Kisumu", price=80, date=self.today - timedelta(days=1))
+        self.url = reverse('marketprice-analytics')
+
+    def analytics(self, region):
+        res = self.client.get(self.url, {'crop_name': 'maize', 'region': region})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res
+
+    def test_price_write_retires_only_its_series(self):
+        self.analytics('Nairobi')
+        self.analytics('Kisumu')
+        self.assertIn('(cached)', self.analytics('Kisumu').data['message'])
+        self.assertIn('(cached)', self.analytics('Nairobi').data['message'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MarketPrice.objects.create(crop=self.maize, region="Nairobi", price=120, date=self.today)
+
+        res = self.analytics('Nairobi')
+        self.assertNotIn('(cached)', res.data['message'])
+        self.assertEqual(res.data['data']['analytics']['highest_price'], 120.0)
+        self.assertIn('(cached)', self.analytics('Kisumu').data['message'])
+
+    def test_bulk_upsert_retires_series(self):
+        self.analytics('Kisumu')
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_batch([MarketPrice(crop=self.maize, region="Kisumu", price=60, date=self.today)])
+        res = self.analytics('Kisumu')
+        self.assertNotIn('(cached)', res.data['message'])
+        self.assertEqual(res.data['data']['analytics']['lowest_price'], 60.0)
+
+    def test_crop_rename_retires_old_name(self):
+        self.analytics('Nairobi')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.maize.name = "Corn"
+            self.maize.save()
+        res = self.client.get(self.url, {'crop_name': 'maize', 'region': 'Nairobi'})
+        self.assertIsNone(res.data['data'])
+
+
+class LatestMarketPriceTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Nairobi", "Kisumu"], recommended_inputs={}, maturity_days=120,
+        )
+        self.today = date.today()
+        MarketPrice.objects.create(crop=self.maize, region="Nairobi", price=100, date=self.today - timedelta(days=2))
+        MarketPrice.objects.create(crop=self.maize, region="Nairobi", price=110, date=self.today - timedelta(days=1))
+        MarketPrice.objects.create(crop=self.maize, region="Kisumu", price=80, date=self.today - timedelta(days=1))
+        self.url = reverse('marketprice-latest')
+
+    def snapshot(self):
+        return {
+            row.region: (row.date, row.price, row.previous_date, row.previous_price)
+            for row in LatestMarketPrice.objects.all()
+        }
+
+    def test_snapshot_follows_writes(self):
+        nairobi = self.snapshot()['Nairobi']
+        self.assertEqual(nairobi, (self.today - timedelta(days=1), Decimal('110.00'),
+                                   self.today - timedelta(days=2), Decimal('100.00')))
+        self.assertEqual(self.snapshot()['Kisumu'][2:], (None, None))
+
+        upsert_batch([MarketPrice(crop=self.maize, region="Kisumu", price=Decimal('88'), date=self.today)])
+        self.assertEqual(self.snapshot()['Kisumu'][1::2], (Decimal('88.00'), Decimal('80.00')))
+
+        MarketPrice.objects.filter(region="Nairobi", date=self.today - timedelta(days=1)).get().delete()
+        self.assertEqual(self.snapshot()['Nairobi'][1:], (Decimal('100.00'), None, None))
+
+        MarketPrice.objects.get(region="Nairobi").delete()
+        self.assertNotIn('Nairobi', self.snapshot())
+
+    def test_merge_reads_no_history(self):
+        day = lambda n: self.today - timedelta(days=n)
+        rows = [
+            MarketPrice(crop=self.maize, region="Nairobi", price=Decimal('95'), date=day(5)),
+            MarketPrice(crop=self.maize, region="Nairobi", price=Decimal('105'), date=day(2)),
+            MarketPrice(crop=self.maize, region="Kisumu", price=Decimal('70'), date=day(3)),
+            MarketPrice(crop=self.maize, region="Kisumu", price=Decimal('90'), date=self.today),
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            upsert_batch(rows)
+        self.assertFalse([q for q in queries.captured_queries if 'ROW_NUMBER' in q['sql'].upper()])
+        self.assertEqual(self.snapshot(), {
+            'Nairobi': (day(1), Decimal('110.00'), day(2), Decimal('105.00')),
+            'Kisumu': (self.today, Decimal('90.00'), day(1), Decimal('80.00')),
+        })
+        merged = self.snapshot()
+        rebuild_latest()
+        self.assertEqual(self.snapshot(), merged)
+
+    def test_writers_lock_the_series_before_reading_it(self):
+        locks = []
+        with CaptureQueriesContext(connection) as queries:
+            def lock(sql, params):
+                locks.append((len(queries.captured_queries), params[0]))
+
+            fake = mock.MagicMock(vendor='postgresql')
+            fake.cursor.return_value.__enter__.return_value.execute.side_effect = lock
+            with mock.patch('prices.locks.connection', fake):
+                upsert_batch([MarketPrice(crop=self.maize, region="Nairobi", price=Decimal('120'), date=self.today)])
+        # Rollups, then the latest snapshot
+        self.assertEqual([ids for _, ids in locks], [[series_lock_id(self.maize.id, "Nairobi")]] * 2)
+        sql = [q['sql'] for q in queries.captured_queries]
+        prices_read = next(i for i, q in enumerate(sql) if q.startswith('SELECT') and '"prices_marketprice"."price"' in q)
+        latest_read = next(i for i, q in enumerate(sql) if q.startswith('SELECT') and 'prices_latestmarketprice' in q)
+        self.assertGreaterEqual(prices_read, locks[0][0])
+        self.assertGreaterEqual(latest_read, locks[1][0])
+
+    def test_moving_a_price_rereads_the_series(self):
+        price = MarketPrice.objects.get(region="Nairobi", date=self.today - timedelta(days=1))
+        price.date = self.today - timedelta(days=9)
+        price.save()
+        self.assertEqual(self.snapshot()['Nairobi'], (self.today - timedelta(days=2), Decimal('100.00'),
+                                                      self.today - timedelta(days=9), Decimal('110.00')))
+
+    def test_rebuild_matches_incremental(self):
+        before = self.snapshot()
+        LatestMarketPrice.objects.all().delete()
+        rebuild_latest()
+        self.assertEqual(self.snapshot(), before)
+
+    def test_endpoint_reports_change(self):
+        res = self.client.get(self.url, {'crop_name': 'maize'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        rows = {row['region']: row for row in res.data['data']['results']}
+        self.assertEqual(rows['Nairobi']['price'], '110.00')
+        self.assertEqual(rows['Nairobi']['change'], '10.00')
+        self.assertEqual(rows['Nairobi']['change_percent'], 10.0)
+        self.assertIsNone(rows['Kisumu']['change'])
+
+    def test_etag_revalidation(self):
+        res = self.client.get(self.url)
+        etag = res['ETag']
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MarketPrice.objects.create(crop=self.maize, region="Kisumu", price=70, date=self.today)
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        rows = {row['region']: row for row in res.data['data']['results']}
+        self.assertEqual(rows['Kisumu']['price'], '70.00')
+
+
+class PriceSnapshotTest(APITestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Nairobi", "Kisumu"], recommended_inputs={}, maturity_days=120,
+        )
+        start = date(2024, 1, 1)
+        upsert_batch([
+            MarketPrice(crop=self.maize, region=region, price=Decimal(100 + i + offset), date=start + timedelta(days=i))
+            for region, offset in (("Kisumu", 0), ("Nairobi", 50))
+            for i in range(20)
+        ])
+        self.url = reverse('marketprice-stats')
+
+    def build(self):
+        out = StringIO()
+        call_command('build_price_snapshot', output=self.tmp, stdout=out)
+        self.assertIn('40 rows in 2 series', out.getvalue())
+        return open_snapshot(Path(self.tmp), max_age=3600)
+
+    def test_select_matches_database(self):
+        snapshot = self.build()
+        self.assertIsInstance(snapshot.prices, np.memmap)
+        nairobi = Region.objects.get(slug='nairobi').id
+        filters = {'region_ids': {nairobi}, 'date_after': date(2024, 1, 5), 'date_before': date(2024, 1, 10)}
+        batch = snapshot.select(**filters)
+        expected = load_series(MarketPrice.objects.filter(
+            region__iexact='nairobi', date__gte=date(2024, 1, 5), date__lte=date(2024, 1, 10)
+        ))
+        self.assertEqual(batch.keys, expected.keys)
+        np.testing.assert_array_equal(batch.offsets, expected.offsets)
+        np.testing.assert_array_equal(batch.dates, expected.dates)
+        np.testing.assert_array_equal(batch.prices, expected.prices)
+        self.assertEqual(len(snapshot.select(crop_name='beans')), 0)
+        self.assertEqual(len(snapshot.select(region_ids=set())), 0)
+
+    def test_prunes_only_old_builds(self):
+        other = Path(self.tmp) / 'notes'
+        other.mkdir()
+        unfinished = Path(self.tmp) / '20000101T000000-000000000'
+        unfinished.mkdir()
+        for _ in range(3):
+            current = self.build().build_id
+        builds = sorted(p.name for p in Path(self.tmp).iterdir() if p.is_dir())
+        self.assertEqual(len(builds), 4)
+        self.assertIn('notes', builds)
+        self.assertIn(unfinished.name, builds)
+        self.assertIn(current, builds)
+
+    def test_stats_endpoint_reads_snapshot(self):
+        with self.settings(PRICE_SNAPSHOT_DIR=self.tmp, PRICE_SNAPSHOT_MAX_AGE=3600):
+            res = self.client.get(self.url, {'windows': '5', 'region': 'Kisumu'})
+            self.assertEqual(res.data['data']['source'], 'database')
+            from_db = res.data['data']['series']
+
+            self.build()
+            res = self.client.get(self.url, {'windows': '5', 'region': 'Kisumu'})
+            self.assertEqual(res.data['data']['source'], 'snapshot')
+            self.assertEqual(res.data['data']['series'], from_db)
+
+            RegionAlias.objects.create(region=Region.objects.get(slug='kisumu'), key='ksm')
+            res = self.client.get(self.url, {'windows': '5', 'region': 'KSM'})
+            self.assertEqual(res.data['data']['source'], 'snapshot')
+            self.assertEqual(res.data['data']['series'], from_db)
+
+        with self.settings(PRICE_SNAPSHOT_DIR=self.tmp, PRICE_SNAPSHOT_MAX_AGE=0):
+            res = self.client.get(self.url, {'windows': '5'})
+            self.assertEqual(res.data['data']['source'], 'database')
+
+    def test_rebuild_swaps_current_build(self):
+        first = self.build()
+        MarketPrice.objects.create(crop=self.maize, region="Kisumu", price=90, date=date(2024, 2, 1))
+        out = StringIO()
+        call_command('build_price_snapshot', output=self.tmp, stdout=out)
+        second = open_snapshot(Path(self.tmp), max_age=3600)
+        self.assertNotEqual(first.build_id, second.build_id)
+        self.assertEqual(second.prices.shape[0], 41)
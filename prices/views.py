@@ -1,20 +1,161 @@
 from django.utils.dateparse import parse_date
-from django.db.models import Q, Avg, Max, Min, Count
+from django.db.models.functions import Lower
 from django.core.cache import cache
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.utils.cache import quote_etag
+from django.utils.http import parse_etags
 from datetime import timedelta
 from rest_framework import mixins, viewsets, status
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound, ValidationError
+import csv
+import hashlib
 import logging
 
+from core import single_flight
+from core.cache_versions import crop_scope, get_generations, series_scope, stale_key, versioned_key
 from core.exceptions import APIResponse
-from .models import MarketPrice
-from .serializers import MarketPriceSerializer
+from regions.resolver import matching_region_ids
+from .latest import LATEST_SCOPE
+from .models import LatestMarketPrice, MarketPrice, MarketPriceRollup, RollupGranularity
+from .serializers import LatestMarketPriceSerializer, MarketPriceSerializer
+from .pagination import MarketPriceKeysetPagination
+from .snapshot import open_snapshot
+from . import export, ingest, rollups
+from .analytics import DEFAULT_PERCENTILES, DEFAULT_WINDOWS, load_series, rolling_stats, serialize_series
+from .downsample import downsample_points
 
 logger = logging.getLogger(__name__)
 
+# Entries are retired by generation bumps on every write, so they can live long
+ANALYTICS_CACHE_TIMEOUT = getattr(settings, 'PRICE_ANALYTICS_CACHE_TIMEOUT', 86400)
+ANALYTICS_TREND_DAYS = 30
+
+
+TREND_RESOLUTIONS = (RollupGranularity.DAY, RollupGranularity.WEEK, RollupGranularity.MONTH)
+MAX_TREND_DAYS = 36500
+MAX_STATS_WINDOWS = 5
+MAX_STATS_WINDOW = 365
+
+
+def parse_trend_options(params):
+    """
+    Read ``resolution``, ``max_points`` and ``trend_days`` from query params.
+
+    Returns ``(options, errors)``; ``errors`` is a details dict when invalid.
+    """
+    errors = {}
+    resolution = (params.get('resolution') or RollupGranularity.DAY).lower()
+    if resolution not in TREND_RESOLUTIONS:
+        errors['resolution'] = [f"Must be one of: {', '.join(TREND_RESOLUTIONS)}"]
+
+    max_points = params.get('max_points')
+    if max_points:
+        try:
+            max_points = int(max_points)
+            if max_points < 3:
+                raise ValueError
+        except ValueError:
+            errors['max_points'] = ['Must be an integer of at least 3']
+    else:
+        max_points = None
+
+    trend_days = params.get('trend_days') or ANALYTICS_TREND_DAYS
+    try:
+        trend_days = int(trend_days)
+        if not 1 <= trend_days <= MAX_TREND_DAYS:
+            raise ValueError
+    except ValueError:
+        errors['trend_days'] = [f"Must be an integer between 1 and {MAX_TREND_DAYS}"]
+
+    if errors:
+        return None, errors
+    return {'resolution': resolution, 'max_points': max_points, 'trend_days': trend_days}, None
+
+
+def analytics_scopes(crop_name, region):
+    return [crop_scope(crop_name), series_scope(crop_name, region)]
+
+
+def analytics_cache_base(crop_name, region, date_after=None, date_before=None, options=None):
+    key = (
+        f"price_analytics_{crop_name.lower()}_{region.lower()}"
+        f"_{date_after or 'any'}_{date_before or 'any'}"
+    )
+    if options:
+        # The trend window slides with the calendar, so its start date is part of the key
+        key += (
+            f"_{options['resolution']}_{trend_start(date_after, options['trend_days'])}"
+            f"_{options['max_points'] or 'all'}"
+        )
+    return key
+
+
+def analytics_cache_key(crop_name, region, date_after=None, date_before=None, options=None, generations=None):
+    """
+    Cache key for one crop/region analytics result, versioned by the crop and
+    series generations. Pass ``generations`` to build many keys from one lookup.
+    """
+    return versioned_key(
+        analytics_cache_base(crop_name, region, date_after, date_before, options),
+        analytics_scopes(crop_name, region),
+        generations,
+    )
+
+
+def trend_start(date_after=None, trend_days=ANALYTICS_TREND_DAYS):
+    """Start of the recent-trend window: the last ``trend_days`` days, clipped to ``date_after``."""
+    start = timezone.now().date() - timedelta(days=trend_days)
+    if date_after and date_after > start:
+        return date_after
+    return start
+
+
+def parse_name_list(value):
+    """Parse a comma-separated list; ``all`` returns None and a missing value returns []."""
+    if not value:
+        return []
+    if value.strip().lower() == 'all':
+        return None
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+
+def parse_windows(value):
+    """Parse ``windows=7,30`` into a tuple of ints; returns ``(windows, errors)``."""
+    if not value:
+        return DEFAULT_WINDOWS, None
+    try:
+        windows = tuple(sorted({int(v) for v in value.split(',') if v.strip()}))
+    except ValueError:
+        windows = ()
+    if not windows or len(windows) > MAX_STATS_WINDOWS or not all(1 <= w <= MAX_STATS_WINDOW for w in windows):
+        return None, {'windows': [
+            f"Provide up to {MAX_STATS_WINDOWS} comma-separated integers between 1 and {MAX_STATS_WINDOW}"
+        ]}
+    return windows, None
+
+
+def build_analytics_result(crop_name, region, summary, trend_data):
+    return {
+        'crop': crop_name,
+        'region': region,
+        'analytics': {
+            'average_price': round(float(summary['avg_price'] or 0), 2),
+            'highest_price': float(summary['max_price'] or 0),
+            'lowest_price': float(summary['min_price'] or 0),
+            'total_records': summary['count'],
+            'first_price': float(summary['first_price']),
+            'first_date': summary['first_date'].isoformat(),
+            'last_price': float(summary['last_price']),
+            'last_date': summary['last_date'].isoformat(),
+        },
+        'recent_trend': trend_data
+    }
+
 
 class MarketPriceViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     queryset = MarketPrice.objects.select_related('crop').all()
@@ -44,7 +185,8 @@ class MarketPriceViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
                 qs = qs.filter(crop__name__iexact=crop_name)
                 
             if region:
-                qs = qs.filter(region__iexact=region)
+                # Indexed integer match on the canonical region (slug or alias)
+                qs = qs.filter(canonical_region__in=matching_region_ids(region))
 
             if date_after:
                 d = parse_date(date_after)
@@ -69,16 +211,19 @@ class MarketPriceViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     def list(self, request, *args, **kwargs):
         try:
             queryset = self.filter_queryset(self.get_queryset())
-            
-            # Check if no results
-            if not queryset.exists():
-                return APIResponse.success(
-                    data={'count': 0, 'results': []},
-                    message="No market prices found for the specified criteria"
-                )
+
+            # ?cursor= (even empty) opts into keyset pagination
+            if MarketPriceKeysetPagination.cursor_query_param in request.query_params:
+                return self._list_by_cursor(request, queryset)
             
             page = self.paginate_queryset(queryset)
             if page is not None:
+                if not page:
+                    return APIResponse.success(
+                        data={'count': 0, 'results': []},
+                        message="No market prices found for the specified criteria"
+                    )
+
                 serializer = self.get_serializer(page, many=True)
                 paginated_response = self.get_paginated_response(serializer.data)
                 
@@ -97,17 +242,44 @@ class MarketPriceViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
                 data={'count': len(serializer.data), 'results': serializer.data},
                 message="Market prices retrieved successfully"
             )
-            
+
+        except NotFound:
+            raise
         except Exception as e:
             logger.error(f"Error retrieving market prices: {e}")
             return APIResponse.error(
                 message="Error retrieving market prices",
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+    def _list_by_cursor(self, request, queryset):
+        paginator = MarketPriceKeysetPagination()
+        try:
+            page = paginator.paginate_queryset(queryset, request, view=self)
+        except ValidationError as e:
+            return APIResponse.error(
+                message="Invalid cursor",
+                details=e.detail,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.get_serializer(page, many=True)
+        return APIResponse.success(
+            data=paginator.get_paginated_data(serializer.data),
+            message="Market prices retrieved successfully" if page
+            else "No market prices found for the specified criteria"
+        )
     
     @action(detail=False, methods=['get'])
     def analytics(self, request):
-        """Get price analytics for a specific crop and region"""
+        """
+        Get price analytics for a specific crop and region.
+
+        Statistics come from the maintained price rollups, so any
+        ``date_after``/``date_before`` window costs O(buckets), not O(rows).
+        The trend covers the last ``trend_days`` (default 30) at
+        ``resolution=day|week|month``; ``max_points`` downsamples it with LTTB.
+        """
         try:
             crop_name = request.query_params.get('crop_name')
             region = request.query_params.get('region')
@@ -117,58 +289,60 @@ class MarketPriceViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
                     message="Both crop_name and region parameters are required",
                     status_code=status.HTTP_400_BAD_REQUEST
                 )
+
+            date_after = parse_date(request.query_params.get('date_after') or '')
+            date_before = parse_date(request.query_params.get('date_before') or '')
             
-            cache_key = f"price_analytics_{crop_name.lower()}_{region.lower()}"
-            cached_result = cache.get(cache_key)
-            
-            if cached_result:
-                return APIResponse.success(
-                    data=cached_result,
-                    message="Price analytics retrieved successfully (cached)"
+            options, errors = parse_trend_options(request.query_params)
+            if errors:
+                return APIResponse.error(
+                    message="Invalid trend parameters",
+                    details=errors,
+                    status_code=status.HTTP_400_BAD_REQUEST
                 )
             
-            qs = self.get_queryset().filter(
-                crop__name__iexact=crop_name,
-                region__iexact=region
+            base = analytics_cache_base(crop_name, region, date_after, date_before, options)
+
+            def compute():
+                series = MarketPriceRollup.objects.filter(
+                    crop__name__iexact=crop_name,
+                    region__iexact=region
+                )
+                summary = rollups.summarize(series, date_after, date_before)
+                if not summary['count']:
+                    return None
+                trend_data = downsample_points(
+                    rollups.bucket_points(
+                        series,
+                        trend_start(date_after, options['trend_days']),
+                        date_before,
+                        granularity=options['resolution'],
+                    ),
+                    options['max_points'],
+                )
+                return build_analytics_result(crop_name, region, summary, trend_data)
+
+            # One worker recomputes a missing or expiring entry; concurrent
+            # requests get the previous result meanwhile
+            result, state = single_flight.get_or_compute(
+                versioned_key(base, analytics_scopes(crop_name, region)),
+                compute,
+                ANALYTICS_CACHE_TIMEOUT,
+                stale_key=stale_key(base),
             )
-            
-            if not qs.exists():
+
+            if result is None:
                 return APIResponse.success(
                     data=None,
                     message=f"No price data found for {crop_name} in {region}"
                 )
-            
-            analytics = qs.aggregate(
-                avg_price=Avg('price'),
-                max_price=Max('price'),
-                min_price=Min('price'),
-                count=Count('id')
-            )
-            
-            # Get recent trend (last 30 days)
-            recent_prices = qs.filter(
-                date__gte=timezone.now().date() - timedelta(days=30)
-            ).order_by('date')
-            
-            trend_data = [{
-                'date': price.date.isoformat(),
-                'price': float(price.price)
-            } for price in recent_prices]
-            
-            result = {
-                'crop': crop_name,
-                'region': region,
-                'analytics': {
-                    'average_price': round(float(analytics['avg_price'] or 0), 2),
-                    'highest_price': float(analytics['max_price'] or 0),
-                    'lowest_price': float(analytics['min_price'] or 0),
-                    'total_records': analytics['count']
-                },
-                'recent_trend': trend_data
-            }
-            
-            cache.set(cache_key, result, 1800)  # Cache for 30 minutes
-            
+
+            if state != single_flight.MISS:
+                return APIResponse.success(
+                    data=result,
+                    message="Price analytics retrieved successfully (cached)"
+                )
+
             return APIResponse.success(
                 data=result,
                 message="Price analytics generated successfully"
@@ -180,3 +354,350 @@ class MarketPriceViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
                 message="Error generating price analytics",
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+    @action(detail=False, methods=['get'], url_path='analytics/batch')
+    def analytics_batch(self, request):
+        """
+        Price analytics for every crop x region pair in one request.
+
+        ``crops`` and ``regions`` take comma-separated names or ``all``. Cached
+        pairs are fetched with one ``get_many``; the rest are computed together
+        with one summary query and one trend query, then cached per pair under
+        the same keys the single-pair endpoint uses.
+        """
+        try:
+            crops = parse_name_list(request.query_params.get('crops'))
+            regions = parse_name_list(request.query_params.get('regions'))
+            if crops == [] or regions == []:
+                return APIResponse.error(
+                    message="Both crops and regions parameters are required (names or 'all')",
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+
+            date_after = parse_date(request.query_params.get('date_after') or '')
+            date_before = parse_date(request.query_params.get('date_before') or '')
+
+            options, errors = parse_trend_options(request.query_params)
+            if errors:
+                return APIResponse.error(
+                    message="Invalid trend parameters",
+                    details=errors,
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+
+            candidates = MarketPriceRollup.objects.all()
+            if crops is not None:
+                candidates = candidates.annotate(crop_key=Lower('crop__name')).filter(
+                    crop_key__in={c.lower() for c in crops}
+                )
+            if regions is not None:
+                candidates = candidates.annotate(region_key=Lower('region')).filter(
+                    region_key__in={r.lower() for r in regions}
+                )
+
+            if crops is not None and regions is not None:
+                pairs = [(c, r) for c in crops for r in regions]
+            else:
+                pairs = list(
+                    candidates.filter(granularity=RollupGranularity.MONTH)
+                    .order_by('crop__name', 'region')
+                    .values_list('crop__name', 'region')
+                    .distinct()
+                )
+            # Collapse case variants onto one series, keeping request order
+            unique_pairs = {}
+            for crop_name, region in pairs:
+                unique_pairs.setdefault(rollups.series_key(crop_name, region), (crop_name, region))
+            pairs = list(unique_pairs.values())
+
+            max_pairs = getattr(settings, 'PRICE_ANALYTICS_BATCH_MAX_PAIRS', 500)
+            if len(pairs) > max_pairs:
+                return APIResponse.error(
+                    message=f"Too many crop/region pairs requested ({len(pairs)}); the limit is {max_pairs}",
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+
+            generations = get_generations(scope for pair in pairs for scope in analytics_scopes(*pair))
+            keys = {
+                pair: analytics_cache_key(pair[0], pair[1], date_after, date_before, options, generations)
+                for pair in pairs
+            }
+            cached = cache.get_many(list(keys.values()))
+            misses = [pair for pair in pairs if keys[pair] not in cached]
+
+            computed = {}
+            if misses:
+                miss_keys = {rollups.series_key(c, r) for c, r in misses}
+                subset = MarketPriceRollup.objects.annotate(
+                    crop_key=Lower('crop__name'), region_key=Lower('region')
+                ).filter(crop_key__in={k[0] for k in miss_keys}, region_key__in={k[1] for k in miss_keys})
+                summaries = rollups.summarize_many(subset, date_after, date_before)
+                trends = rollups.bucket_points_many(
+                    subset,
+                    trend_start(date_after, options['trend_days']),
+                    date_before,
+                    granularity=options['resolution'],
+                )
+                for crop_name, region in misses:
+                    key = rollups.series_key(crop_name, region)
+                    summary = summaries.get(key)
+                    if summary and summary['count']:
+                        computed[keys[(crop_name, region)]] = build_analytics_result(
+                            crop_name, region, summary,
+                            downsample_points(trends.get(key, []), options['max_points'])
+                        )
+                if computed:
+                    cache.set_many(computed, ANALYTICS_CACHE_TIMEOUT)
+
+            results, no_data = [], []
+            for crop_name, region in pairs:
+                result = cached.get(keys[(crop_name, region)]) or computed.get(keys[(crop_name, region)])
+                if result:
+                    results.append(result)
+                else:
+                    no_data.append({'crop': crop_name, 'region': region})
+
+            return APIResponse.success(
+                data={
+                    'count': len(results),
+                    'results': results,
+                    'no_data': no_data,
+                    'cache': {'hits': len(pairs) - len(misses), 'misses': len(misses)},
+                },
+                message="Price analytics generated successfully"
+            )
+
+        except Exception as e:
+            logger.error(f"Error generating batch price analytics: {e}")
+            return APIResponse.error(
+                message="Error generating price analytics",
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Rolling statistics for every price series matching the list filters.
+
+        ``windows`` takes comma-separated observation counts (default 7,30).
+        Each series returns its dates and prices with ``pct_change`` and, per
+        window, ``ma_w``, ``volatility_w`` and ``p10_w``/``p50_w``/``p90_w``.
+        ``tail=N`` trims the output to the last N points of each series.
+        Reads the memory-mapped price snapshot when a fresh one exists and
+        the database otherwise; ``source`` says which.
+        """
+        try:
+            windows, errors = parse_windows(request.query_params.get('windows'))
+            tail = request.query_params.get('tail')
+            if tail:
+                try:
+                    tail = int(tail)
+                    if tail < 1:
+                        raise ValueError
+                except ValueError:
+                    errors = {**(errors or {}), 'tail': ['Must be a positive integer']}
+            if errors:
+                return APIResponse.error(
+                    message="Invalid statistics parameters",
+                    details=errors,
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+
+            max_series = getattr(settings, 'PRICE_STATS_MAX_SERIES', 200)
+            batch = self._snapshot_batch(request.query_params)
+            source = 'snapshot'
+            if batch is None:
+                source = 'database'
+                queryset = self.filter_queryset(self.get_queryset())
+                series_count = queryset.order_by().values('crop_id', 'region').distinct().count()
+            else:
+                series_count = len(batch)
+            if series_count > max_series:
+                return APIResponse.error(
+                    message=f"Filters match {series_count} series; narrow them to at most {max_series}",
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+
+            if batch is None:
+                batch = load_series(queryset)
+            stats = rolling_stats(batch, windows)
+            return APIResponse.success(
+                data={
+                    'windows': list(windows),
+                    'percentiles': list(DEFAULT_PERCENTILES),
+                    'count': len(batch),
+                    'source': source,
+                    'series': serialize_series(batch, stats, tail=tail or None),
+                },
+                message="Price statistics generated successfully"
+            )
+
+        except Exception as e:
+            logger.error(f"Error generating price statistics: {e}")
+            return APIResponse.error(
+                message="Error generating price statistics",
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def _snapshot_batch(self, params):
+        """
+        The series matching the list filters, read from the memory-mapped
+        price snapshot; None when no fresh snapshot exists.
+        """
+        snapshot = open_snapshot()
+        if snapshot is None:
+            return None
+        try:
+            crop = params.get('crop')
+            crop_id = int(crop) if crop else None
+            date_after = parse_date(params.get('date_after') or '')
+            date_before = parse_date(params.get('date_before') or '')
+        except ValueError:
+            # Let the database path apply its own handling of bad filters
+            return None
+        region = params.get('region')
+        # The same canonical region (slug or alias) the database path matches
+        region_ids = {row['id'] for row in matching_region_ids(region)} if region else None
+        return snapshot.select(
+            crop_id=crop_id,
+            crop_name=params.get('crop_name'),
+            region_ids=region_ids,
+            date_after=date_after,
+            date_before=date_before,
+        )
+
+    @action(detail=False, methods=['get'])
+    def latest(self, request):
+        """
+        The most recent price of every (crop, region) series, with the change
+        versus the observation before it.
+
+        Served from the ``LatestMarketPrice`` snapshot and cached until the
+        next price write. The ETag follows the snapshot generation, so a
+        client revalidating with ``If-None-Match`` gets a 304 without any
+        database work.
+        """
+        try:
+            crop_name = request.query_params.get('crop_name')
+            region = request.query_params.get('region')
+
+            cache_key = versioned_key(
+                f"latest_prices_{(crop_name or 'any').lower()}_{(region or 'any').lower()}",
+                [LATEST_SCOPE],
+            )
+            etag = quote_etag(hashlib.md5(cache_key.encode()).hexdigest())
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                response['ETag'] = etag
+                return response
+
+            result = cache.get(cache_key)
+            if result is None:
+                qs = LatestMarketPrice.objects.select_related('crop').order_by('crop__name', 'region')
+                if crop_name:
+                    qs = qs.filter(crop__name__iexact=crop_name)
+                if region:
+                    qs = qs.filter(region__iexact=region)
+                results = LatestMarketPriceSerializer(qs, many=True).data
+                result = {'count': len(results), 'results': results}
+                cache.set(cache_key, result, ANALYTICS_CACHE_TIMEOUT)
+
+            response = APIResponse.success(
+                data=result,
+                message="Latest market prices retrieved successfully"
+            )
+            response['ETag'] = etag
+            return response
+
+        except Exception as e:
+            logger.error(f"Error retrieving latest market prices: {e}")
+            return APIResponse.error(
+                message="Error retrieving latest market prices",
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def perform_content_negotiation(self, request, force=False):
+        # On export ?format= picks the stream format, not a DRF renderer
+        if getattr(self, 'action', None) == 'export':
+            force = True
+        return super().perform_content_negotiation(request, force)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream every market price matching the list filters as CSV or NDJSON.
+
+        Rows are read with ``values_list().iterator()`` and written out chunk
+        by chunk, so memory stays flat regardless of export size. Pass
+        ``gzip=true`` for a gzip-compressed download.
+        """
+        fmt = (request.query_params.get('format') or 'csv').lower()
+        if fmt not in export.EXPORT_FORMATS:
+            return APIResponse.error(
+                message="Unsupported export format",
+                details={'format': [f"Must be one of: {', '.join(export.EXPORT_FORMATS)}"]},
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        compress = request.query_params.get('gzip', '').lower() in ('1', 'true', 'yes')
+
+        queryset = self.filter_queryset(self.get_queryset()).order_by('-date', '-id')
+        filename = f"market_prices.{fmt}"
+        if compress:
+            filename += '.gz'
+        response = StreamingHttpResponse(
+            export.stream_export(queryset, fmt, compress=compress),
+            content_type='application/gzip' if compress else export.EXPORT_FORMATS[fmt],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='bulk', permission_classes=[IsAuthenticated])
+    def bulk(self, request):
+        """
+        Stream-ingest market prices from a CSV or NDJSON body.
+
+        Rows are validated in chunks and upserted in batches on
+        (crop, region, date). Use ``?batch_size=`` to tune the batch size.
+        """
+        fmt = ingest.detect_format(request.content_type)
+        if fmt is None:
+            return APIResponse.error(
+                message="Unsupported content type. Send text/csv or application/x-ndjson",
+                details={'content_type': [request.content_type or 'missing']},
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+
+        # Read the raw request stream line by line instead of request.data so the
+        # body is never buffered or parsed as a whole.
+        stream = request.stream
+        if stream is None:
+            return APIResponse.error(
+                message="Request body is empty",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            result = ingest.ingest_stream(
+                stream,
+                fmt,
+                batch_size=ingest.get_batch_size(request.query_params.get('batch_size')),
+            )
+        except (UnicodeDecodeError, csv.Error) as e:
+            logger.warning(f"Malformed bulk price body: {e}")
+            return APIResponse.error(
+                message="Malformed request body",
+                details={'body': [str(e)]},
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            logger.error(f"Error ingesting market prices: {e}")
+            return APIResponse.error(
+                message="Error ingesting market prices",
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        totals = result['totals']
+        return APIResponse.success(
+            data=result,
+            message=f"Upserted {totals['upserted']} market prices, rejected {totals['rejected']}"
+        )
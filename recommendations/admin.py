@@ -0,0 +1,15 @@
+from django.contrib import admin
+from .models import RecommendationSnapshot
+
+
+@admin.register(RecommendationSnapshot)
+class RecommendationSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("region", "season", "soil_type", "created_at")
+    list_filter = ("season",)
+    search_fields = ("region",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
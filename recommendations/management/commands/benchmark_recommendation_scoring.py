@@ -0,0 +1,78 @@
+import random
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crops.models import Season
+from recommendations.scoring import CropMatrix, score_matrix, top_k
+from recommendations.views import score_crop
+
+SOILS = ["loamy", "clay", "sandy", "silty", "peaty", "chalky"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the vectorized recommendation scoring kernel against the scalar score_crop "
+        "on synthetic crops x farm profiles, reporting scored pairs per second."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--crops", type=int, default=2000, help="Synthetic crops")
+        parser.add_argument("--queries", type=int, default=2000, help="Synthetic farm profiles (region, season, soil)")
+        parser.add_argument("--regions", type=int, default=200, help="Distinct region names")
+        parser.add_argument("--scalar-queries", type=int, default=20,
+                            help="Profiles scored with score_crop for the comparison (it is slow)")
+        parser.add_argument("--repeat", type=int, default=3, help="Timed runs; the best is reported")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed")
+
+    def handle(self, *args, **options):
+        if min(options["crops"], options["queries"], options["regions"], options["repeat"]) < 1:
+            raise CommandError("--crops, --queries, --regions and --repeat must be at least 1")
+
+        rng = random.Random(options["seed"])
+        regions = [f"Region {i}" for i in range(options["regions"])]
+        seasons = [choice[0] for choice in Season.choices]
+        crops = [
+            SimpleNamespace(
+                id=i,
+                name=f"Crop {i}",
+                season=rng.choice(seasons),
+                soil_type=rng.choice(SOILS + [""]),
+                regions=rng.sample(regions, rng.randint(1, 8)),
+                maturity_days=rng.randint(30, 365),
+            )
+            for i in range(options["crops"])
+        ]
+        queries = [
+            (rng.choice(regions), rng.choice(seasons + [None]), rng.choice(SOILS + [None]))
+            for _ in range(options["queries"])
+        ]
+
+        started = time.perf_counter()
+        matrix = CropMatrix(crops)
+        encode_seconds = time.perf_counter() - started
+
+        best = None
+        for _ in range(options["repeat"]):
+            started = time.perf_counter()
+            top_k(score_matrix(matrix, queries), 5)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        pairs = len(crops) * len(queries)
+
+        sample = queries[:options["scalar_queries"]]
+        started = time.perf_counter()
+        for region, season, soil_type in sample:
+            for crop in crops:
+                score_crop(crop, region=region, season=season, soil_type=soil_type)
+        scalar_seconds = time.perf_counter() - started
+        scalar_rate = len(crops) * len(sample) / scalar_seconds if sample else 0.0
+
+        self.stdout.write(f"Encoded {len(crops)} crops in {encode_seconds:.3f}s")
+        self.stdout.write(f"score_crop: {scalar_rate / 1e6:.2f}M pairs/s over {len(sample)} profiles")
+        self.stdout.write(self.style.SUCCESS(
+            f"score_matrix + top_k: {len(crops)} crops x {len(queries)} profiles in {best:.3f}s "
+            f"({pairs / best / 1e6:.2f}M pairs/s"
+            + (f", {pairs / best / scalar_rate:.0f}x score_crop)" if scalar_rate else ")")
+        ))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recommendations.snapshot import warm_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute recommendations for every region, season and soil type in the crop catalog "
+        "into the RecommendationSnapshot table and the cache. Run it after deploys and catalog imports."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--no-cache", action="store_true",
+                            help="Only write the snapshot table; leave the cache alone")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stored = warm_recommendations(prime_cache=not options["no_cache"])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {stored} recommendation profiles in {elapsed:.2f}s"
+        ))
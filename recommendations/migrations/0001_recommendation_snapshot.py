@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-17 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('region', models.CharField(max_length=100, verbose_name='region key')),
+                ('season', models.CharField(blank=True, max_length=10, verbose_name='season')),
+                ('soil_type', models.CharField(blank=True, max_length=100, verbose_name='soil type')),
+                ('result', models.JSONField(verbose_name='result')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['region', 'season', 'soil_type'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recommendationsnapshot',
+            constraint=models.UniqueConstraint(fields=('region', 'season', 'soil_type'), name='unique_recommendation_snapshot_profile'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from regions.models import region_key
+
+
+class RecommendationSnapshot(models.Model):
+    """
+    A precomputed recommendation response for one (region, season, soil type)
+    profile. Written by ``manage.py warm_recommendations``; crop and region
+    writes delete the rows they affect. Blank season or soil type means the
+    filter was not given.
+    """
+    region = models.CharField(_('region key'), max_length=100)
+    season = models.CharField(_('season'), max_length=10, blank=True)
+    soil_type = models.CharField(_('soil type'), max_length=100, blank=True)
+    result = models.JSONField(_('result'))
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['region', 'season', 'soil_type']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['region', 'season', 'soil_type'], name='unique_recommendation_snapshot_profile'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.region} / {self.season or 'any'} / {self.soil_type or 'any'}"
+
+    @staticmethod
+    def profile_key(region: str, season: str | None, soil_type: str | None) -> dict:
+        """Lookup fields for a profile, normalized the way scoring compares them."""
+        return {
+            'region': region_key(region),
+            'season': season or '',
+            'soil_type': (soil_type or '').lower(),
+        }
+
+    @classmethod
+    def lookup(cls, region: str, season: str | None, soil_type: str | None):
+        """The stored result for a profile, or None."""
+        return (
+            cls.objects.filter(**cls.profile_key(region, season, soil_type))
+            .values_list('result', flat=True)
+            .first()
+        )
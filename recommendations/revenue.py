@@ -0,0 +1,97 @@
+"""
+Profitability ranking for recommendations (``?rank_by=revenue``).
+
+Each candidate's expected revenue per hectare is the mock yield forecast
+(base yield x regional multiplier x season factor, from the current yield
+factor table) times the latest market price of the crop in the region. Candidates are
+ranked by agronomic score x expected revenue; crops without a price or yield
+factors follow, in score order.
+
+The latest price of every crop in a region is read with one window query
+and cached per region. Price writes bump ``LATEST_SCOPE`` and alias changes
+bump the region scope, which retires the cached vector.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from core.cache_versions import region_scope, versioned_key
+from crops.index import canonical_region_slug
+from prices.latest import LATEST_SCOPE
+from prices.models import MarketPrice
+from regions.resolver import matching_region_ids
+from yields.factors import current_factors, region_factor_key
+
+RANK_BY_SCORE = 'score'
+RANK_BY_REVENUE = 'revenue'
+RANK_BY_CHOICES = (RANK_BY_SCORE, RANK_BY_REVENUE)
+
+PRICE_VECTOR_CACHE_TIMEOUT = getattr(settings, 'RECOMMENDATIONS_CACHE_TIMEOUT', 86400)
+
+
+def load_region_prices(region: str) -> Dict[int, Tuple[float, str]]:
+    """``crop_id -> (price, ISO date)`` of the newest price of every crop sold in ``region``."""
+    rows = (
+        MarketPrice.objects.filter(canonical_region__in=matching_region_ids(region))
+        .order_by()
+        .annotate(rank=Window(
+            RowNumber(),
+            partition_by=[F('crop_id')],
+            order_by=[F('date').desc(), F('id').desc()],
+        ))
+        .filter(rank=1)
+        .values_list('crop_id', 'price', 'date')
+    )
+    return {crop_id: (float(price), d.isoformat()) for crop_id, price, d in rows}
+
+
+def region_prices(region: str) -> Dict[int, Tuple[float, str]]:
+    """:func:`load_region_prices` through the cache, shared by every name of the region."""
+    slug = canonical_region_slug(region)
+    key = versioned_key(f"region_prices_{slug}", [LATEST_SCOPE, region_scope(slug)])
+    prices = cache.get(key)
+    if prices is None:
+        prices = load_region_prices(region)
+        cache.set(key, prices, PRICE_VECTOR_CACHE_TIMEOUT)
+    return prices
+
+
+def rank_by_revenue(scored: List[tuple], region: str, season: Optional[str]) -> Tuple[List[tuple], Dict[int, dict]]:
+    """
+    Reorder ``(score, crop)`` pairs by score x expected revenue. Returns the
+    reordered pairs and, per crop id, the revenue fields for the response.
+    """
+    table = current_factors()
+    base_map = table.base_yield_floats
+    season_map = table.season_factor_floats
+    regional_multiplier = table.region_multiplier_floats.get(region_factor_key(region))
+    prices = region_prices(region)
+
+    ranked, extras = [], {}
+    for score, crop in scored:
+        base = base_map.get(crop.name.lower())
+        season_factor = season_map.get(season or crop.season)
+        latest = prices.get(crop.id)
+        expected_yield = expected_revenue = revenue_score = None
+        if base is not None and regional_multiplier is not None and season_factor is not None:
+            expected_yield = base * regional_multiplier * season_factor
+            if latest is not None:
+                expected_revenue = expected_yield * latest[0]
+                revenue_score = max(score, 0.0) * expected_revenue
+        extras[crop.id] = {
+            'expected_yield_t_per_ha': round(expected_yield, 4) if expected_yield is not None else None,
+            'latest_price': latest[0] if latest else None,
+            'price_date': latest[1] if latest else None,
+            'expected_revenue_per_ha': round(expected_revenue, 2) if expected_revenue is not None else None,
+            'revenue_score': round(revenue_score, 2) if revenue_score is not None else None,
+        }
+        ranked.append((revenue_score, score, crop))
+
+    # Priced crops first by revenue score, then the rest by agronomic score;
+    # sort is stable, so ties keep the agronomic order
+    ranked.sort(key=lambda r: (r[0] is not None, round(r[0], 2) if r[0] is not None else round(r[1], 4)),
+                reverse=True)
+    return [(score, crop) for _, score, crop in ranked], extras
@@ -0,0 +1,166 @@
+"""
+Vectorized crop scoring for many crops against many farm profiles at once.
+
+:func:`score_matrix` reproduces :func:`recommendations.views.score_crop` for
+every (crop, query) pair of a crops x queries grid. Crops are encoded once
+into integer codes and a region membership matrix; each query becomes three
+codes. Matches are then broadcast comparisons. The terms are added in the
+same order as ``score_crop`` with the same float64 operations, so results
+are bit-for-bit identical rather than merely close.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from regions.models import region_key
+
+MATURITY_TARGET = 120.0
+SOIL_MISMATCH_PENALTY = 0.1
+LONG_MATURITY_PENALTY = 0.05
+
+# Query codes for "filter not given" and "given but matches no crop"
+NOT_GIVEN = -1
+UNKNOWN = -2
+# Code for crops without a soil type; never equal to a query code
+NO_SOIL = -3
+
+Query = Tuple[str, Optional[str], Optional[str]]
+
+
+def _code(vocab: Dict[str, int], value) -> int:
+    if not value:
+        return NOT_GIVEN
+    return vocab.get(value, UNKNOWN)
+
+
+class CropMatrix:
+    """
+    Crops (``Crop`` instances, ``CropEntry`` tuples or anything with the same
+    attributes) encoded for :func:`score_matrix`. Row ``i`` is ``crops[i]``.
+    Crop and query regions are compared by ``region_slug(name)``, like the
+    ``region_slug`` argument of ``score_crop``.
+    """
+
+    def __init__(self, crops: Iterable, region_slug=region_key):
+        self.crops = list(crops)
+        self.region_slug = region_slug
+        n = len(self.crops)
+
+        self.region_vocab: Dict[str, int] = {}
+        memberships = []
+        for i, crop in enumerate(self.crops):
+            if isinstance(crop.regions, (list, tuple)):
+                for name in crop.regions:
+                    col = self.region_vocab.setdefault(region_slug(name), len(self.region_vocab))
+                    memberships.append((i, col))
+        # One spare all-False column that unknown query regions point at
+        self.regions = np.zeros((n, len(self.region_vocab) + 1), dtype=bool)
+        if memberships:
+            rows, cols = np.array(memberships).T
+            self.regions[rows, cols] = True
+
+        self.season_vocab: Dict[str, int] = {}
+        self.seasons = np.array(
+            [self.season_vocab.setdefault(c.season, len(self.season_vocab)) for c in self.crops],
+            dtype=np.int64,
+        ).reshape(n)
+
+        self.soil_vocab: Dict[str, int] = {}
+        self.soils = np.array(
+            [self.soil_vocab.setdefault(c.soil_type.lower(), len(self.soil_vocab)) if c.soil_type else NO_SOIL
+             for c in self.crops],
+            dtype=np.int64,
+        ).reshape(n)
+
+        maturity = np.array([float(c.maturity_days) if c.maturity_days else 0.0 for c in self.crops]).reshape(n)
+        has_maturity = maturity > 0
+        component = np.maximum(0.0, 1.0 - (np.abs(maturity - MATURITY_TARGET) / MATURITY_TARGET))
+        self.maturity_bonus = np.where(has_maturity, component, 0.0)
+        self.maturity_penalty = np.where(has_maturity & (maturity > MATURITY_TARGET), LONG_MATURITY_PENALTY, 0.0)
+
+    def __len__(self) -> int:
+        return len(self.crops)
+
+    def encode_queries(self, queries: Sequence[Query]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """``(region, season, soil_type)`` queries to column / code arrays."""
+        spare = len(self.region_vocab)
+        regions = np.array([self.region_vocab.get(self.region_slug(q[0]), spare) for q in queries], dtype=np.int64)
+        seasons = np.array([_code(self.season_vocab, q[1]) for q in queries], dtype=np.int64)
+        soils = np.array([_code(self.soil_vocab, q[2].lower() if q[2] else q[2]) for q in queries], dtype=np.int64)
+        return regions, seasons, soils
+
+
+def score_matrix(matrix: CropMatrix, queries: Sequence[Query]) -> np.ndarray:
+    """
+    Scores of every crop for every query, shape ``(len(matrix), len(queries))``,
+    equal to ``score_crop(crop, region, season, soil_type)`` for each pair.
+    """
+    q_regions, q_seasons, q_soils = matrix.encode_queries(queries)
+
+    score = np.zeros((len(matrix), len(queries)))
+    score += matrix.regions[:, q_regions]
+    score += matrix.seasons[:, None] == q_seasons[None, :]
+    soil_given = q_soils != NOT_GIVEN
+    soil_match = matrix.soils[:, None] == q_soils[None, :]
+    score += np.where(soil_match, 1.0, np.where(soil_given, -SOIL_MISMATCH_PENALTY, 0.0))
+    score += matrix.maturity_bonus[:, None]
+    score -= matrix.maturity_penalty[:, None]
+    return score
+
+
+def top_k(scores: np.ndarray, k: int = 5, candidates: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Row indices of the ``k`` best crops per query (column), best first,
+    ranked like the recommendations endpoint: by score rounded to 4 places,
+    ties in crop order. ``candidates`` is an optional boolean mask of the same
+    shape; excluded crops sort last. Shape ``(min(k, n_crops), n_queries)``.
+    """
+    ranked = -np.round(scores, 4)
+    if candidates is not None:
+        ranked = np.where(candidates, ranked, np.inf)
+    order = np.argsort(ranked, axis=0, kind='stable')
+    return order[:k]
+
+
+_index_matrix = None
+
+
+def index_matrix(index) -> CropMatrix:
+    """
+    A :class:`CropMatrix` over every crop of a ``CropIndex``, in name order
+    like ``CropIndex.candidates``, matching regions through the index's
+    aliases. Built once per index generation.
+    """
+    global _index_matrix
+    cached = _index_matrix
+    if cached is None or cached[0] is not index:
+        ordered = sorted(index.crops.values(), key=lambda c: c.name)
+        cached = _index_matrix = (index, CropMatrix(ordered, region_slug=index.region_slug))
+    return cached[1]
+
+
+def rank_profiles(index, queries: Sequence[Query], k: int = 5) -> List[Tuple[int, List[Tuple[float, object]]]]:
+    """
+    Recommendations for many profiles in one pass: per query, the number of
+    candidate crops and the best ``k`` of them as ``(score, crop)`` pairs,
+    exactly as the single-profile endpoint ranks them.
+    """
+    matrix = index_matrix(index)
+    if not queries or not len(matrix):
+        return [(0, []) for _ in queries]
+
+    rows = {crop.id: i for i, crop in enumerate(matrix.crops)}
+    candidates = np.zeros((len(matrix), len(queries)), dtype=bool)
+    counts = []
+    for j, (region, season, soil_type) in enumerate(queries):
+        ids = index.candidate_ids(region=region, season=season, soil_type=soil_type)
+        if ids:
+            candidates[[rows[pk] for pk in ids], j] = True
+        counts.append(len(ids))
+
+    scores = score_matrix(matrix, queries)
+    best = top_k(scores, k, candidates)
+    return [
+        (count, [(float(scores[i, j]), matrix.crops[i]) for i in best[:count, j]])
+        for j, count in enumerate(counts)
+    ]
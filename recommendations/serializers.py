@@ -10,3 +10,13 @@ class CropRecommendationSerializer(serializers.Serializer):
     maturity_days = serializers.IntegerField()
     recommended_inputs = serializers.JSONField()
     score = serializers.FloatField()
+
+
+class RecommendationProfileSerializer(serializers.Serializer):
+    region = serializers.CharField()
+    season = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    soil_type = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class RecommendationBatchSerializer(serializers.Serializer):
+    profiles = serializers.ListField(child=RecommendationProfileSerializer(), allow_empty=False)
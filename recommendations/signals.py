@@ -0,0 +1,37 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from crops.models import Crop
+from regions.models import Region, RegionAlias
+from .snapshot import retire_snapshot
+
+
+def _regions(regions):
+    return regions if isinstance(regions, list) else []
+
+
+@receiver(post_save, sender=Crop)
+def retire_snapshot_on_crop_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    regions = _regions(instance.regions)
+    # Set by crops.signals before the save: (name, regions) as stored
+    previous = getattr(instance, '_previous_crop', None)
+    if previous:
+        regions = regions + _regions(previous[1])
+    retire_snapshot(regions)
+
+
+@receiver(post_delete, sender=Crop)
+def retire_snapshot_on_crop_delete(sender, instance, **kwargs):
+    retire_snapshot(_regions(instance.regions))
+
+
+@receiver(post_save, sender=Region)
+@receiver(post_delete, sender=Region)
+@receiver(post_save, sender=RegionAlias)
+@receiver(post_delete, sender=RegionAlias)
+def retire_snapshot_on_region_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    retire_snapshot()
@@ -0,0 +1,82 @@
+"""
+Precomputed recommendation matrix.
+
+The profiles that can return anything are bounded by the catalog: a region
+some crop is grown in, a season and a soil type some crop has, or no filter.
+:func:`warm_recommendations` ranks all of them in one pass of the vectorized
+kernel, stores every non-empty result in :class:`RecommendationSnapshot` and
+primes the cache with the same entries. The table outlives process restarts
+and deploys, so a cold worker answers from one indexed read instead of
+building the crop index first.
+"""
+from typing import Iterable, List, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.cache_versions import get_generations, region_scope
+from crops.index import CropIndex, get_crop_index
+from regions.models import RegionAlias, region_key
+from .models import RecommendationSnapshot
+from .scoring import Query, rank_profiles
+from .views import RECOMMENDATIONS_CACHE_TIMEOUT, build_recommendations_result, recommendations_cache_key
+
+
+def profile_space(index: CropIndex) -> List[Query]:
+    """Every (region, season, soil type) profile that can match a crop, with ``None`` for "any"."""
+    regions = {}
+    for crop in index.crops.values():
+        for name in crop.regions:
+            regions.setdefault(region_key(name), name)
+    seasons = sorted({c.season for c in index.crops.values() if c.season})
+    soils = sorted({c.soil_type.lower() for c in index.crops.values() if c.soil_type})
+    return [
+        (regions[key], season, soil_type)
+        for key in sorted(regions)
+        for season in [None, *seasons]
+        for soil_type in [None, *soils]
+    ]
+
+
+def warm_recommendations(index: Optional[CropIndex] = None, prime_cache: bool = True,
+                         batch_size: int = 1000) -> int:
+    """
+    Replace the snapshot with freshly ranked results for :func:`profile_space`
+    and, with ``prime_cache``, write them to the cache as well.
+    Returns the number of profiles stored.
+    """
+    index = index or get_crop_index()
+    queries = profile_space(index)
+    generations = get_generations(region_scope(index.region_slug(region)) for region, _, _ in queries)
+
+    rows, entries = [], {}
+    for query, (count, top) in zip(queries, rank_profiles(index, queries)):
+        if not count:
+            continue
+        result = build_recommendations_result(*query, top, count, count)
+        rows.append(RecommendationSnapshot(**RecommendationSnapshot.profile_key(*query), result=result))
+        entries[recommendations_cache_key(*query, generations, region_slug=index.region_slug(query[0]))] = result
+
+    with transaction.atomic():
+        RecommendationSnapshot.objects.all().delete()
+        RecommendationSnapshot.objects.bulk_create(rows, batch_size=batch_size)
+    if prime_cache:
+        cache.set_many(entries, RECOMMENDATIONS_CACHE_TIMEOUT)
+    return len(rows)
+
+
+def retire_snapshot(regions: Optional[Iterable[str]] = None) -> int:
+    """
+    Delete the snapshot rows a change to crops grown in ``regions`` affects,
+    or every row when ``regions`` is None. A region name also finds crops
+    listed under its aliases, so rows for every name of the same canonical
+    region go too. Returns the number of rows deleted.
+    """
+    if regions is None:
+        return RecommendationSnapshot.objects.all().delete()[0]
+    keys = {region_key(r) for r in regions if isinstance(r, str)}
+    if not keys:
+        return 0
+    slugs = keys | set(RegionAlias.objects.filter(key__in=keys).values_list('region__slug', flat=True))
+    keys = slugs | set(RegionAlias.objects.filter(region__slug__in=slugs).values_list('key', flat=True))
+    return RecommendationSnapshot.objects.filter(region__in=keys).delete()[0]
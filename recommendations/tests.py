@@ -1,9 +1,22 @@
+import random
+from datetime import date
+from types import SimpleNamespace
+
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
+from django.core.cache import cache
 
+from crops import index as crop_index
+from crops.index import CropIndex, get_crop_index
 from crops.models import Crop, Season
+from prices.models import MarketPrice
+from regions.models import Region, RegionAlias
 
+from recommendations.models import RecommendationSnapshot
+from recommendations.revenue import load_region_prices, region_prices
+from recommendations.scoring import CropMatrix, score_matrix, top_k
+from recommendations.snapshot import warm_recommendations
 from recommendations.views import score_crop
 
 
@@ -122,3 +135,367 @@ class RecommendationEndpointTest(APITestCase):
         self.assertTrue(all("Nairobi" in r['regions'] for r in results))
         # Expect first item to be a strong loamy + season match
         self.assertGreaterEqual(results[0]['score'], results[-1]['score'])
+
+
+class RecommendationCacheInvalidationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Nairobi"], recommended_inputs={}, maturity_days=120,
+        )
+        Crop.objects.create(
+            name="Sorghum", season=Season.MAJOR, soil_type="sandy",
+            regions=["Kisumu"], recommended_inputs={}, maturity_days=110,
+        )
+        self.url = reverse('recommendations')
+
+    def names(self, region):
+        res = self.client.get(self.url, {"region": region})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [r['name'] for r in res.data['data']['results']], res.data['message']
+
+    def test_crop_write_retires_its_regions_only(self):
+        self.names("Nairobi")
+        self.names("Kisumu")
+        with self.captureOnCommitCallbacks(execute=True):
+            Crop.objects.create(
+                name="Beans", season=Season.MAJOR, soil_type="clay",
+                regions=["Nairobi"], recommended_inputs={}, maturity_days=90,
+            )
+        names, message = self.names("Nairobi")
+        self.assertIn("Beans", names)
+        self.assertNotIn("(cached)", message)
+        _, message = self.names("Kisumu")
+        self.assertIn("(cached)", message)
+
+    def test_region_change_retires_old_and_new_regions(self):
+        self.names("Nairobi")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.maize.regions = ["Kisumu"]
+            self.maize.save()
+        names, _ = self.names("Nairobi")
+        self.assertEqual(names, [])
+        names, _ = self.names("Kisumu")
+        self.assertEqual(sorted(names), ["Maize", "Sorghum"])
+
+    def test_crop_write_retires_alias_queries(self):
+        RegionAlias.objects.create(region=Region.objects.get(slug="nairobi"), key="nbo")
+        self.names("nbo")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.maize.soil_type = "clay"
+            self.maize.save()
+        res = self.client.get(self.url, {"region": "nbo"})
+        self.assertNotIn("(cached)", res.data['message'])
+        self.assertEqual(res.data['data']['results'][0]['soil_type'], "clay")
+
+        # A crop listed under the alias retires the canonical region's entries
+        self.names("Nairobi")
+        with self.captureOnCommitCallbacks(execute=True):
+            Crop.objects.create(
+                name="Beans", season=Season.MAJOR, soil_type="clay",
+                regions=["NBO"], recommended_inputs={}, maturity_days=90,
+            )
+        names, message = self.names("Nairobi")
+        self.assertIn("Beans", names)
+        self.assertNotIn("(cached)", message)
+
+
+class CropIndexTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="Loamy",
+            regions=["Ho", "Kumasi"], recommended_inputs={}, maturity_days=120,
+        )
+        Crop.objects.create(
+            name="Yam", season=Season.MAJOR, soil_type="clay",
+            regions=["Hohoe"], recommended_inputs={}, maturity_days=200,
+        )
+        Crop.objects.create(
+            name="Millet", season=Season.MINOR, soil_type="loamy",
+            regions=["Kumasi"], recommended_inputs={}, maturity_days=90,
+        )
+        self.url = reverse('recommendations')
+
+    def test_candidates_by_set_intersection(self):
+        index = CropIndex.build()
+        self.assertEqual([c.name for c in index.candidates(region="kumasi")], ["Maize", "Millet"])
+        self.assertEqual([c.name for c in index.candidates(region="Ho")], ["Maize"])
+        self.assertEqual([c.name for c in index.candidates(region="Kumasi", soil_type="LOAMY")], ["Maize", "Millet"])
+        self.assertEqual([c.name for c in index.candidates(region="Kumasi", season=Season.MINOR)], ["Millet"])
+        self.assertEqual(index.candidates(region="Atlantis"), [])
+
+    def test_scores_match_orm_crops(self):
+        index = CropIndex.build()
+        for crop in Crop.objects.all():
+            entry = index.crops[crop.id]
+            for soil in (None, "loamy", "clay"):
+                self.assertEqual(
+                    score_crop(entry, region="Kumasi", season=Season.MAJOR, soil_type=soil),
+                    score_crop(crop, region="Kumasi", season=Season.MAJOR, soil_type=soil),
+                )
+
+    def test_hot_path_has_no_queries_and_rebuilds_on_write(self):
+        self.client.get(self.url, {"region": "Kumasi"})
+        with self.assertNumQueries(0):
+            res = self.client.get(self.url, {"region": "Kumasi", "soil_type": "loamy"})
+        self.assertEqual([r['name'] for r in res.data['data']['results']], ["Maize", "Millet"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Crop.objects.create(
+                name="Cassava", season=Season.MAJOR, soil_type="loamy",
+                regions=["Kumasi"], recommended_inputs={}, maturity_days=110,
+            )
+        before = get_crop_index()
+        self.assertIn("Cassava", {c.name for c in before.crops.values()})
+        res = self.client.get(self.url, {"region": "Kumasi", "soil_type": "loamy"})
+        self.assertIn("Cassava", [r['name'] for r in res.data['data']['results']])
+
+    def test_alias_change_rebuilds_index(self):
+        get_crop_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            RegionAlias.objects.create(region=Region.objects.get(slug="kumasi"), key="Ashanti Capital")
+        self.assertEqual(
+            [c.name for c in get_crop_index().candidates(region="ashanti capital")], ["Maize", "Millet"]
+        )
+
+    def test_alias_query_scores_like_canonical_region(self):
+        RegionAlias.objects.create(region=Region.objects.get(slug="kumasi"), key="ksi")
+        canonical = self.client.get(self.url, {"region": "Kumasi"}).data['data']['results']
+        alias = self.client.get(self.url, {"region": "KSI"}).data['data']['results']
+        self.assertEqual([(r['name'], r['score']) for r in alias], [(r['name'], r['score']) for r in canonical])
+        self.assertEqual(canonical[0]['score'], 2.0)
+
+        res = self.client.post(reverse('recommendations-batch'), {"profiles": [{"region": "ksi"}]}, format='json')
+        batch = res.data['data']['results'][0]['results']
+        self.assertEqual([(r['name'], r['score']) for r in batch], [(r['name'], r['score']) for r in canonical])
+
+
+class VectorizedScoringTest(APITestCase):
+    def test_matches_score_crop_exactly(self):
+        rng = random.Random(3)
+        regions = ["Accra", "Cape Coast", "Ho", "Hohoe", "Tamale"]
+        crops = [
+            SimpleNamespace(
+                name=f"Crop {i}",
+                season=rng.choice([Season.MAJOR, Season.MINOR, Season.ALL]),
+                soil_type=rng.choice(["loamy", "Clay", "", "sandy"]),
+                regions=rng.sample(regions, rng.randint(0, 3)),
+                maturity_days=rng.choice([None, 0, 1, 60, 119, 120, 121, 240, 400]),
+            )
+            for i in range(60)
+        ]
+        crops.append(SimpleNamespace(name="Odd", season="dry", soil_type="loamy", regions="Accra", maturity_days=90))
+        queries = [
+            (rng.choice(regions + ["cape  coast", "Atlantis"]),
+             rng.choice([None, "", Season.MAJOR, Season.MINOR, "dry", "wet"]),
+             rng.choice([None, "", "LOAMY", "clay", "peaty"]))
+            for _ in range(40)
+        ]
+        scores = score_matrix(CropMatrix(crops), queries)
+        for j, (region, season, soil_type) in enumerate(queries):
+            for i, crop in enumerate(crops):
+                self.assertEqual(scores[i, j], score_crop(crop, region=region, season=season, soil_type=soil_type))
+
+    def test_top_k_ranks_like_the_endpoint(self):
+        crops = [
+            SimpleNamespace(name=name, season=Season.MAJOR, soil_type="loamy", regions=["Accra"], maturity_days=days)
+            for name, days in (("A", 100), ("B", 120), ("C", 140), ("D", 100))
+        ]
+        scores = score_matrix(CropMatrix(crops), [("Accra", Season.MAJOR, None)])
+        self.assertEqual([crops[i].name for i in top_k(scores, 3)[:, 0]], ["B", "A", "D"])
+
+
+class RecommendationBatchTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        for name, season, soil_type, regions, days in (
+            ("Maize", Season.MAJOR, "loamy", ["Nairobi", "Kisumu"], 120),
+            ("Beans", Season.MINOR, "clay", ["Nairobi"], 90),
+            ("Wheat", Season.ALL, "sandy", ["Nakuru"], 150),
+            ("Rice", Season.MAJOR, "loamy", ["Mombasa", "Nairobi"], 110),
+        ) + tuple((f"Crop{i}", Season.MAJOR, "loamy" if i % 2 == 0 else "clay", ["Nairobi"], 100 + i)
+                  for i in range(5)):
+            Crop.objects.create(name=name, season=season, soil_type=soil_type, regions=regions,
+                                recommended_inputs={}, maturity_days=days)
+        self.url = reverse('recommendations')
+        self.batch_url = reverse('recommendations-batch')
+
+    def test_matches_single_profile_endpoint(self):
+        profiles = [
+            {"region": "Nairobi"},
+            {"region": "Nairobi", "season": Season.MAJOR, "soil_type": "LOAMY"},
+            {"region": "Nakuru", "season": "", "soil_type": None},
+            {"region": "Nairobi", "season": Season.MINOR, "soil_type": "clay"},
+            {"region": "Atlantis"},
+        ]
+        res = self.client.post(self.batch_url, {"profiles": profiles}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['data']['cache'], {'hits': 0, 'misses': 5})
+        batch = res.data['data']['results']
+
+        cache.clear()
+        for profile, result in zip(profiles, batch):
+            params = {k: v for k, v in profile.items() if v}
+            single = self.client.get(self.url, params).data['data']
+            if single['count']:
+                self.assertEqual(result, single)
+            else:
+                self.assertEqual(result['results'], [])
+
+    def test_dedupes_and_shares_cache_with_single_endpoint(self):
+        self.client.get(self.url, {"region": "Nairobi"})
+        profiles = [{"region": "Nairobi"}, {"region": "nairobi"}, {"region": "Nakuru"}, {"region": "Nakuru"}]
+        res = self.client.post(self.batch_url, {"profiles": profiles}, format='json')
+        data = res.data['data']
+        self.assertEqual(data['count'], 4)
+        self.assertEqual(data['cache'], {'hits': 1, 'misses': 1})
+        self.assertEqual([r['results'][0]['name'] for r in data['results'][2:]], ["Wheat", "Wheat"])
+
+        res = self.client.post(self.batch_url, {"profiles": profiles}, format='json')
+        self.assertEqual(res.data['data']['cache'], {'hits': 2, 'misses': 0})
+        # The batch-computed entry now serves the single-profile endpoint too
+        res = self.client.get(self.url, {"region": "Nakuru"})
+        self.assertIn("(cached)", res.data['message'])
+
+    def test_validation(self):
+        res = self.client.post(self.batch_url, {"profiles": [{"season": Season.MAJOR}]}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.post(self.batch_url, {"profiles": []}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(RECOMMENDATIONS_BATCH_MAX_PROFILES=2):
+            res = self.client.post(self.batch_url, {"profiles": [{"region": "Nairobi"}] * 3}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecommendationSnapshotTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="Loamy",
+            regions=["Ho", "Kumasi"], recommended_inputs={}, maturity_days=120,
+        )
+        Crop.objects.create(
+            name="Yam", season=Season.MAJOR, soil_type="clay",
+            regions=["Hohoe"], recommended_inputs={}, maturity_days=200,
+        )
+        Crop.objects.create(
+            name="Millet", season=Season.MINOR, soil_type="loamy",
+            regions=["Kumasi"], recommended_inputs={}, maturity_days=90,
+        )
+        self.url = reverse('recommendations')
+
+    def cold_start(self):
+        cache.clear()
+        crop_index._index = None
+
+    def test_warm_stores_every_matching_profile(self):
+        stored = warm_recommendations()
+        # 3 regions x (any + 2 seasons) x (any + 2 soils), minus the profiles no crop matches
+        self.assertEqual(stored, RecommendationSnapshot.objects.count())
+        self.assertEqual(
+            set(RecommendationSnapshot.objects.filter(season='', soil_type='').values_list('region', flat=True)),
+            {"ho", "hohoe", "kumasi"},
+        )
+        self.assertFalse(RecommendationSnapshot.objects.filter(region="hohoe", season=Season.MINOR).exists())
+
+        for row in RecommendationSnapshot.objects.all():
+            params = {'region': row.result['filters_applied']['region']}
+            if row.season:
+                params['season'] = row.season
+            if row.soil_type:
+                params['soil_type'] = row.soil_type.upper()
+            self.cold_start()
+            crop_index.get_crop_index()
+            computed = self.client.get(self.url, params).data['data']
+            self.assertEqual(computed['results'], row.result['results'])
+            self.assertEqual(computed['count'], row.result['count'])
+
+    def test_cold_process_answers_from_snapshot(self):
+        warm_recommendations(prime_cache=False)
+        self.cold_start()
+        # Resolving the region to its canonical slug, then the snapshot row
+        with self.assertNumQueries(2):
+            res = self.client.get(self.url, {"region": "KUMASI", "soil_type": "loamy"})
+        self.assertIn("(precomputed)", res.data['message'])
+        self.assertEqual([r['name'] for r in res.data['data']['results']], ["Maize", "Millet"])
+        self.assertEqual(res.data['data']['filters_applied']['region'], "KUMASI")
+
+        res = self.client.get(self.url, {"region": "KUMASI", "soil_type": "loamy"})
+        self.assertIn("(cached)", res.data['message'])
+
+    def test_writes_retire_affected_profiles(self):
+        warm_recommendations()
+        self.maize.regions = ["Kumasi"]
+        self.maize.save()
+        regions = set(RecommendationSnapshot.objects.values_list('region', flat=True))
+        self.assertEqual(regions, {"hohoe"})
+
+        warm_recommendations()
+        RegionAlias.objects.create(region=Region.objects.get(slug="kumasi"), key="Ashanti Capital")
+        self.assertFalse(RecommendationSnapshot.objects.exists())
+
+
+class RevenueRankingTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        crops = {}
+        for name, season in (("Maize", Season.MAJOR), ("Rice", Season.MAJOR),
+                             ("Millet", Season.MINOR), ("Teff", Season.MAJOR)):
+            crops[name] = Crop.objects.create(
+                name=name, season=season, soil_type="loamy",
+                regions=["Kumasi", "Tamale"], recommended_inputs={}, maturity_days=120,
+            )
+        self.crops = crops
+        for name, region, day, price in (
+            ("Maize", "Kumasi", 1, 100), ("Maize", "kumasi ", 2, 50), ("Rice", "Kumasi", 1, 20),
+            ("Millet", "Kumasi", 1, 500), ("Teff", "Kumasi", 1, 1000), ("Millet", "Tamale", 3, 9999),
+        ):
+            MarketPrice.objects.create(crop=crops[name], region=region, price=price, date=date(2024, 1, day))
+        self.url = reverse('recommendations')
+
+    def test_latest_price_per_crop_in_one_query(self):
+        with self.assertNumQueries(1):
+            prices = load_region_prices("KUMASI")
+        self.assertEqual(prices[self.crops["Maize"].id], (50.0, "2024-01-02"))
+        self.assertEqual(prices[self.crops["Millet"].id], (500.0, "2024-01-01"))
+        self.assertEqual(len(prices), 4)
+
+    def test_rank_by_revenue(self):
+        res = self.client.get(self.url, {"region": "Kumasi"})
+        self.assertEqual([r['name'] for r in res.data['data']['results']], ["Maize", "Millet", "Rice", "Teff"])
+
+        res = self.client.get(self.url, {"region": "Kumasi", "rank_by": "revenue"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = res.data['data']['results']
+        # Teff has a price but no base yield, so it has no revenue and goes last
+        self.assertEqual([r['name'] for r in results], ["Millet", "Maize", "Rice", "Teff"])
+        maize = results[1]
+        self.assertEqual(maize['latest_price'], 50.0)
+        self.assertEqual(maize['expected_yield_t_per_ha'], 2.75)
+        self.assertEqual(maize['expected_revenue_per_ha'], 137.5)
+        self.assertEqual(maize['revenue_score'], 275.0)
+        self.assertIsNone(results[3]['expected_revenue_per_ha'])
+        self.assertEqual(res.data['data']['filters_applied']['rank_by'], "revenue")
+
+    def test_price_write_retires_revenue_ranking(self):
+        params = {"region": "Kumasi", "rank_by": "revenue"}
+        self.client.get(self.url, params)
+        with self.captureOnCommitCallbacks(execute=True):
+            MarketPrice.objects.create(crop=self.crops["Rice"], region="Kumasi", price=400, date=date(2024, 1, 5))
+        res = self.client.get(self.url, params)
+        self.assertNotIn("(cached)", res.data['message'])
+        self.assertEqual(res.data['data']['results'][0]['name'], "Rice")
+
+    def test_alias_shares_the_region_price_vector(self):
+        RegionAlias.objects.create(region=Region.objects.get(slug="kumasi"), key="ksi")
+        get_crop_index()
+        prices = region_prices("KSI")
+        self.assertEqual(prices[self.crops["Maize"].id], (50.0, "2024-01-02"))
+        with self.assertNumQueries(0):
+            self.assertEqual(region_prices("Kumasi"), prices)
+
+    def test_invalid_rank_by(self):
+        res = self.client.get(self.url, {"region": "Kumasi", "rank_by": "profit"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
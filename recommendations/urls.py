@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import RecommendationView
+from .views import RecommendationBatchView, RecommendationView
 
 urlpatterns = [
     path('', RecommendationView.as_view(), name='recommendations'),
+    path('batch/', RecommendationBatchView.as_view(), name='recommendations-batch'),
 ]
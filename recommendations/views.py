@@ -1,25 +1,38 @@
-from typing import List, Dict
 from django.http import JsonResponse
-from django.db.models import Q
 from django.core.cache import cache
+from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from rest_framework import status
 import logging
 
+from core import single_flight
+from core.cache_versions import get_generations, region_scope, stale_key, versioned_key
+from prices.latest import LATEST_SCOPE
 from core.exceptions import APIResponse
+from crops.index import CropEntry, canonical_region_slug, current_crop_index, get_crop_index
 from crops.models import Crop, Season
-from .serializers import CropRecommendationSerializer
+from regions.models import region_key
+from yields.factors import FACTORS_SCOPE
+from .models import RecommendationSnapshot
+from .revenue import RANK_BY_CHOICES, RANK_BY_REVENUE, RANK_BY_SCORE, rank_by_revenue
+from .scoring import rank_profiles
+from .serializers import CropRecommendationSerializer, RecommendationBatchSerializer
 
 logger = logging.getLogger(__name__)
 
+RECOMMENDATIONS_CACHE_TIMEOUT = getattr(settings, 'RECOMMENDATIONS_CACHE_TIMEOUT', 86400)
 
-def score_crop(crop: Crop, region: str, season: str | None, soil_type: str | None) -> float:
-    # Basic matches
+
+def score_crop(crop: Crop | CropEntry, region: str, season: str | None, soil_type: str | None,
+               region_slug=region_key) -> float:
+    # Basic matches. ``region_slug`` maps a region name to the key it is
+    # compared by; pass ``CropIndex.region_slug`` to match aliases too.
     score = 0.0
     region_match = False
-    if isinstance(crop.regions, list):
-        region_match = any(r.lower() == region.lower() for r in crop.regions)
+    if isinstance(crop.regions, (list, tuple)):
+        key = region_slug(region)
+        region_match = any(region_slug(r) == key for r in crop.regions)
     if region_match:
         score += 1.0
 
@@ -51,6 +64,78 @@ def score_crop(crop: Crop, region: str, season: str | None, soil_type: str | Non
     return score
 
 
+def suitability_level(score: float) -> str:
+    """Convert numeric score to human-readable suitability level"""
+    if score >= 2.5:
+        return 'excellent'
+    elif score >= 2.0:
+        return 'very_good'
+    elif score >= 1.5:
+        return 'good'
+    elif score >= 1.0:
+        return 'fair'
+    else:
+        return 'poor'
+
+
+def recommendations_cache_base(region: str, season: str | None, soil_type: str | None,
+                               rank_by: str = RANK_BY_SCORE) -> str:
+    base = f"recommendations_{region.lower()}_{season or 'any'}_{soil_type or 'any'}"
+    return base + '_revenue' if rank_by == RANK_BY_REVENUE else base
+
+
+def recommendations_scopes(region_slug: str, rank_by: str = RANK_BY_SCORE) -> list:
+    # Scoped by canonical slug, which crop writes bump, so alias queries are
+    # retired with their region. Revenue ranking also depends on every
+    # latest price in the region and on the yield factors.
+    if rank_by == RANK_BY_REVENUE:
+        return [region_scope(region_slug), LATEST_SCOPE, FACTORS_SCOPE]
+    return [region_scope(region_slug)]
+
+
+def recommendations_cache_key(region: str, season: str | None, soil_type: str | None, generations=None,
+                              rank_by: str = RANK_BY_SCORE, region_slug: str | None = None) -> str:
+    return versioned_key(
+        recommendations_cache_base(region, season, soil_type, rank_by),
+        recommendations_scopes(region_slug or canonical_region_slug(region), rank_by),
+        generations,
+    )
+
+
+def build_recommendations_result(region: str, season: str | None, soil_type: str | None,
+                                 ranked, count: int, total_available: int,
+                                 rank_by: str = RANK_BY_SCORE, extras: dict | None = None) -> dict:
+    """
+    Response body for one profile from its ``(score, crop)`` pairs, best
+    first. ``extras`` maps crop ids to additional fields for their items.
+    """
+    return {
+        'count': count,
+        'total_available': total_available,
+        'results': [
+            {
+                'id': c.id,
+                'name': c.name,
+                'season': c.season,
+                'soil_type': c.soil_type,
+                'regions': list(c.regions),
+                'maturity_days': c.maturity_days,
+                'recommended_inputs': c.recommended_inputs,
+                'score': round(s, 4),
+                'suitability': suitability_level(s),
+                **(extras or {}).get(c.id, {}),
+            }
+            for s, c in ranked[:5]
+        ],
+        'filters_applied': {
+            'region': region,
+            'season': season,
+            'soil_type': soil_type,
+            'rank_by': rank_by
+        }
+    }
+
+
 class RecommendationView(APIView):
     permission_classes = [AllowAny]
 
@@ -59,6 +144,7 @@ class RecommendationView(APIView):
             region = request.query_params.get('region')
             season = request.query_params.get('season')
             soil_type = request.query_params.get('soil_type')
+            rank_by = request.query_params.get('rank_by') or RANK_BY_SCORE
 
             if not region:
                 return APIResponse.error(
@@ -67,72 +153,42 @@ class RecommendationView(APIView):
                     status_code=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Create cache key for performance
-            cache_key = f"recommendations_{region.lower()}_{season or 'any'}_{soil_type or 'any'}"
-            cached_result = cache.get(cache_key)
-            
-            if cached_result:
-                return APIResponse.success(
-                    data=cached_result,
-                    message="Crop recommendations retrieved successfully (cached)"
+            if rank_by not in RANK_BY_CHOICES:
+                return APIResponse.error(
+                    message="Invalid rank_by parameter",
+                    details={'rank_by': [f"Must be one of: {', '.join(RANK_BY_CHOICES)}"]},
+                    status_code=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Optimize database query with select_related and filtering
-            region_filter = Q(regions__icontains=region.lower())
-            crops_qs = Crop.objects.filter(region_filter).select_related()
-            
-            if season:
-                crops_qs = crops_qs.filter(season=season)
-            
-            if soil_type:
-                crops_qs = crops_qs.filter(soil_type__iexact=soil_type)
+            # One worker computes a missing or expiring entry; concurrent
+            # requests get the previous result meanwhile
+            base = recommendations_cache_base(region, season, soil_type, rank_by)
+            self.precomputed = False
+            result_data, state = single_flight.get_or_compute(
+                versioned_key(base, recommendations_scopes(canonical_region_slug(region), rank_by)),
+                lambda: self._build(region, season, soil_type, rank_by),
+                RECOMMENDATIONS_CACHE_TIMEOUT,
+                stale_key=stale_key(base),
+            )
 
-            candidates = list(crops_qs)
-            
-            if not candidates:
+            if result_data is None:
                 return APIResponse.success(
                     data={'count': 0, 'results': []},
                     message=f"No crops found for region: {region}"
                 )
 
-            # Score and sort
-            scored: List[Dict] = []
-            for c in candidates:
-                try:
-                    s = score_crop(c, region=region, season=season, soil_type=soil_type)
-                    item = {
-                        'id': c.id,
-                        'name': c.name,
-                        'season': c.season,
-                        'soil_type': c.soil_type or '',
-                        'regions': c.regions or [],
-                        'maturity_days': c.maturity_days,
-                        'recommended_inputs': c.recommended_inputs or {},
-                        'score': round(s, 4),
-                        'suitability': self._get_suitability_level(s)
-                    }
-                    scored.append(item)
-                except Exception as e:
-                    logger.warning(f"Error scoring crop {c.name}: {e}")
-                    continue
-
-            scored.sort(key=lambda x: x['score'], reverse=True)
-            top5 = scored[:5]
-
-            result_data = {
-                'count': len(scored),
-                'total_available': len(candidates),
-                'results': top5,
-                'filters_applied': {
-                    'region': region,
-                    'season': season,
-                    'soil_type': soil_type
-                }
-            }
-            
-            # Cache result for 1 hour
-            cache.set(cache_key, result_data, 3600)
-            
+            if state != single_flight.MISS:
+                return APIResponse.success(
+                    data=result_data,
+                    message="Crop recommendations retrieved successfully (cached)"
+                )
+
+            if self.precomputed:
+                return APIResponse.success(
+                    data=result_data,
+                    message="Crop recommendations retrieved successfully (precomputed)"
+                )
+
             return APIResponse.success(
                 data=result_data,
                 message="Crop recommendations generated successfully"
@@ -144,16 +200,118 @@ class RecommendationView(APIView):
                 message="An error occurred while generating recommendations",
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-    
-    def _get_suitability_level(self, score: float) -> str:
-        """Convert numeric score to human-readable suitability level"""
-        if score >= 2.5:
-            return 'excellent'
-        elif score >= 2.0:
-            return 'very_good'
-        elif score >= 1.5:
-            return 'good'
-        elif score >= 1.0:
-            return 'fair'
-        else:
-            return 'poor'
+
+    def _build(self, region, season, soil_type, rank_by):
+        """The result for one profile, or None when no crop matches."""
+        # Until this process has a current crop index, answer precomputed
+        # profiles from the snapshot table rather than building it first
+        index = current_crop_index()
+        if index is None and rank_by == RANK_BY_SCORE:
+            snapshot = RecommendationSnapshot.lookup(region, season, soil_type)
+            if snapshot is not None:
+                snapshot['filters_applied'] = {
+                    'region': region,
+                    'season': season,
+                    'soil_type': soil_type,
+                    'rank_by': rank_by
+                }
+                self.precomputed = True
+                return snapshot
+
+        # Candidates come from the in-process crop index: set intersections, no query
+        index = index or get_crop_index()
+        candidates = index.candidates(region=region, season=season, soil_type=soil_type)
+        if not candidates:
+            return None
+
+        # Score every candidate, but only build response items for the top 5.
+        # Regions are compared by canonical slug, as when picking candidates.
+        scored = []
+        for c in candidates:
+            try:
+                scored.append((
+                    score_crop(c, region=region, season=season, soil_type=soil_type, region_slug=index.region_slug),
+                    c,
+                ))
+            except Exception as e:
+                logger.warning(f"Error scoring crop {c.name}: {e}")
+                continue
+
+        scored.sort(key=lambda x: round(x[0], 4), reverse=True)
+        extras = None
+        if rank_by == RANK_BY_REVENUE:
+            scored, extras = rank_by_revenue(scored, region, season)
+        return build_recommendations_result(
+            region, season, soil_type, scored, len(scored), len(candidates), rank_by, extras
+        )
+
+
+class RecommendationBatchView(APIView):
+    """
+    Recommendations for many farm profiles in one request.
+
+    POST ``{"profiles": [{"region": ..., "season": ..., "soil_type": ...}, ...]}``.
+    Identical profiles are answered once, cache hits come from a single
+    ``get_many`` and the misses are scored together, then written back with
+    ``set_many``. Entries are shared with the single-profile endpoint.
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        try:
+            serializer = RecommendationBatchSerializer(data=request.data)
+            if not serializer.is_valid():
+                return APIResponse.error(
+                    message="Invalid parameters provided",
+                    details=serializer.errors,
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+            profiles = [
+                (p['region'], p.get('season') or None, p.get('soil_type') or None)
+                for p in serializer.validated_data['profiles']
+            ]
+
+            max_profiles = getattr(settings, 'RECOMMENDATIONS_BATCH_MAX_PROFILES', 500)
+            if len(profiles) > max_profiles:
+                return APIResponse.error(
+                    message=f"Too many profiles requested ({len(profiles)}); the limit is {max_profiles}",
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+
+            index = get_crop_index()
+            slugs = {region: index.region_slug(region) for region, _, _ in profiles}
+            generations = get_generations(region_scope(slug) for slug in slugs.values())
+            keys = [
+                recommendations_cache_key(*profile, generations, region_slug=slugs[profile[0]])
+                for profile in profiles
+            ]
+            # Profiles differing only in region case share a cache key; answer each key once
+            unique = dict(zip(keys, profiles))
+            cached = cache.get_many(list(unique))
+            misses = [key for key in unique if key not in cached]
+
+            computed = {}
+            if misses:
+                ranked = rank_profiles(index, [unique[key] for key in misses])
+                for key, (count, top) in zip(misses, ranked):
+                    computed[key] = build_recommendations_result(*unique[key], top, count, count)
+                # Like the single-profile endpoint, only non-empty results are cached
+                to_cache = {key: result for key, result in computed.items() if result['count']}
+                if to_cache:
+                    cache.set_many(to_cache, RECOMMENDATIONS_CACHE_TIMEOUT)
+
+            return APIResponse.success(
+                data={
+                    'count': len(profiles),
+                    'results': [cached.get(key) or computed[key] for key in keys],
+                    'cache': {'hits': len(unique) - len(misses), 'misses': len(misses)},
+                },
+                message="Crop recommendations generated successfully"
+            )
+
+        except Exception as e:
+            logger.error(f"Error generating batch recommendations: {e}")
+            return APIResponse.error(
+                message="An error occurred while generating recommendations",
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
@@ -0,0 +1,15 @@
+from django.contrib import admin
+from .models import Region, RegionAlias
+
+
+class RegionAliasInline(admin.TabularInline):
+    model = RegionAlias
+    extra = 1
+
+
+@admin.register(Region)
+class RegionAdmin(admin.ModelAdmin):
+    list_display = ("name", "slug")
+    search_fields = ("name", "slug", "aliases__key")
+    prepopulated_fields = {"slug": ("name",)}
+    inlines = [RegionAliasInline]
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db import migrations
+from django.utils.text import slugify
+
+
+def backfill_regions(apps, schema_editor):
+    Region = apps.get_model('regions', 'Region')
+    Crop = apps.get_model('crops', 'Crop')
+    MarketPrice = apps.get_model('prices', 'MarketPrice')
+    YieldForecast = apps.get_model('yields', 'YieldForecast')
+    Supplier = apps.get_model('suppliers', 'Supplier')
+
+    price_names = list(MarketPrice.objects.order_by().values_list('region', flat=True).distinct())
+    forecast_names = list(YieldForecast.objects.order_by().values_list('region', flat=True).distinct())
+    crop_regions = list(Crop.objects.values_list('id', 'regions'))
+    multiplier_names = [name.title() for name in getattr(settings, 'YIELD_REGION_MULTIPLIERS', {})]
+
+    # The first spelling seen for a key becomes the region's display name
+    names = {}
+    crop_names = [r for _, regions in crop_regions if isinstance(regions, list) for r in regions if isinstance(r, str)]
+    for name in [*price_names, *crop_names, *forecast_names, *multiplier_names]:
+        key = slugify(name or '')
+        if key:
+            names.setdefault(key, name.strip())
+    Region.objects.bulk_create(
+        [Region(name=name, slug=key) for key, name in names.items()],
+        ignore_conflicts=True,
+    )
+    ids = dict(Region.objects.values_list('slug', 'id'))
+
+    for model, values in ((MarketPrice, price_names), (YieldForecast, forecast_names)):
+        for name in values:
+            region_id = ids.get(slugify(name or ''))
+            if region_id:
+                model.objects.filter(region=name).update(canonical_region_id=region_id)
+
+    Through = Crop.canonical_regions.through
+    Through.objects.bulk_create(
+        [
+            Through(crop_id=crop_id, region_id=region_id)
+            for crop_id, regions in crop_regions if isinstance(regions, list)
+            for region_id in {ids.get(slugify(r)) for r in regions if isinstance(r, str)} - {None}
+        ],
+        ignore_conflicts=True,
+    )
+
+    for location in Supplier.objects.order_by().values_list('location', flat=True).distinct():
+        region_id = ids.get(slugify(location or ''))
+        if region_id:
+            Supplier.objects.filter(location=location).update(canonical_region_id=region_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('regions', '0001_initial'),
+        ('crops', '0003_crop_canonical_regions'),
+        ('prices', '0006_market_price_canonical_region'),
+        ('yields', '0002_yieldforecast_canonical_region'),
+        ('suppliers', '0004_supplier_canonical_region'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_regions, migrations.RunPython.noop),
+    ]
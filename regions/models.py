@@ -0,0 +1,54 @@
+from functools import lru_cache
+
+from django.db import models
+from django.utils.text import slugify
+from django.utils.translation import gettext_lazy as _
+
+
+@lru_cache(maxsize=4096)
+def region_key(name) -> str:
+    """Normalized lookup key for a free-text region name: ``" Cape  Coast"`` -> ``"cape-coast"``."""
+    return slugify(name or '')
+
+
+class Region(models.Model):
+    """
+    Canonical region. Free-text region names elsewhere (market prices, crop
+    region lists, yield forecasts, supplier locations) link here so filters
+    are integer equality lookups instead of case-insensitive string scans.
+    """
+    name = models.CharField(_('name'), max_length=100, unique=True)
+    slug = models.SlugField(_('slug'), max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = _('Region')
+        verbose_name_plural = _('Regions')
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = region_key(self.name)
+        super().save(*args, **kwargs)
+
+
+class RegionAlias(models.Model):
+    """Another spelling of a region, stored as its normalized key."""
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name='aliases')
+    key = models.SlugField(_('key'), max_length=100, unique=True)
+
+    class Meta:
+        ordering = ['key']
+        verbose_name = _('Region alias')
+        verbose_name_plural = _('Region aliases')
+
+    def __str__(self):
+        return f"{self.key} -> {self.region.name}"
+
+    def save(self, *args, **kwargs):
+        self.key = region_key(self.key)
+        super().save(*args, **kwargs)
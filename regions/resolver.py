@@ -0,0 +1,79 @@
+"""
+Resolve free-text region names to canonical :class:`~regions.models.Region` ids.
+
+Names are normalized with :func:`~regions.models.region_key` and matched
+against region slugs first, then aliases; both columns are unique-indexed.
+"""
+from typing import Dict, Iterable, Optional
+
+from django.db.models import Q
+
+from .models import Region, RegionAlias, region_key
+
+
+def resolve_region_ids(names: Iterable[str]) -> Dict[str, int]:
+    """Map the key of every known name to its region id; unknown names are left out."""
+    keys = {region_key(name) for name in names} - {''}
+    if not keys:
+        return {}
+    found = dict(Region.objects.filter(slug__in=keys).values_list('slug', 'id'))
+    missing = keys - found.keys()
+    if missing:
+        found.update(RegionAlias.objects.filter(key__in=missing).values_list('key', 'region_id'))
+    return found
+
+
+def matching_region_ids(name: str):
+    """
+    Subquery of the region id ``name`` resolves to, for ``<fk>__in=`` filters.
+    Resolution then happens inside the filtering query instead of in a
+    separate lookup first.
+    """
+    key = region_key(name)
+    return Region.objects.filter(Q(slug=key) | Q(aliases__key=key)).values('id')
+
+
+def resolve_region_id(name: str) -> Optional[int]:
+    return resolve_region_ids([name]).get(region_key(name))
+
+
+def ensure_region_ids(names: Iterable[str]) -> Dict[str, int]:
+    """Like :func:`resolve_region_ids`, creating regions for names not seen before."""
+    names = [name.strip() for name in names if name and name.strip()]
+    found = resolve_region_ids(names)
+    new = {}
+    for name in names:
+        key = region_key(name)
+        if key and key not in found:
+            new.setdefault(key, Region(name=name, slug=key))
+    if new:
+        # Concurrent writers may create the same region; the loser just re-reads it
+        Region.objects.bulk_create(new.values(), ignore_conflicts=True)
+        found.update(resolve_region_ids(new))
+    return found
+
+
+def ensure_region_id(name: str) -> Optional[int]:
+    return ensure_region_ids([name]).get(region_key(name))
+
+
+def resolve_region_slug(name: str) -> Optional[str]:
+    """Canonical slug for ``name`` (which may be an alias), or None when unknown."""
+    key = region_key(name)
+    if not key:
+        return None
+    if Region.objects.filter(slug=key).exists():
+        return key
+    return RegionAlias.objects.filter(key=key).values_list('region__slug', flat=True).first()
+
+
+def resolve_region_slugs(names: Iterable[str]) -> Dict[str, str]:
+    """Batch :func:`resolve_region_slug`: map the key of every known name to its canonical slug."""
+    keys = {region_key(name) for name in names} - {''}
+    if not keys:
+        return {}
+    found = {slug: slug for slug in Region.objects.filter(slug__in=keys).values_list('slug', flat=True)}
+    missing = keys - found.keys()
+    if missing:
+        found.update(RegionAlias.objects.filter(key__in=missing).values_list('key', 'region__slug'))
+    return found
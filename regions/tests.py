@@ -0,0 +1,80 @@
+from datetime import date
+
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from crops.models import Crop, Season
+from prices.ingest import upsert_batch
+from prices.models import MarketPrice
+from regions.models import Region, RegionAlias, region_key
+from regions.resolver import ensure_region_ids, resolve_region_id
+from suppliers.models import Supplier
+from yields.models import YieldForecast
+
+
+class RegionResolverTest(APITestCase):
+    def test_keys_and_aliases(self):
+        self.assertEqual(region_key("  Cape   Coast "), "cape-coast")
+        Region.objects.all().delete()
+        ids = ensure_region_ids(["Cape Coast", "cape coast", "Accra"])
+        self.assertEqual(set(ids), {"cape-coast", "accra"})
+        self.assertEqual(Region.objects.count(), 2)
+        self.assertEqual(Region.objects.get(slug="cape-coast").name, "Cape Coast")
+
+        RegionAlias.objects.create(region_id=ids["accra"], key="Greater Accra")
+        self.assertEqual(resolve_region_id("greater accra"), ids["accra"])
+        self.assertEqual(ensure_region_ids(["Greater Accra"]), {"greater-accra": ids["accra"]})
+        self.assertEqual(Region.objects.count(), 2)
+        self.assertIsNone(resolve_region_id("Atlantis"))
+
+
+class RegionLinkTest(APITestCase):
+    def setUp(self):
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Ho", "Kumasi"], recommended_inputs={}, maturity_days=120,
+        )
+        self.yam = Crop.objects.create(
+            name="Yam", season=Season.MAJOR, soil_type="loamy",
+            regions=["Hohoe"], recommended_inputs={}, maturity_days=200,
+        )
+
+    def test_writes_link_canonical_regions(self):
+        self.assertEqual(
+            sorted(self.maize.canonical_regions.values_list('slug', flat=True)), ["ho", "kumasi"]
+        )
+        self.maize.regions = ["Kumasi"]
+        self.maize.save()
+        self.assertEqual(list(self.maize.canonical_regions.values_list('slug', flat=True)), ["kumasi"])
+
+        price = MarketPrice.objects.create(crop=self.maize, region="KUMASI", price=10, date=date(2024, 1, 1))
+        upsert_batch([MarketPrice(crop=self.maize, region="kumasi ", price=11, date=date(2024, 1, 2))])
+        kumasi = Region.objects.get(slug="kumasi")
+        self.assertEqual(price.canonical_region, kumasi)
+        self.assertEqual(MarketPrice.objects.filter(canonical_region=kumasi).count(), 2)
+
+        supplier = Supplier.objects.create(name="Agro", location="Kumasi", phone="1")
+        self.assertEqual(supplier.canonical_region, kumasi)
+        supplier = Supplier.objects.create(name="Seeds", location="12 Market Road", phone="2")
+        self.assertIsNone(supplier.canonical_region)
+
+    def test_filters_use_canonical_region(self):
+        RegionAlias.objects.create(region=Region.objects.get(slug="kumasi"), key="Ashanti Capital")
+        MarketPrice.objects.create(crop=self.maize, region="Kumasi", price=10, date=date(2024, 1, 1))
+        MarketPrice.objects.create(crop=self.yam, region="Hohoe", price=10, date=date(2024, 1, 1))
+
+        res = self.client.get(reverse('marketprice-list'), {'region': 'ashanti capital'})
+        self.assertEqual([row['region'] for row in res.data['data']['results']], ["Kumasi"])
+
+        # "Ho" must not match "Hohoe" the way a substring scan of the regions JSON did
+        res = self.client.get(reverse('recommendations'), {'region': 'Ho'})
+        self.assertEqual([row['name'] for row in res.data['data']['results']], ["Maize"])
+
+    def test_yield_forecast_links_region(self):
+        res = self.client.get(reverse('yield-forecast'), {
+            'crop': 'maize', 'region': 'Cape Coast', 'season': Season.MAJOR, 'hectares': '1',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['data']['factors']['regional_multiplier'], 0.8)
+        self.assertEqual(YieldForecast.objects.get().canonical_region.slug, "cape-coast")
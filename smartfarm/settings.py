@@ -60,6 +60,7 @@ INSTALLED_APPS = [
     # Local apps
     'users.apps.UsersConfig',
     'core',
+    'regions',
     'suppliers',
     'crops',
     'prices',
@@ -217,6 +218,35 @@ YIELD_SEASON_FACTORS = {
     'dry': 0.7,
 }
 
+# The settings above are the defaults until a factor version is published
+# (publish_yield_factors). Each worker checks the active version in the
+# database at most this often, so a publish reaches every worker within this
+# many seconds even without a shared cache.
+YIELD_FACTORS_CHECK_INTERVAL = env.int('YIELD_FACTORS_CHECK_INTERVAL', default=30)
+
+# How yield forecasts are saved (yields.persistence): 'sync' inserts on the
+# request path; 'spool' (crash-safe) and 'memory' (fastest, may lose the last
+# flush interval on a crash) buffer them for a background bulk insert every
+# YIELD_FORECAST_FLUSH_INTERVAL seconds or YIELD_FORECAST_BUFFER_SIZE rows.
+YIELD_FORECAST_PERSISTENCE = env('YIELD_FORECAST_PERSISTENCE', default='sync')
+YIELD_FORECAST_BUFFER_SIZE = env.int('YIELD_FORECAST_BUFFER_SIZE', default=500)
+YIELD_FORECAST_FLUSH_INTERVAL = env.float('YIELD_FORECAST_FLUSH_INTERVAL', default=2.0)
+YIELD_FORECAST_SPOOL_DIR = env('YIELD_FORECAST_SPOOL_DIR', default=str(BASE_DIR / 'var' / 'yield_spool'))
+# Identical forecasts are stored once (YieldForecast.input_hash); this is how
+# long the hash -> stored forecast lookup stays cached.
+YIELD_FORECAST_CACHE_TIMEOUT = env.int('YIELD_FORECAST_CACHE_TIMEOUT', default=86400)
+
+# Trained regression_v1 artifacts (train_yield_model). Workers load the newest
+# version at startup unless YIELD_REGRESSION_MODEL_VERSION pins one. The
+# default is inside the release, where the build trains one; models trained
+# after the deploy need a directory every instance mounts (a persistent disk).
+YIELD_MODEL_DIR = env('YIELD_MODEL_DIR', default=str(BASE_DIR / 'var' / 'yield_models'))
+YIELD_REGRESSION_MODEL_VERSION = env.int('YIELD_REGRESSION_MODEL_VERSION', default=None)
+
+# Forecasts added to the regional supply projection per transaction, and at
+# most per /api/yield/supply/ request.
+YIELD_SUPPLY_REFRESH_BATCH = env.int('YIELD_SUPPLY_REFRESH_BATCH', default=5000)
+
 # Custom user model
 AUTH_USER_MODEL = 'users.User'
 
@@ -261,16 +291,42 @@ CORS_ALLOWED_HEADERS = [
 ]
 
 # Cache Configuration
+# CACHE_URL selects the backend, e.g. dbcache://smartfarm_cache?MAX_ENTRIES=100000
+# (run manage.py createcachetable) or redis://host:6379/0 (needs the redis
+# package). Cache generations (core.cache_versions) and single-flight locks
+# (core.single_flight) only reach every worker and management command through
+# such a shared backend; the default local-memory cache is private to each
+# process.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'smartfarm-cache',
         'TIMEOUT': 300,
-        'OPTIONS': {
-            'MAX_ENTRIES': 1000,
-        }
+        **env.cache('CACHE_URL', default='locmemcache://smartfarm-cache?MAX_ENTRIES=1000'),
     }
 }
+CACHE_IS_SHARED = not CACHES['default']['BACKEND'].endswith(('.LocMemCache', '.DummyCache'))
+
+# With a shared cache, a write's generation bump retires the affected analytics
+# and recommendation entries in every worker, so they can be kept for a day.
+# A local-memory cache only sees its own process's bumps; entries there expire
+# after the old short TTLs instead.
+PRICE_ANALYTICS_CACHE_TIMEOUT = 86400 if CACHE_IS_SHARED else 1800
+RECOMMENDATIONS_CACHE_TIMEOUT = 86400 if CACHE_IS_SHARED else 3600
+
+# Single-flight refresh of expensive cached results (core.single_flight): a
+# value stays servable for SINGLE_FLIGHT_STALE_TTL seconds past its timeout
+# while one worker, holding a lock for up to SINGLE_FLIGHT_LOCK_TIMEOUT
+# seconds, recomputes it (one per process with the local-memory cache). With nothing to serve, others wait up to
+# SINGLE_FLIGHT_WAIT seconds for that result.
+SINGLE_FLIGHT_STALE_TTL = 300
+SINGLE_FLIGHT_LOCK_TIMEOUT = 30
+SINGLE_FLIGHT_WAIT = 5
+API_STATUS_CACHE_TIMEOUT = 60
+
+# Columnar price history written by `manage.py build_price_snapshot`. Price
+# statistics read it through numpy.memmap instead of querying the database
+# while it is younger than PRICE_SNAPSHOT_MAX_AGE seconds.
+PRICE_SNAPSHOT_DIR = env('PRICE_SNAPSHOT_DIR', default=str(BASE_DIR / 'var' / 'price_snapshot'))
+PRICE_SNAPSHOT_MAX_AGE = env.int('PRICE_SNAPSHOT_MAX_AGE', default=26 * 3600)
 
 # Logging Configuration
 LOGGING = {
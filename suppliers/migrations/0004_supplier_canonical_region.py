@@ -0,0 +1,20 @@
+# Generated by Django 5.0 on 2026-10-17 11:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('regions', '0001_initial'),
+        ('suppliers', '0003_supplier_is_verified_supplier_verification_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplier',
+            name='canonical_region',
+            field=models.ForeignKey(blank=True, help_text='Region the location resolves to, if it names a known region', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='suppliers', to='regions.region'),
+        ),
+    ]
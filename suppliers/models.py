@@ -2,6 +2,8 @@ from django.conf import settings
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from regions.resolver import resolve_region_id
+
 
 class Supplier(models.Model):
     owner = models.ForeignKey(
@@ -19,6 +21,14 @@ class Supplier(models.Model):
         help_text=_('List of products: [{"name": str, "unit": str, "price": number?}]'),
     )
     location = models.CharField(_('location'), max_length=255)
+    canonical_region = models.ForeignKey(
+        'regions.Region',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='suppliers',
+        help_text=_('Region the location resolves to, if it names a known region'),
+    )
     phone = models.CharField(_('phone'), max_length=50)
     is_verified = models.BooleanField(default=False)
     verification_date = models.DateTimeField(null=True, blank=True)
@@ -42,6 +52,11 @@ class Supplier(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Locations are free text, so only link a region that already exists
+        self.canonical_region_id = resolve_region_id(self.location)
+        super().save(*args, **kwargs)
+
 
 class Product(models.Model):
     CATEGORY_CHOICES = [
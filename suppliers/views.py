@@ -1,6 +1,7 @@
 from django.db.models import Q
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from regions.resolver import matching_region_ids
 from .models import Supplier, Product
 from .serializers import SupplierSerializer, ProductSerializer
 from .permissions import IsOwnerOrStaff
@@ -19,6 +20,9 @@ class SupplierViewSet(viewsets.ModelViewSet):
         location = self.request.query_params.get('location')
         if location:
             qs = qs.filter(location__icontains=location)
+        region = self.request.query_params.get('region')
+        if region:
+            qs = qs.filter(canonical_region__in=matching_region_ids(region))
         return qs
 
     def perform_create(self, serializer):
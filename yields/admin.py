@@ -0,0 +1,32 @@
+from django.contrib import admin
+from .factors import activate_factor_set
+from .models import YieldActual, YieldFactor, YieldFactorSet
+
+
+class YieldFactorInline(admin.TabularInline):
+    model = YieldFactor
+    extra = 0
+
+
+@admin.register(YieldFactorSet)
+class YieldFactorSetAdmin(admin.ModelAdmin):
+    list_display = ("version", "note", "is_active", "created_at", "activated_at")
+    readonly_fields = ("is_active", "activated_at")
+    inlines = [YieldFactorInline]
+    actions = ["activate"]
+
+    @admin.action(description="Activate the selected version")
+    def activate(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, "Select exactly one version to activate.", level="error")
+            return
+        factor_set = activate_factor_set(queryset.get())
+        self.message_user(request, f"Yield factors v{factor_set.version} are now active.")
+
+
+@admin.register(YieldActual)
+class YieldActualAdmin(admin.ModelAdmin):
+    list_display = ("crop_name", "region", "season", "hectares", "actual_yield", "harvested_on")
+    list_filter = ("season",)
+    search_fields = ("crop_name", "region")
+    exclude = ("canonical_region",)
@@ -5,3 +5,10 @@ class YieldsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'yields'
 
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .engines import get_engine
+        from .models import YieldMethod
+        # Each worker loads the trained model once, at startup
+        get_engine(YieldMethod.REGRESSION_V1).load()
@@ -0,0 +1,179 @@
+"""
+Forecast engines, one per :class:`~yields.models.YieldMethod`.
+
+An engine answers a batch of plots given as parallel sequences of crop keys
+(lower-case names), region factor keys, seasons and hectares, and returns
+for each plot the forecast yield (``Decimal``, two places) and the
+``factors`` recorded with it. The endpoints, ``forecast_plots`` and the
+benchmark only go through :func:`get_engine`; a new method is a new
+engine passed to :func:`register_engine`.
+"""
+import logging
+import threading
+from abc import ABC, abstractmethod
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .factors import current_factors
+from .forecast import CENT, forecast_yield
+from .models import YieldMethod
+from . import regression
+
+logger = logging.getLogger(__name__)
+
+
+class ForecastEngine(ABC):
+    method: str = ''
+    unavailable_reason: str = ''
+
+    def available(self) -> bool:
+        """Whether the engine can forecast at all (e.g. a model has been trained)."""
+        return True
+
+    def version(self):
+        """Version of the factors or model in use, for status and responses."""
+        return None
+
+    @abstractmethod
+    def unsupported(self, crop_key: str, region_key: str, season: str) -> Dict[str, str]:
+        """Error message per field (``crop``, ``region``, ``season``) the engine cannot forecast."""
+
+    @abstractmethod
+    def forecast(self, crop_keys: Sequence[str], region_keys: Sequence[str], seasons: Sequence[str],
+                 hectares: Sequence[Decimal]) -> Tuple[List[Decimal], List[dict]]:
+        """Forecasts and factors of supported plots."""
+
+
+class MockEngine(ForecastEngine):
+    """``mock_v1``: base yield x regional multiplier x season factor from the factor table."""
+    method = YieldMethod.MOCK_V1
+
+    def version(self):
+        return current_factors().version
+
+    def unsupported(self, crop_key, region_key, season):
+        table = current_factors()
+        errors = {}
+        if crop_key not in table.base_yields:
+            errors['crop'] = "Crop not supported for mock forecast"
+        if region_key not in table.region_multipliers:
+            errors['region'] = "Region not supported for mock forecast"
+        if season not in table.season_factors:
+            errors['season'] = f"Yield data not available for season: {season}"
+        return errors
+
+    def forecast(self, crop_keys, region_keys, seasons, hectares):
+        table = current_factors()
+        forecasts, factors = [], []
+        for crop_key, region_key, season, area in zip(crop_keys, region_keys, seasons, hectares):
+            forecasts.append(forecast_yield(
+                table.base_yields[crop_key], table.region_multipliers[region_key], table.season_factors[season], area,
+            ))
+            factors.append(table.factors_for(crop_key, region_key, season))
+        return forecasts, factors
+
+
+class RegressionEngine(ForecastEngine):
+    """
+    ``regression_v1``: the newest artifact written by ``train_yield_model``
+    (or ``YIELD_REGRESSION_MODEL_VERSION``), loaded once per process.
+    """
+    method = YieldMethod.REGRESSION_V1
+    unavailable_reason = "No regression model has been trained; run manage.py train_yield_model"
+
+    def __init__(self, model: Optional[regression.RegressionModel] = None):
+        # An engine given a model (e.g. by the benchmark) never loads one
+        self._model = model
+        self._loaded = model is not None
+        self._lock = threading.Lock()
+
+    def load(self, reload: bool = False) -> Optional[regression.RegressionModel]:
+        if self._loaded and not reload:
+            return self._model
+        with self._lock:
+            if not self._loaded or reload:
+                try:
+                    self._model = regression.load_artifact(
+                        version=getattr(settings, 'YIELD_REGRESSION_MODEL_VERSION', None)
+                    )
+                except (OSError, ValueError, KeyError) as e:
+                    logger.error(f"Error loading yield regression model: {e}")
+                    self._model = None
+                self._loaded = True
+        return self._model
+
+    @property
+    def model(self) -> Optional[regression.RegressionModel]:
+        return self.load()
+
+    def available(self):
+        return self.model is not None
+
+    def version(self):
+        model = self.model
+        return model.version if model else None
+
+    def unsupported(self, crop_key, region_key, season):
+        model = self.model
+        if model is None:
+            return {'method': self.unavailable_reason}
+        errors = {}
+        if crop_key not in model.crop_index:
+            errors['crop'] = "Crop not covered by the regression model"
+        if region_key not in model.region_index:
+            errors['region'] = "Region not covered by the regression model"
+        if season not in model.season_index:
+            errors['season'] = f"Yield data not available for season: {season}"
+        return errors
+
+    def forecast(self, crop_keys, region_keys, seasons, hectares):
+        model = self.model
+        crop_idx = np.fromiter((model.crop_index[k] for k in crop_keys), dtype=np.int64, count=len(crop_keys))
+        region_idx = np.fromiter((model.region_index[k] for k in region_keys), dtype=np.int64, count=len(region_keys))
+        season_idx = np.fromiter((model.season_index[k] for k in seasons), dtype=np.int64, count=len(seasons))
+        rates = model.predict_rates(crop_idx, region_idx, season_idx)
+        totals = np.round(rates * np.array([float(h) for h in hectares], dtype=np.float64), 2)
+        forecasts = [Decimal(repr(t)).quantize(CENT) for t in totals.tolist()]
+        factors = [
+            {'model_version': model.version, 'yield_t_per_ha': round(rate, 4)}
+            for rate in rates.tolist()
+        ]
+        return forecasts, factors
+
+
+_engines: Dict[str, ForecastEngine] = {}
+
+
+def register_engine(engine: ForecastEngine) -> ForecastEngine:
+    _engines[engine.method] = engine
+    return engine
+
+
+def get_engine(method: str) -> ForecastEngine:
+    try:
+        return _engines[method]
+    except KeyError:
+        raise ValueError(f"No forecast engine for method: {method}")
+
+
+def engine_status() -> Dict[str, dict]:
+    """Availability and version of every registered engine, for the status endpoint."""
+    return {
+        method: {'available': engine.available(), 'version': engine.version()}
+        for method, engine in _engines.items()
+    }
+
+
+register_engine(MockEngine())
+register_engine(RegressionEngine())
+
+
+@receiver(setting_changed)
+def _reload_on_setting_change(setting, **kwargs):
+    if setting in ('YIELD_MODEL_DIR', 'YIELD_REGRESSION_MODEL_VERSION'):
+        get_engine(YieldMethod.REGRESSION_V1).load(reload=True)
@@ -0,0 +1,198 @@
+"""
+Lookup of the mock forecast factors.
+
+Factors live in versioned :class:`~yields.models.YieldFactorSet` rows; the
+``YIELD_*`` settings are the defaults while no set has been published. Each
+process loads the current version once into a :class:`FactorTable` with
+every value already converted, and reloads it only when ``FACTORS_SCOPE`` is
+bumped, which publishing, activating or editing a set does, or when a
+periodic check finds a different active set in the database.
+"""
+import threading
+import time
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, Optional
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Max
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.cache_versions import bump_on_commit, get_generations
+from regions.models import region_key
+from regions.resolver import resolve_region_slug, resolve_region_slugs
+from .models import FactorKind, YieldFactor, YieldFactorSet
+
+FACTORS_SCOPE = 'yields.factors'
+
+FACTOR_SETTINGS = {
+    FactorKind.BASE_YIELD: 'YIELD_BASE_YIELDS',
+    FactorKind.REGION: 'YIELD_REGION_MULTIPLIERS',
+    FactorKind.SEASON: 'YIELD_SEASON_FACTORS',
+}
+
+
+def _frozen(values: Mapping) -> Mapping:
+    return MappingProxyType(dict(values))
+
+
+class FactorTable:
+    """
+    Read-only factors of one version, keyed like :class:`~yields.models.YieldFactor`
+    (lower-case crop name, region key, season). Values are kept both as
+    ``Decimal`` for the forecast arithmetic and as ``float`` for responses.
+    ``version`` is 0 for the settings defaults.
+    """
+    __slots__ = ('version', 'base_yields', 'region_multipliers', 'season_factors',
+                 'base_yield_floats', 'region_multiplier_floats', 'season_factor_floats')
+
+    def __init__(self, version: int, base_yields: Mapping[str, Decimal],
+                 region_multipliers: Mapping[str, Decimal], season_factors: Mapping[str, Decimal]):
+        self.version = version
+        self.base_yields = _frozen(base_yields)
+        self.region_multipliers = _frozen(region_multipliers)
+        self.season_factors = _frozen(season_factors)
+        self.base_yield_floats = _frozen({k: float(v) for k, v in base_yields.items()})
+        self.region_multiplier_floats = _frozen({k: float(v) for k, v in region_multipliers.items()})
+        self.season_factor_floats = _frozen({k: float(v) for k, v in season_factors.items()})
+
+    def factors_for(self, crop_key: str, region_key: str, season: str) -> Dict[str, float]:
+        """The ``factors`` of a forecast response and row."""
+        return {
+            'base_yield_t_per_ha': self.base_yield_floats[crop_key],
+            'regional_multiplier': self.region_multiplier_floats[region_key],
+            'season_factor': self.season_factor_floats[season],
+        }
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        """The factors by kind, as accepted by :func:`publish_factor_set`."""
+        return {
+            FactorKind.BASE_YIELD.value: dict(self.base_yield_floats),
+            FactorKind.REGION.value: dict(self.region_multiplier_floats),
+            FactorKind.SEASON.value: dict(self.season_factor_floats),
+        }
+
+
+def _normalized(kind: str, values: Mapping) -> Dict[str, Decimal]:
+    return {YieldFactor.normalize_key(kind, name): Decimal(str(value)) for name, value in values.items()}
+
+
+def settings_factor_table() -> FactorTable:
+    """The ``YIELD_*`` settings as a table (version 0)."""
+    return FactorTable(0, *(
+        _normalized(kind, getattr(settings, name, {})) for kind, name in FACTOR_SETTINGS.items()
+    ))
+
+
+def active_factor_set() -> Optional[YieldFactorSet]:
+    return YieldFactorSet.objects.filter(is_active=True).order_by('-version').first()
+
+
+def load_factor_table() -> FactorTable:
+    """The active factor set from the database, or the settings defaults."""
+    factor_set = active_factor_set()
+    if factor_set is None:
+        return settings_factor_table()
+    values = {kind: {} for kind in FactorKind.values}
+    for kind, key, value in factor_set.factors.values_list('kind', 'key', 'value'):
+        values[kind][key] = value
+    return FactorTable(
+        factor_set.version, values[FactorKind.BASE_YIELD], values[FactorKind.REGION], values[FactorKind.SEASON],
+    )
+
+
+_loaded = None
+_load_lock = threading.Lock()
+
+
+def active_factor_stamp() -> Optional[tuple]:
+    """``(version, updated_at)`` of the active factor set, or None for the settings defaults."""
+    return (
+        YieldFactorSet.objects.filter(is_active=True).order_by('-version')
+        .values_list('version', 'updated_at').first()
+    )
+
+
+def current_factors() -> FactorTable:
+    """
+    This process's factor table. It is reloaded at once when the factors
+    scope has been bumped, which a shared cache carries to every worker, and
+    otherwise when the active set has changed in the database, which is
+    checked at most every ``YIELD_FACTORS_CHECK_INTERVAL`` seconds.
+    """
+    global _loaded
+    # Read before loading, so a bump during the load triggers another one
+    generation = get_generations([FACTORS_SCOPE])[FACTORS_SCOPE]
+    now = time.monotonic()
+    loaded = _loaded
+    if loaded is not None and loaded[0] == generation and now < loaded[2]:
+        return loaded[3]
+    with _load_lock:
+        loaded = _loaded
+        check_until = now + getattr(settings, 'YIELD_FACTORS_CHECK_INTERVAL', 30)
+        if loaded is None or loaded[0] != generation:
+            stamp = active_factor_stamp()
+            loaded = (generation, stamp, check_until, load_factor_table())
+        elif now >= loaded[2]:
+            stamp = active_factor_stamp()
+            table = loaded[3] if stamp == loaded[1] else load_factor_table()
+            loaded = (generation, stamp, check_until, table)
+        _loaded = loaded
+    return loaded[3]
+
+
+def reset_factor_table() -> None:
+    """Drop this process's table; the next :func:`current_factors` reloads it."""
+    global _loaded
+    _loaded = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting in FACTOR_SETTINGS.values():
+        reset_factor_table()
+
+
+def activate_factor_set(factor_set: YieldFactorSet) -> YieldFactorSet:
+    """Make ``factor_set`` the only active set; used to publish and to roll back."""
+    with transaction.atomic():
+        YieldFactorSet.objects.filter(is_active=True).exclude(pk=factor_set.pk).update(is_active=False)
+        factor_set.is_active = True
+        factor_set.activated_at = timezone.now()
+        factor_set.save(update_fields=['is_active', 'activated_at'])
+        bump_on_commit([FACTORS_SCOPE])
+    return factor_set
+
+
+def publish_factor_set(factors: Mapping[str, Mapping], note: str = '', activate: bool = True) -> YieldFactorSet:
+    """
+    Store ``{kind: {name: value}}`` as a new version (the next after the
+    highest stored) and, by default, activate it. A concurrent publish of
+    the same version fails on the unique version.
+    """
+    with transaction.atomic():
+        version = (YieldFactorSet.objects.aggregate(v=Max('version'))['v'] or 0) + 1
+        factor_set = YieldFactorSet.objects.create(version=version, note=note)
+        YieldFactor.objects.bulk_create([
+            YieldFactor(factor_set=factor_set, kind=kind, key=key, value=value)
+            for kind, values in factors.items()
+            for key, value in _normalized(kind, values).items()
+        ])
+        if activate:
+            activate_factor_set(factor_set)
+    return factor_set
+
+
+def region_factor_key(region: str) -> str:
+    """Key of ``region`` in the factor table's regional multipliers, following region aliases."""
+    return resolve_region_slug(region) or region_key(region)
+
+
+def region_factor_keys(regions: Iterable[str]) -> Dict[str, str]:
+    """:func:`region_factor_key` for many regions with at most two queries, keyed by the given names."""
+    regions = set(regions)
+    slugs = resolve_region_slugs(regions)
+    return {region: slugs.get(region_key(region), region_key(region)) for region in regions}
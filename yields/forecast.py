@@ -0,0 +1,119 @@
+"""
+The mock forecast formula and the batch form of every forecast method.
+
+``forecast_yield = base_yield_by_crop * regional_multiplier * season_factor * hectares``
+
+:func:`forecast_plots` answers many plots with one crop query, at most two
+region queries and one call to the method's engine. Engines compute a plot
+the same way whether it comes alone or in a batch, so a plot gets the same
+forecast from the single and batch endpoints.
+
+Forecasts are deterministic, so :func:`forecast_input_hash` addresses one by
+its inputs: identical queries share a cache entry and a single row.
+"""
+import hashlib
+import json
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from crops.models import Crop
+from .factors import region_factor_keys
+
+CENT = Decimal('0.01')
+
+
+def forecast_yield(base: Decimal, regional_multiplier: Decimal, season_factor: Decimal,
+                   hectares: Decimal) -> Decimal:
+    return (base * regional_multiplier * season_factor * hectares).quantize(CENT)
+
+
+def forecast_input_hash(method: str, crop_id: Optional[int], region_key: str, season: str,
+                        hectares: Decimal, factors: dict) -> str:
+    """
+    SHA-256 of everything a forecast depends on. The factor values are part
+    of it, so changing the configured factors starts new forecasts instead of
+    returning ones computed with the old values.
+    """
+    payload = json.dumps(
+        [method, crop_id, region_key, season, str(Decimal(hectares).quantize(CENT)), factors],
+        sort_keys=True, separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def resolve_crops(values: Iterable[str]) -> Dict[str, Crop]:
+    """
+    Map each crop id or name (case-insensitive) to its crop, with one query.
+    Digits are tried as an id first, then as a name; unknown values are left out.
+    """
+    values = {str(v).strip() for v in values}
+    ids = {int(v) for v in values if v.isdigit()}
+    names = {v.lower() for v in values}
+    crops = (
+        Crop.objects.annotate(name_key=Lower('name'))
+        .filter(Q(id__in=ids) | Q(name_key__in=names))
+        .order_by()
+    )
+    by_id, by_name = {}, {}
+    for crop in crops:
+        by_id[crop.id] = crop
+        by_name[crop.name_key] = crop
+    found = {}
+    for value in values:
+        crop = by_id.get(int(value)) if value.isdigit() else None
+        crop = crop or by_name.get(value.lower())
+        if crop is not None:
+            found[value] = crop
+    return found
+
+
+def forecast_plots(plots: List[dict], engine) -> Tuple[List[dict], List[dict]]:
+    """
+    Forecast validated ``{crop, region, season, hectares}`` plots with a
+    forecast engine (:mod:`yields.engines`). Returns the forecasts (with the
+    resolved ``crop`` instance, ``index`` of the plot and ``input_hash``)
+    and, for plots that cannot be forecast, ``{index, errors}`` entries.
+    """
+    crops = resolve_crops(plot['crop'] for plot in plots)
+    region_keys = region_factor_keys(plot['region'] for plot in plots)
+
+    accepted, errors = [], []
+    for index, plot in enumerate(plots):
+        crop = crops.get(str(plot['crop']).strip())
+        region_key = region_keys[plot['region']]
+        if crop is None:
+            plot_errors = engine.unsupported('', region_key, plot['season'])
+            plot_errors['crop'] = "Crop not found by id or name"
+        else:
+            plot_errors = engine.unsupported(crop.name.lower(), region_key, plot['season'])
+        if plot_errors:
+            errors.append({'index': index, 'errors': {field: [message] for field, message in plot_errors.items()}})
+            continue
+        accepted.append((index, plot, crop, region_key))
+
+    # One engine call for the whole batch
+    yields, factors = engine.forecast(
+        [crop.name.lower() for _, _, crop, _ in accepted],
+        [region_key for _, _, _, region_key in accepted],
+        [plot['season'] for _, plot, _, _ in accepted],
+        [plot['hectares'] for _, plot, _, _ in accepted],
+    ) if accepted else ([], [])
+
+    forecasts = []
+    for (index, plot, crop, region_key), forecast, plot_factors in zip(accepted, yields, factors):
+        forecasts.append({
+            'index': index,
+            'crop': crop,
+            'region': plot['region'],
+            'season': plot['season'],
+            'hectares': plot['hectares'],
+            'forecast_yield': forecast,
+            'factors': plot_factors,
+            'input_hash': forecast_input_hash(
+                engine.method, crop.id, region_key, plot['season'], plot['hectares'], plot_factors,
+            ),
+        })
+    return forecasts, errors
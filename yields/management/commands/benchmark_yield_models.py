@@ -0,0 +1,60 @@
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from yields.engines import RegressionEngine, get_engine
+from yields.factors import current_factors
+from yields.models import YieldMethod
+from yields.regression import train
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark batch inference of the yield forecast methods on the same synthetic plots. "
+        "Uses the trained regression model, or fits one in memory when none has been trained."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--plots", type=int, default=10_000, help="Plots per batch")
+        parser.add_argument("--repeat", type=int, default=3, help="Timed runs; the best is reported")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed for the plots")
+
+    def handle(self, *args, **options):
+        if options["plots"] < 1 or options["repeat"] < 1:
+            raise CommandError("--plots and --repeat must be at least 1")
+
+        table = current_factors()
+        regression = get_engine(YieldMethod.REGRESSION_V1)
+        if not regression.available():
+            self.stdout.write("No trained regression model; fitting one in memory")
+            regression = RegressionEngine(model=train(table))
+        engines = [get_engine(YieldMethod.MOCK_V1), regression]
+
+        # Only combinations both methods can forecast
+        model = regression.model
+        crops = [k for k in table.base_yields if k in model.crop_index]
+        regions = [k for k in table.region_multipliers if k in model.region_index]
+        seasons = [k for k in table.season_factors if k in model.season_index]
+        if not (crops and regions and seasons):
+            raise CommandError("The methods have no crop, region and season in common")
+
+        n = options["plots"]
+        rng = np.random.default_rng(options["seed"])
+        crop_keys = [crops[i] for i in rng.integers(len(crops), size=n)]
+        region_keys = [regions[i] for i in rng.integers(len(regions), size=n)]
+        season_keys = [seasons[i] for i in rng.integers(len(seasons), size=n)]
+        hectares = [Decimal(int(c)) / 100 for c in rng.integers(1, 10_000, size=n)]
+
+        for engine in engines:
+            best = None
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                engine.forecast(crop_keys, region_keys, season_keys, hectares)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            self.stdout.write(self.style.SUCCESS(
+                f"{engine.method} (version {engine.version()}): {n} plots, best {best * 1000:.1f}ms "
+                f"({best / n * 1e6:.2f}us per plot, {n / best:,.0f} plots/s)"
+            ))
@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from yields.factors import activate_factor_set, load_factor_table, publish_factor_set, settings_factor_table
+from yields.models import FactorKind, YieldFactorSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Publish a new version of the yield forecast factors and make it active. The new version "
+        "starts from the active one (or the YIELD_* settings) with the values from --file on top. "
+        "Running workers pick it up without a deploy: on their next forecast when they share the "
+        "cache (CACHE_URL), otherwise within YIELD_FACTORS_CHECK_INTERVAL seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", type=str, default=None,
+                            help='JSON of {"base_yield": {crop: t/ha}, "region": {region: multiplier}, '
+                                 '"season": {season: factor}} to merge in')
+        parser.add_argument("--from-settings", action="store_true",
+                            help="Start from the YIELD_* settings instead of the active version")
+        parser.add_argument("--note", type=str, default="", help="Description of the change")
+        parser.add_argument("--if-empty", action="store_true",
+                            help="Do nothing when a version has already been published")
+        parser.add_argument("--activate", type=int, default=None, metavar="VERSION",
+                            help="Activate an existing version instead (e.g. to roll back)")
+
+    def handle(self, *args, **options):
+        if options["activate"] is not None:
+            factor_set = YieldFactorSet.objects.filter(version=options["activate"]).first()
+            if factor_set is None:
+                raise CommandError(f"No yield factor version {options['activate']}")
+            activate_factor_set(factor_set)
+            self.stdout.write(self.style.SUCCESS(f"Activated yield factors v{factor_set.version}"))
+            return
+
+        if options["if_empty"] and YieldFactorSet.objects.exists():
+            self.stdout.write("Yield factors already published; nothing to do")
+            return
+
+        base = settings_factor_table() if options["from_settings"] else load_factor_table()
+        factors = base.as_dict()
+        if options["file"]:
+            try:
+                with open(options["file"]) as fh:
+                    changes = json.load(fh)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read {options['file']}: {e}")
+            unknown = set(changes) - set(FactorKind.values)
+            if unknown:
+                raise CommandError(f"Unknown factor kinds: {', '.join(sorted(unknown))}")
+            for kind, values in changes.items():
+                factors[kind].update(values)
+
+        factor_set = publish_factor_set(factors, note=options["note"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Published yield factors v{factor_set.version}: "
+            f"{sum(len(values) for values in factors.values())} factors"
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from yields.supply import rebuild_supply_projection, refresh_supply_projection
+
+
+class Command(BaseCommand):
+    help = (
+        "Add stored yield forecasts that are not in the regional supply projection yet. "
+        "With --rebuild, recompute the projection from all forecasts, e.g. after deleting "
+        "forecasts or changing a crop's maturity_days."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true",
+                            help="Drop the projection and recompute it from every forecast")
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="Forecasts per transaction (default: YIELD_SUPPLY_REFRESH_BATCH)")
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            projected = rebuild_supply_projection(batch_size=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt supply projection from {projected} forecasts"))
+            return
+        projected, _ = refresh_supply_projection(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Projected {projected} new forecasts"))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from yields.factors import current_factors
+from yields.regression import get_model_dir, save_artifact, train
+
+
+class Command(BaseCommand):
+    help = (
+        "Fit the regression_v1 yield model (log-linear least squares over crop, region and season) "
+        "to the current yield factors and every stored YieldActual, and save it as the next model "
+        "version. Workers load the newest version when they start."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--actual-weight", type=float, default=5.0,
+                            help="Weight of each recorded harvest against one factor-table combination")
+        parser.add_argument("--ridge", type=float, default=1e-3, help="Ridge penalty on the effects")
+        parser.add_argument("--output", type=str, default=None,
+                            help="Model directory (defaults to settings.YIELD_MODEL_DIR)")
+
+    def handle(self, *args, **options):
+        if options["actual_weight"] <= 0 or options["ridge"] < 0:
+            raise CommandError("--actual-weight must be positive and --ridge not negative")
+
+        started = time.monotonic()
+        model = train(current_factors(), actual_weight=options["actual_weight"], ridge=options["ridge"])
+        path = save_artifact(model, options["output"] or get_model_dir())
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained yield model v{model.version} on {model.meta['rows']} rows "
+            f"({model.meta['actuals']} actuals), RMSE {model.meta['rmse_log']:.4f} (log t/ha), "
+            f"in {elapsed:.2f}s: {path}"
+        ))
@@ -0,0 +1,20 @@
+# Generated by Django 5.0 on 2026-10-17 11:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('regions', '0001_initial'),
+        ('yields', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='yieldforecast',
+            name='canonical_region',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='yield_forecasts', to='regions.region'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0 on 2026-10-17 11:55
+
+import hashlib
+import json
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def _input_hash(method, crop_id, region_key, season, hectares, factors):
+    # yields.forecast.forecast_input_hash as of this migration
+    payload = json.dumps(
+        [method, crop_id, region_key, season, str(Decimal(hectares).quantize(Decimal('0.01'))), factors],
+        sort_keys=True, separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def backfill_input_hashes(apps, schema_editor):
+    # The oldest row of each distinct forecast gets the hash; later duplicates
+    # keep NULL so the unique column can be filled without deleting history.
+    YieldForecast = apps.get_model('yields', 'YieldForecast')
+    seen = set()
+    batch = []
+    rows = YieldForecast.objects.order_by('id').select_related('canonical_region').iterator(chunk_size=2000)
+    for row in rows:
+        region_key = row.canonical_region.slug if row.canonical_region_id else slugify(row.region or '')
+        digest = _input_hash(row.method, row.crop_id, region_key, row.season, row.hectares, row.factors)
+        if digest in seen:
+            continue
+        seen.add(digest)
+        row.input_hash = digest
+        batch.append(row)
+        if len(batch) >= 2000:
+            YieldForecast.objects.bulk_update(batch, ['input_hash'])
+            batch = []
+    if batch:
+        YieldForecast.objects.bulk_update(batch, ['input_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('yields', '0002_yieldforecast_canonical_region'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='yieldforecast',
+            name='input_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_input_hashes, migrations.RunPython.noop),
+    ]
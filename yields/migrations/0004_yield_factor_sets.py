@@ -0,0 +1,45 @@
+# Generated by Django 5.0 on 2026-10-17 11:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('yields', '0003_yield_forecast_input_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='YieldFactorSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(unique=True, verbose_name='version')),
+                ('note', models.CharField(blank=True, max_length=200, verbose_name='note')),
+                ('is_active', models.BooleanField(default=False, verbose_name='active')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('activated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-version'],
+            },
+        ),
+        migrations.CreateModel(
+            name='YieldFactor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('base_yield', 'Base yield (t/ha) by crop'), ('region', 'Regional multiplier'), ('season', 'Season factor')], max_length=20, verbose_name='kind')),
+                ('key', models.CharField(max_length=100, verbose_name='key')),
+                ('value', models.DecimalField(decimal_places=4, max_digits=10, verbose_name='value')),
+                ('factor_set', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='factors', to='yields.yieldfactorset')),
+            ],
+            options={
+                'ordering': ['kind', 'key'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='yieldfactor',
+            constraint=models.UniqueConstraint(fields=('factor_set', 'kind', 'key'), name='unique_yield_factor_key'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0 on 2026-10-17 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crops', '0003_crop_canonical_regions'),
+        ('regions', '0002_backfill_regions'),
+        ('yields', '0004_yield_factor_sets'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='yieldforecast',
+            name='method',
+            field=models.CharField(choices=[('mock_v1', 'Deterministic mock v1'), ('regression_v1', 'Log-linear regression v1')], default='mock_v1', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='YieldActual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('crop_name', models.CharField(max_length=100)),
+                ('region', models.CharField(max_length=100)),
+                ('season', models.CharField(choices=[('major', 'Major Season'), ('minor', 'Minor Season'), ('all', 'All Seasons')], max_length=10)),
+                ('hectares', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('actual_yield', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='actual yield (t)')),
+                ('harvested_on', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('canonical_region', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='yield_actuals', to='regions.region')),
+                ('crop', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='yield_actuals', to='crops.crop')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0 on 2026-10-17 12:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crops', '0003_crop_canonical_regions'),
+        ('regions', '0002_backfill_regions'),
+        ('yields', '0005_yield_actuals_regression_method'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplyProjection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('region', models.CharField(max_length=100, verbose_name='region key')),
+                ('harvest_week', models.DateField(verbose_name='harvest week (Monday)')),
+                ('expected_yield', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='expected yield (t)')),
+                ('hectares', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('forecasts', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['harvest_week', 'region', 'crop'],
+            },
+        ),
+        migrations.AddField(
+            model_name='yieldforecast',
+            name='supply_projected',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='yieldforecast',
+            index=models.Index(condition=models.Q(('supply_projected', False)), fields=['id'], name='yield_forecast_unprojected'),
+        ),
+        migrations.AddField(
+            model_name='supplyprojection',
+            name='crop',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='supply_projections', to='crops.crop'),
+        ),
+        migrations.AddIndex(
+            model_name='supplyprojection',
+            index=models.Index(fields=['region', 'harvest_week'], name='yields_supp_region_814858_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplyprojection',
+            index=models.Index(fields=['harvest_week'], name='yields_supp_harvest_16f002_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='supplyprojection',
+            constraint=models.UniqueConstraint(fields=('region', 'crop', 'harvest_week'), name='unique_supply_projection_bucket'),
+        ),
+    ]
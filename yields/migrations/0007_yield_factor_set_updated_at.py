@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-17 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('yields', '0006_supply_projection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='yieldfactorset',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -2,22 +2,33 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 
 from crops.models import Crop, Season
+from regions.models import region_key
+from regions.resolver import ensure_region_id
 
 
 class YieldMethod(models.TextChoices):
     MOCK_V1 = 'mock_v1', _('Deterministic mock v1')
+    REGRESSION_V1 = 'regression_v1', _('Log-linear regression v1')
 
 
 class YieldForecast(models.Model):
     crop = models.ForeignKey(Crop, on_delete=models.SET_NULL, null=True, blank=True, related_name='yield_forecasts')
     crop_name = models.CharField(max_length=100)
     region = models.CharField(max_length=100)
+    canonical_region = models.ForeignKey(
+        'regions.Region', on_delete=models.SET_NULL, null=True, blank=True, related_name='yield_forecasts'
+    )
     season = models.CharField(max_length=10, choices=Season.choices)
     hectares = models.DecimalField(max_digits=10, decimal_places=2)
 
     forecast_yield = models.DecimalField(max_digits=14, decimal_places=2)
     factors = models.JSONField(default=dict)
     method = models.CharField(max_length=20, choices=YieldMethod.choices, default=YieldMethod.MOCK_V1)
+    # Hash of the forecast inputs and method (yields.forecast.forecast_input_hash):
+    # one row per distinct forecast. Rows from before hashing may be NULL.
+    input_hash = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+    # Set once the forecast has been added to SupplyProjection (yields.supply)
+    supply_projected = models.BooleanField(default=False, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -27,7 +38,127 @@ class YieldForecast(models.Model):
             models.Index(fields=['region']),
             models.Index(fields=['season']),
             models.Index(fields=['crop_name']),
+            # Only the few forecasts still waiting to be projected are indexed
+            models.Index(fields=['id'], condition=models.Q(supply_projected=False), name='yield_forecast_unprojected'),
         ]
 
     def __str__(self) -> str:
         return f"YieldForecast({self.crop_name}, {self.region}, {self.season}, {self.hectares} ha)"
+
+    def save(self, *args, **kwargs):
+        self.canonical_region_id = ensure_region_id(self.region)
+        super().save(*args, **kwargs)
+
+
+class FactorKind(models.TextChoices):
+    BASE_YIELD = 'base_yield', _('Base yield (t/ha) by crop')
+    REGION = 'region', _('Regional multiplier')
+    SEASON = 'season', _('Season factor')
+
+
+class YieldFactorSet(models.Model):
+    """
+    One version of the mock forecast factors. Forecasts use the active set
+    with the highest version, or the ``YIELD_*`` settings while none is
+    active. Publish a new version rather than editing an active one, so
+    older versions stay available for rollback (``publish_yield_factors``).
+    """
+    version = models.PositiveIntegerField(_('version'), unique=True)
+    note = models.CharField(_('note'), max_length=200, blank=True)
+    is_active = models.BooleanField(_('active'), default=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    activated_at = models.DateTimeField(null=True, blank=True)
+    # Touched when one of its factors changes (yields.signals)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-version']
+
+    def __str__(self) -> str:
+        return f"Yield factors v{self.version}{' (active)' if self.is_active else ''}"
+
+
+class YieldFactor(models.Model):
+    factor_set = models.ForeignKey(YieldFactorSet, on_delete=models.CASCADE, related_name='factors')
+    kind = models.CharField(_('kind'), max_length=20, choices=FactorKind.choices)
+    # Crop name in lower case, region key (regions.models.region_key) or season value
+    key = models.CharField(_('key'), max_length=100)
+    value = models.DecimalField(_('value'), max_digits=10, decimal_places=4)
+
+    class Meta:
+        ordering = ['kind', 'key']
+        constraints = [
+            models.UniqueConstraint(fields=['factor_set', 'kind', 'key'], name='unique_yield_factor_key'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.get_kind_display()} {self.key} = {self.value}"
+
+    @staticmethod
+    def normalize_key(kind: str, key: str) -> str:
+        if kind == FactorKind.REGION:
+            return region_key(key)
+        return key.strip().lower()
+
+    def save(self, *args, **kwargs):
+        self.key = self.normalize_key(self.kind, self.key)
+        super().save(*args, **kwargs)
+
+
+class YieldActual(models.Model):
+    """
+    A recorded harvest. ``train_yield_model`` fits the regression method to
+    these on top of the configured factors.
+    """
+    crop = models.ForeignKey(Crop, on_delete=models.SET_NULL, null=True, blank=True, related_name='yield_actuals')
+    crop_name = models.CharField(max_length=100)
+    region = models.CharField(max_length=100)
+    canonical_region = models.ForeignKey(
+        'regions.Region', on_delete=models.SET_NULL, null=True, blank=True, related_name='yield_actuals'
+    )
+    season = models.CharField(max_length=10, choices=Season.choices)
+    hectares = models.DecimalField(max_digits=10, decimal_places=2)
+    actual_yield = models.DecimalField(_('actual yield (t)'), max_digits=14, decimal_places=2)
+    harvested_on = models.DateField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self) -> str:
+        return f"YieldActual({self.crop_name}, {self.region}, {self.season}, {self.actual_yield} t)"
+
+    def save(self, *args, **kwargs):
+        self.canonical_region_id = ensure_region_id(self.region)
+        super().save(*args, **kwargs)
+
+
+class SupplyProjection(models.Model):
+    """
+    Expected harvest per region, crop and week: the stored forecasts summed
+    by the week they mature in (forecast date + ``Crop.maturity_days``).
+    Maintained incrementally by :func:`yields.supply.refresh_supply_projection`.
+    """
+    region = models.CharField(_('region key'), max_length=100)
+    crop = models.ForeignKey(Crop, on_delete=models.CASCADE, related_name='supply_projections')
+    harvest_week = models.DateField(_('harvest week (Monday)'))
+    expected_yield = models.DecimalField(_('expected yield (t)'), max_digits=18, decimal_places=2, default=0)
+    hectares = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    forecasts = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['harvest_week', 'region', 'crop']
+        constraints = [
+            models.UniqueConstraint(fields=['region', 'crop', 'harvest_week'], name='unique_supply_projection_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['region', 'harvest_week']),
+            models.Index(fields=['harvest_week']),
+        ]
+
+    def __str__(self) -> str:
+        return f"SupplyProjection({self.region}, {self.crop_id}, {self.harvest_week}: {self.expected_yield} t)"
@@ -0,0 +1,372 @@
+"""
+Persistence of yield forecasts, on the request path or write-behind.
+
+``YIELD_FORECAST_PERSISTENCE`` picks the durability level:
+
+- ``sync`` (default): rows are inserted before the response.
+- ``spool``: rows are appended to a per-process spool file before the
+  response and bulk-inserted by a background flusher. A worker that dies
+  leaves its spool behind and the next flusher replays it. Delivery is at
+  least once: a crash between insert and cleanup can duplicate a batch.
+- ``memory``: rows wait in an in-process buffer. A crash loses what has not
+  been flushed, at most ``YIELD_FORECAST_FLUSH_INTERVAL`` seconds' worth.
+
+The flusher drains the buffer with one ``bulk_create`` once
+``YIELD_FORECAST_BUFFER_SIZE`` rows are waiting or every flush interval,
+and once more at interpreter exit. Write-behind rows get ``created_at`` at
+flush time and forecasts answered before the flush have no ``id``.
+
+Each distinct forecast is stored once. :func:`persist_forecasts` looks the
+input hashes up in the cache, then in the unique ``input_hash`` column, and
+only writes the forecasts seen for the first time. A concurrent insert of
+the same forecast loses the race quietly and reads the winner's row.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, close_old_connections, transaction
+
+from crops.models import Crop
+from regions.models import region_key
+from regions.resolver import ensure_region_ids
+from .models import YieldForecast
+from .supply import refresh_supply_projection
+
+logger = logging.getLogger(__name__)
+
+SYNC = 'sync'
+SPOOL = 'spool'
+MEMORY = 'memory'
+PERSISTENCE_MODES = (SYNC, SPOOL, MEMORY)
+
+SPOOL_SUFFIX = '.ndjson'
+DRAINING_SUFFIX = '.draining'
+
+ROW_FIELDS = (
+    'crop_id', 'crop_name', 'region', 'season', 'hectares', 'forecast_yield', 'factors', 'method', 'input_hash',
+)
+
+
+def insert_forecasts(forecasts: List[YieldForecast], ignore_conflicts: bool = False) -> List[YieldForecast]:
+    """
+    Insert ``forecasts`` with one ``bulk_create``, linking canonical regions
+    the way ``YieldForecast.save()`` does. Crops deleted in the meantime are
+    unlinked rather than failing the batch. With ``ignore_conflicts``, rows
+    whose ``input_hash`` is already stored are skipped and ids are not set.
+    """
+    if not forecasts:
+        return []
+    region_ids = ensure_region_ids(f.region for f in forecasts)
+    crop_ids = {f.crop_id for f in forecasts if f.crop_id is not None}
+    existing = set(Crop.objects.filter(id__in=crop_ids).values_list('id', flat=True)) if crop_ids else set()
+    for f in forecasts:
+        f.canonical_region_id = region_ids.get(region_key(f.region))
+        if f.crop_id not in existing:
+            f.crop_id = None
+    return YieldForecast.objects.bulk_create(forecasts, batch_size=1000, ignore_conflicts=ignore_conflicts)
+
+
+def _to_row(forecast: YieldForecast) -> dict:
+    row = {name: getattr(forecast, name, None) for name in ROW_FIELDS}
+    row['hectares'] = str(row['hectares'])
+    row['forecast_yield'] = str(row['forecast_yield'])
+    return row
+
+
+def _from_row(row: dict) -> YieldForecast:
+    return YieldForecast(**{
+        **row,
+        'hectares': Decimal(row['hectares']),
+        'forecast_yield': Decimal(row['forecast_yield']),
+    })
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ForecastWriter:
+    """
+    Write-behind buffer of forecast rows. With ``background`` a flusher
+    thread starts on the first write; without it, call :meth:`flush`.
+    """
+
+    def __init__(self, mode: str = MEMORY, max_size: int = 500, interval: float = 2.0,
+                 spool_dir: Optional[Path] = None, background: bool = True):
+        if mode not in (SPOOL, MEMORY):
+            raise ValueError(f"Unsupported write-behind mode: {mode}")
+        if mode == SPOOL and not spool_dir:
+            raise ValueError("Spool mode needs a spool directory")
+        self.mode = mode
+        self.max_size = max_size
+        self.interval = interval
+        self.spool_dir = Path(spool_dir) if spool_dir else None
+        self.pid = os.getpid()
+        self.background = background
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._pending: List[dict] = []
+        self._spool_file = None
+        self._drain_seq = 0
+        self._thread: Optional[threading.Thread] = None
+
+        self.depth = 0
+        self.enqueued = 0
+        self.flushed = 0
+        self.failed_flushes = 0
+        self.last_flush_at: Optional[float] = None
+
+        if self.spool_dir:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def spool_path(self) -> Path:
+        return self.spool_dir / f"forecasts-{self.pid}{SPOOL_SUFFIX}"
+
+    def add(self, forecasts: List[YieldForecast]) -> None:
+        rows = [_to_row(f) for f in forecasts]
+        with self._lock:
+            if self.mode == SPOOL:
+                if self._spool_file is None:
+                    self._spool_file = open(self.spool_path, 'a')
+                self._spool_file.write(''.join(json.dumps(row) + '\n' for row in rows))
+                # Handed to the OS before the response: survives a worker crash
+                self._spool_file.flush()
+            else:
+                self._pending.extend(rows)
+            self.depth += len(rows)
+            self.enqueued += len(rows)
+            full = self.depth >= self.max_size
+        self._ensure_started()
+        if full:
+            self._wake.set()
+
+    def _take_pending(self) -> List[tuple]:
+        """
+        Move what is waiting out of the way of new writes. Returns
+        ``(spool path or None, rows or None)`` batches; spooled rows are read
+        from their file when drained.
+        """
+        with self._lock:
+            if self.mode == MEMORY:
+                rows, self._pending = self._pending, []
+                return [(None, rows)] if rows else []
+            if self._spool_file is not None:
+                self._spool_file.close()
+                self._spool_file = None
+                self._drain_seq += 1
+                draining = self.spool_dir / f"forecasts-{self.pid}-{self._drain_seq}{DRAINING_SUFFIX}"
+                os.replace(self.spool_path, draining)
+
+        # This process's batches (including earlier failures) plus spools left
+        # by dead workers, claimed by renaming so only one flusher replays them
+        batches = []
+        for path in sorted(self.spool_dir.iterdir()):
+            owner = path.name.split('-')[1].split('.')[0] if path.name.startswith('forecasts-') else ''
+            if not owner.isdigit():
+                continue
+            if int(owner) == self.pid:
+                if path.name.endswith(DRAINING_SUFFIX):
+                    batches.append((path, None))
+            elif not _pid_alive(int(owner)):
+                claimed = self.spool_dir / f"forecasts-{self.pid}-c{time.time_ns()}{DRAINING_SUFFIX}"
+                try:
+                    os.replace(path, claimed)
+                except FileNotFoundError:
+                    continue
+                batches.append((claimed, None))
+        return batches
+
+    def flush(self) -> int:
+        """Insert everything waiting. Returns the number of rows written."""
+        written = 0
+        with self._flush_lock:
+            for path, rows in self._take_pending():
+                if rows is None:
+                    with open(path) as fh:
+                        rows = [json.loads(line) for line in fh if line.strip()]
+                try:
+                    # A forecast buffered twice before its first flush is stored once
+                    insert_forecasts([_from_row(row) for row in rows], ignore_conflicts=True)
+                except Exception as e:
+                    self.failed_flushes += 1
+                    logger.error(f"Error flushing {len(rows)} buffered yield forecasts: {e}")
+                    if path is None:
+                        # Back in front of newer rows; retried on the next flush
+                        with self._lock:
+                            self._pending[:0] = rows
+                    continue
+                if path is not None:
+                    path.unlink(missing_ok=True)
+                written += len(rows)
+            with self._lock:
+                self.depth = max(0, self.depth - written)
+                self.flushed += written
+                self.last_flush_at = time.time()
+        return written
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None or not self.background:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='yield-forecast-flusher', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                if self.flush():
+                    refresh_supply_projection()
+            except Exception as e:
+                logger.error(f"Yield forecast flusher error: {e}")
+            finally:
+                close_old_connections()
+
+    def close(self) -> None:
+        """Stop the flusher and flush what is left."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 5)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'depth': self.depth,
+                'max_size': self.max_size,
+                'flush_interval': self.interval,
+                'enqueued': self.enqueued,
+                'flushed': self.flushed,
+                'failed_flushes': self.failed_flushes,
+                'last_flush_at': self.last_flush_at,
+            }
+
+
+_writer: Optional[ForecastWriter] = None
+_writer_config = None
+_writer_lock = threading.Lock()
+
+
+def persistence_mode() -> str:
+    mode = getattr(settings, 'YIELD_FORECAST_PERSISTENCE', SYNC)
+    if mode not in PERSISTENCE_MODES:
+        raise ValueError(f"YIELD_FORECAST_PERSISTENCE must be one of: {', '.join(PERSISTENCE_MODES)}")
+    return mode
+
+
+def get_forecast_writer() -> Optional[ForecastWriter]:
+    """This process's write-behind writer, or None in ``sync`` mode."""
+    global _writer, _writer_config
+    mode = persistence_mode()
+    if mode == SYNC:
+        return None
+    config = (
+        os.getpid(),
+        mode,
+        getattr(settings, 'YIELD_FORECAST_BUFFER_SIZE', 500),
+        getattr(settings, 'YIELD_FORECAST_FLUSH_INTERVAL', 2.0),
+        getattr(settings, 'YIELD_FORECAST_SPOOL_DIR', None),
+    )
+    if _writer_config != config:
+        with _writer_lock:
+            if _writer_config != config:
+                # A forked worker does not inherit the parent's flusher thread
+                if _writer is not None and _writer.pid == os.getpid():
+                    _writer.close()
+                _writer = ForecastWriter(mode, config[2], config[3], config[4])
+                _writer_config = config
+    return _writer
+
+
+def forecast_cache_key(input_hash: str) -> str:
+    return f"yield_forecast_{input_hash}"
+
+
+def _stored_forecasts(hashes) -> Dict[str, dict]:
+    rows = YieldForecast.objects.filter(input_hash__in=hashes).order_by().values_list('input_hash', 'id', 'created_at')
+    return {h: {'id': pk, 'created_at': created_at.isoformat()} for h, pk, created_at in rows}
+
+
+def persist_forecasts(forecasts: List[YieldForecast], persist: bool = True) -> Dict[str, dict]:
+    """
+    Save the forecasts not stored yet, once per ``input_hash``. Returns
+    ``input_hash -> {id, created_at}`` for every forecast that is stored or
+    queued; queued ones have ``id`` None until the write-behind flush.
+
+    With ``persist=False`` nothing is written or queried: only forecasts
+    already known to the cache are returned.
+    """
+    hashes = list(dict.fromkeys(f.input_hash for f in forecasts))
+    cached = cache.get_many([forecast_cache_key(h) for h in hashes])
+    known = {h: cached[forecast_cache_key(h)] for h in hashes if forecast_cache_key(h) in cached}
+    if not persist:
+        return known
+
+    missing = [h for h in hashes if h not in known]
+    found = _stored_forecasts(missing) if missing else {}
+    new = {}
+    for f in forecasts:
+        if f.input_hash in known or f.input_hash in found or f.input_hash in new:
+            continue
+        new[f.input_hash] = f
+
+    queued = {}
+    if new:
+        writer = get_forecast_writer()
+        if writer is None:
+            try:
+                with transaction.atomic():
+                    saved = insert_forecasts(list(new.values()))
+                found.update({
+                    f.input_hash: {'id': f.id, 'created_at': f.created_at.isoformat()} for f in saved if f.id
+                })
+            except IntegrityError:
+                # Someone else stored some of them first
+                insert_forecasts(list(new.values()), ignore_conflicts=True)
+            unresolved = [h for h in new if h not in found]
+            if unresolved:
+                found.update(_stored_forecasts(unresolved))
+        else:
+            writer.add(list(new.values()))
+            queued = {h: {'id': None, 'created_at': None} for h in new}
+            # Only until the flush has stored them; then the row's id is cached
+            cache.set_many({forecast_cache_key(h): entry for h, entry in queued.items()}, int(writer.interval * 2) + 1)
+
+    if found:
+        cache.set_many(
+            {forecast_cache_key(h): entry for h, entry in found.items()},
+            getattr(settings, 'YIELD_FORECAST_CACHE_TIMEOUT', 86400),
+        )
+    return {**known, **found, **queued}
+
+
+def persistence_stats() -> dict:
+    """Buffer depth and flush counters for the status endpoint."""
+    writer = get_forecast_writer()
+    if writer is None:
+        return {'mode': SYNC, 'depth': 0}
+    return writer.stats()
@@ -0,0 +1,193 @@
+"""
+The ``regression_v1`` forecast method: a log-linear model fitted offline.
+
+``log(yield per ha) = intercept + crop effect + region effect + season effect``
+
+The mock factors multiply the same three effects, so they are exactly
+representable. ``train_yield_model`` fits the model by weighted least
+squares to one pseudo-observation per (crop, region, season) of the current
+factor table plus every stored :class:`~yields.models.YieldActual`, with a
+small ridge penalty so crops or regions without actuals stay at their
+factor-table values.
+
+A trained model is a versioned ``regression-v<N>.npz`` artifact in
+``YIELD_MODEL_DIR``: a few coefficient vectors and their labels. Workers
+load the newest one once and predict a whole batch of plots with array
+lookups and one ``exp``.
+"""
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from regions.models import region_key
+from .factors import FactorTable
+from .models import YieldActual
+
+ARTIFACT_FORMAT = 1
+ARTIFACT_PATTERN = re.compile(r'^regression-v(\d+)\.npz$')
+
+
+def get_model_dir() -> Path:
+    return Path(getattr(settings, 'YIELD_MODEL_DIR', Path(settings.BASE_DIR) / 'var' / 'yield_models'))
+
+
+class RegressionModel:
+    """Coefficients of one trained version, with label -> position lookups."""
+    __slots__ = ('version', 'meta', 'intercept', 'crops', 'regions', 'seasons',
+                 'crop_coef', 'region_coef', 'season_coef', 'crop_index', 'region_index', 'season_index')
+
+    def __init__(self, version: int, intercept: float, crops: Sequence[str], regions: Sequence[str],
+                 seasons: Sequence[str], crop_coef: np.ndarray, region_coef: np.ndarray,
+                 season_coef: np.ndarray, meta: Optional[dict] = None):
+        self.version = version
+        self.meta = meta or {}
+        self.intercept = float(intercept)
+        self.crops, self.regions, self.seasons = list(crops), list(regions), list(seasons)
+        self.crop_coef = np.asarray(crop_coef, dtype=np.float64)
+        self.region_coef = np.asarray(region_coef, dtype=np.float64)
+        self.season_coef = np.asarray(season_coef, dtype=np.float64)
+        self.crop_index = {k: i for i, k in enumerate(self.crops)}
+        self.region_index = {k: i for i, k in enumerate(self.regions)}
+        self.season_index = {k: i for i, k in enumerate(self.seasons)}
+
+    def predict_rates(self, crop_idx: np.ndarray, region_idx: np.ndarray, season_idx: np.ndarray) -> np.ndarray:
+        """Yield per hectare for arrays of label positions."""
+        return np.exp(
+            self.intercept + self.crop_coef[crop_idx] + self.region_coef[region_idx] + self.season_coef[season_idx]
+        )
+
+
+def training_data(table: FactorTable) -> Tuple[list, list, list, np.ndarray, np.ndarray]:
+    """
+    ``(crop keys, region keys, seasons, log yield per ha, is_actual)`` rows:
+    the factor table's combinations, then the stored actuals.
+    """
+    crops, regions, seasons, targets = [], [], [], []
+    for crop, base in table.base_yield_floats.items():
+        for region, multiplier in table.region_multiplier_floats.items():
+            for season, factor in table.season_factor_floats.items():
+                crops.append(crop)
+                regions.append(region)
+                seasons.append(season)
+                targets.append(np.log(base * multiplier * factor))
+    prior = len(targets)
+
+    actuals = (
+        YieldActual.objects.filter(hectares__gt=0, actual_yield__gt=0)
+        .values_list('crop_name', 'region', 'canonical_region__slug', 'season', 'hectares', 'actual_yield')
+    )
+    for crop_name, region, slug, season, hectares, actual in actuals:
+        crops.append(crop_name.strip().lower())
+        regions.append(slug or region_key(region))
+        seasons.append(season)
+        targets.append(np.log(float(actual) / float(hectares)))
+    is_actual = np.arange(len(targets)) >= prior
+    return crops, regions, seasons, np.asarray(targets, dtype=np.float64), is_actual
+
+
+def _positions(values: Sequence[str]) -> Tuple[list, np.ndarray]:
+    labels = sorted(set(values))
+    index = {k: i for i, k in enumerate(labels)}
+    return labels, np.fromiter((index[v] for v in values), dtype=np.int64, count=len(values))
+
+
+def fit(crops: Sequence[str], regions: Sequence[str], seasons: Sequence[str], targets: np.ndarray,
+        weights: np.ndarray, ridge: float = 1e-3, version: int = 0) -> RegressionModel:
+    """Weighted ridge least squares over one-hot crop, region and season columns."""
+    crop_labels, ci = _positions(crops)
+    region_labels, ri = _positions(regions)
+    season_labels, si = _positions(seasons)
+    n, nc, nr, ns = len(targets), len(crop_labels), len(region_labels), len(season_labels)
+
+    X = np.zeros((n, 1 + nc + nr + ns))
+    rows = np.arange(n)
+    X[:, 0] = 1.0
+    X[rows, 1 + ci] = 1.0
+    X[rows, 1 + nc + ri] = 1.0
+    X[rows, 1 + nc + nr + si] = 1.0
+
+    # Weighted rows, then a ridge penalty on every effect but the intercept
+    sw = np.sqrt(weights)
+    penalty = np.sqrt(ridge) * np.eye(X.shape[1])[1:]
+    A = np.vstack([X * sw[:, None], penalty])
+    b = np.concatenate([targets * sw, np.zeros(X.shape[1] - 1)])
+    coef = np.linalg.lstsq(A, b, rcond=None)[0]
+
+    residuals = X @ coef - targets
+    return RegressionModel(
+        version, coef[0], crop_labels, region_labels, season_labels,
+        coef[1:1 + nc], coef[1 + nc:1 + nc + nr], coef[1 + nc + nr:],
+        meta={'rows': int(n), 'rmse_log': float(np.sqrt(np.average(residuals ** 2, weights=weights)))},
+    )
+
+
+def train(table: FactorTable, actual_weight: float = 5.0, ridge: float = 1e-3) -> RegressionModel:
+    """Fit a model to ``table`` and the stored actuals, each actual counting ``actual_weight`` times."""
+    crops, regions, seasons, targets, is_actual = training_data(table)
+    weights = np.where(is_actual, actual_weight, 1.0)
+    model = fit(crops, regions, seasons, targets, weights, ridge=ridge)
+    model.meta.update({
+        'actuals': int(is_actual.sum()),
+        'factors_version': table.version,
+        'actual_weight': actual_weight,
+        'ridge': ridge,
+    })
+    return model
+
+
+def artifact_versions(directory: Path) -> list:
+    if not directory.is_dir():
+        return []
+    return sorted(int(m.group(1)) for m in (ARTIFACT_PATTERN.match(p.name) for p in directory.iterdir()) if m)
+
+
+def save_artifact(model: RegressionModel, directory: Optional[Path] = None) -> Path:
+    """Write ``model`` as the next version in ``directory`` and return its path."""
+    directory = Path(directory or get_model_dir())
+    directory.mkdir(parents=True, exist_ok=True)
+    model.version = (artifact_versions(directory) or [0])[-1] + 1
+    model.meta.update({'format': ARTIFACT_FORMAT, 'version': model.version, 'trained_at': time.time()})
+
+    path = directory / f"regression-v{model.version}.npz"
+    # Written under a temporary name and renamed, so workers never load half a file
+    tmp = directory / f".regression-v{model.version}.{os.getpid()}.npz"
+    np.savez(
+        tmp,
+        intercept=np.array(model.intercept),
+        crops=np.array(model.crops, dtype=str),
+        regions=np.array(model.regions, dtype=str),
+        seasons=np.array(model.seasons, dtype=str),
+        crop_coef=model.crop_coef,
+        region_coef=model.region_coef,
+        season_coef=model.season_coef,
+        meta=np.array(json.dumps(model.meta)),
+    )
+    os.replace(tmp, path)
+    return path
+
+
+def load_artifact(directory: Optional[Path] = None, version: Optional[int] = None) -> Optional[RegressionModel]:
+    """The given version (the newest by default) from ``directory``, or None if there is none."""
+    directory = Path(directory or get_model_dir())
+    if version is None:
+        versions = artifact_versions(directory)
+        if not versions:
+            return None
+        version = versions[-1]
+    path = directory / f"regression-v{version}.npz"
+    if not path.exists():
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        if meta.get('format') != ARTIFACT_FORMAT:
+            raise ValueError(f"Unsupported yield model artifact format in {path}")
+        return RegressionModel(
+            version, float(data['intercept']), data['crops'].tolist(), data['regions'].tolist(),
+            data['seasons'].tolist(), data['crop_coef'], data['region_coef'], data['season_coef'], meta=meta,
+        )
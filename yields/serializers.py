@@ -1,8 +1,21 @@
+from datetime import timedelta
 from decimal import Decimal, InvalidOperation
+from django.utils import timezone
 from rest_framework import serializers
-from django.conf import settings
 
 from crops.models import Crop, Season
+from .engines import get_engine
+from .factors import current_factors, region_factor_key, region_factor_keys
+from .forecast import resolve_crops
+from .models import YieldMethod
+from .supply import week_start
+
+
+def validate_method(value: str) -> str:
+    engine = get_engine(value)
+    if not engine.available():
+        raise serializers.ValidationError(engine.unavailable_reason)
+    return value
 
 
 class YieldForecastQuerySerializer(serializers.Serializer):
@@ -10,6 +23,10 @@ class YieldForecastQuerySerializer(serializers.Serializer):
     region = serializers.CharField()
     season = serializers.ChoiceField(choices=Season.choices)
     hectares = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal("0.01"))
+    persist = serializers.BooleanField(required=False, default=True,
+                                       help_text="false to compute without saving the forecast")
+    method = serializers.ChoiceField(choices=YieldMethod.choices, default=YieldMethod.MOCK_V1,
+                                     validators=[validate_method])
 
     def validate_crop(self, value: str):
         # Try id first
@@ -25,19 +42,16 @@ class YieldForecastQuerySerializer(serializers.Serializer):
     def validate_region(self, value: str):
         if not value.strip():
             raise serializers.ValidationError("Region cannot be empty")
-        key = value.lower()
-        if key not in getattr(settings, 'YIELD_REGION_MULTIPLIERS', {}):
-            raise serializers.ValidationError("Region not supported for mock forecast")
         return value
 
     def validate(self, attrs):
-        # Ensure base yield exists for crop name
+        # Ensure the method can forecast this crop, region and season
         crop: Crop = attrs['crop']
-        base_map = getattr(settings, 'YIELD_BASE_YIELDS', {})
-        if crop.name.lower() not in base_map:
-            raise serializers.ValidationError({
-                'crop': 'Crop not supported for mock forecast'
-            })
+        errors = get_engine(attrs['method']).unsupported(
+            crop.name.lower(), region_factor_key(attrs['region']), attrs['season'],
+        )
+        if errors:
+            raise serializers.ValidationError(errors)
         return attrs
 
 
@@ -48,3 +62,115 @@ class YieldForecastResponseSerializer(serializers.Serializer):
     hectares = serializers.DecimalField(max_digits=10, decimal_places=2)
     forecast_yield = serializers.DecimalField(max_digits=14, decimal_places=2)
     factors = serializers.JSONField()
+
+
+class YieldForecastPlotSerializer(serializers.Serializer):
+    crop = serializers.CharField(help_text="Crop id or name")
+    region = serializers.CharField()
+    season = serializers.ChoiceField(choices=Season.choices)
+    hectares = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal("0.01"))
+
+
+class YieldForecastBatchSerializer(serializers.Serializer):
+    plots = serializers.ListField(child=YieldForecastPlotSerializer(), allow_empty=False)
+    persist = serializers.BooleanField(required=False, default=True,
+                                       help_text="false to compute without saving the forecasts")
+    method = serializers.ChoiceField(choices=YieldMethod.choices, default=YieldMethod.MOCK_V1,
+                                     validators=[validate_method])
+
+
+def _name_list(value: str) -> list:
+    return list(dict.fromkeys(v.strip() for v in value.split(',') if v.strip()))
+
+
+class YieldSweepQuerySerializer(serializers.Serializer):
+    """
+    Axes of a scenario sweep. ``crop``, ``region`` and ``season`` take
+    comma-separated lists; missing ``region``/``season`` mean all supported.
+    The validated ``crop`` is a list of crops, ``region`` a list of
+    ``(name, factor key)`` pairs and ``season`` a list of seasons.
+
+    Validation reads the factor table in ``context['factors']``, or the
+    current one; pass the table the sweep will be computed with.
+    """
+    crop = serializers.CharField(help_text="Comma-separated crop ids or names")
+    region = serializers.CharField(required=False, help_text="Comma-separated regions (default: all supported)")
+    season = serializers.CharField(required=False, help_text="Comma-separated seasons (default: all supported)")
+    hectares_min = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal("0.01"))
+    hectares_max = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal("0.01"),
+                                            required=False)
+    hectares_step = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal("0.01"),
+                                             default=Decimal("1.00"))
+
+    @property
+    def factors(self):
+        if 'factors' not in self.context:
+            self.context['factors'] = current_factors()
+        return self.context['factors']
+
+    def validate_crop(self, value: str):
+        names = _name_list(value)
+        found = resolve_crops(names)
+        missing = [name for name in names if name not in found]
+        if missing:
+            raise serializers.ValidationError(f"Crops not found by id or name: {', '.join(missing)}")
+        base_yields = self.factors.base_yields
+        unsupported = [found[name].name for name in names if found[name].name.lower() not in base_yields]
+        if unsupported:
+            raise serializers.ValidationError(f"Crops not supported for mock forecast: {', '.join(unsupported)}")
+        return list({found[name].id: found[name] for name in names}.values())
+
+    def validate_region(self, value: str):
+        names = _name_list(value)
+        keys = region_factor_keys(names)
+        multipliers = self.factors.region_multipliers
+        unsupported = [name for name in names if keys[name] not in multipliers]
+        if unsupported:
+            raise serializers.ValidationError(f"Regions not supported for mock forecast: {', '.join(unsupported)}")
+        return list({keys[name]: (name, keys[name]) for name in names}.values())
+
+    def validate_season(self, value: str):
+        seasons = _name_list(value)
+        unknown = [s for s in seasons if s not in Season.values or s not in self.factors.season_factors]
+        if unknown:
+            raise serializers.ValidationError(f"Yield data not available for seasons: {', '.join(unknown)}")
+        return seasons
+
+    def validate(self, attrs):
+        attrs.setdefault('hectares_max', attrs['hectares_min'])
+        if attrs['hectares_max'] < attrs['hectares_min']:
+            raise serializers.ValidationError({'hectares_max': 'Must not be less than hectares_min'})
+        return attrs
+
+
+class YieldSupplyQuerySerializer(serializers.Serializer):
+    """
+    Filters of the regional supply projection. ``region`` and ``crop`` take
+    comma-separated lists (default: all); the validated ``region`` is a list
+    of region keys and ``crop`` a list of crop ids. Weeks default to the
+    current one and the 26 after it.
+    """
+    region = serializers.CharField(required=False, help_text="Comma-separated regions (default: all)")
+    crop = serializers.CharField(required=False, help_text="Comma-separated crop ids or names (default: all)")
+    week_from = serializers.DateField(required=False, help_text="First harvest date (default: this week)")
+    week_to = serializers.DateField(required=False, help_text="Last harvest date (default: 26 weeks on)")
+
+    def validate_region(self, value: str):
+        return sorted(set(region_factor_keys(_name_list(value)).values()))
+
+    def validate_crop(self, value: str):
+        names = _name_list(value)
+        found = resolve_crops(names)
+        missing = [name for name in names if name not in found]
+        if missing:
+            raise serializers.ValidationError(f"Crops not found by id or name: {', '.join(missing)}")
+        return sorted({found[name].id for name in names})
+
+    def validate(self, attrs):
+        this_week = week_start(timezone.localdate())
+        # Buckets are keyed by their Monday, so the range is widened to whole weeks
+        attrs['week_from'] = week_start(attrs.get('week_from', this_week))
+        attrs['week_to'] = week_start(attrs.get('week_to', this_week + timedelta(weeks=26)))
+        if attrs['week_to'] < attrs['week_from']:
+            raise serializers.ValidationError({'week_to': 'Must not be before week_from'})
+        return attrs
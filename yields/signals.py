@@ -0,0 +1,30 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.cache_versions import bump_on_commit
+from .factors import FACTORS_SCOPE
+from .models import YieldFactor, YieldFactorSet, YieldForecast
+from .persistence import forecast_cache_key
+
+
+@receiver(post_delete, sender=YieldForecast)
+def forget_deleted_forecast(sender, instance, **kwargs):
+    if instance.input_hash:
+        cache.delete(forecast_cache_key(instance.input_hash))
+
+
+@receiver(post_save, sender=YieldFactorSet)
+@receiver(post_delete, sender=YieldFactorSet)
+@receiver(post_save, sender=YieldFactor)
+@receiver(post_delete, sender=YieldFactor)
+def reload_factors_on_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if sender is YieldFactor:
+        # Lets workers that do not share the cache notice the edit on their
+        # next periodic version check (yields.factors.current_factors)
+        YieldFactorSet.objects.filter(pk=instance.factor_set_id).update(updated_at=timezone.now())
+    # Workers sharing this cache reload their factor table on their next forecast
+    bump_on_commit([FACTORS_SCOPE])
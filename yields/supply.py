@@ -0,0 +1,162 @@
+"""
+Regional supply projection: expected harvest per (region, crop, week).
+
+A forecast made on day ``d`` for a crop that matures in ``maturity_days``
+is expected to be harvested on ``d + maturity_days``. Its ``forecast_yield``
+is added to the :class:`~yields.models.SupplyProjection` row of that week
+(weeks start on Monday) in the forecast's region.
+
+Forecasts are stored once per input hash (see :mod:`yields.persistence`),
+so the projection counts distinct plots, not requests. Repeating a query
+returns the stored forecast and leaves the projection unchanged. Two
+farmers with identical plots (same crop, region, season and hectares)
+count once, in the week of the first forecast.
+
+The projection is a materialized table kept up to date incrementally. New
+forecasts have ``supply_projected=False``, and a partial index covers just
+those rows. :func:`refresh_supply_projection` takes a batch of them and
+groups it in the database by region, crop and forecast day. It adds the
+sums to the affected buckets and marks the forecasts projected, all in one
+transaction. Range queries then read a table whose size depends on the
+number of regions, crops and weeks, not on the number of forecasts.
+
+Refreshes may run in several processes at once. Each batch locks its
+pending rows with ``SELECT ... FOR UPDATE SKIP LOCKED``, so concurrent
+batches are disjoint. It counts only rows its own update marked; anything
+else rolls the batch back and retries it.
+
+The projection is refreshed by the write-behind flusher after each flush,
+by ``/api/yield/supply/`` before it answers (a bounded amount), and by
+``manage.py refresh_supply_projection``. Deleting forecasts or changing a
+crop's maturity does not update existing buckets; ``--rebuild`` recomputes
+everything.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from regions.models import region_key
+from .models import SupplyProjection, YieldForecast
+
+MAX_CONFLICT_RETRIES = 3
+
+
+def week_start(day: date) -> date:
+    """Monday of the week ``day`` falls in."""
+    return day - timedelta(days=day.weekday())
+
+
+class _ClaimConflict(Exception):
+    """Another refresh projected some of the batch first; the batch is rolled back and retried."""
+
+
+def _project_batch(batch_size: int) -> Tuple[int, bool]:
+    """Project up to ``batch_size`` pending forecasts. Returns (projected, more pending)."""
+    with transaction.atomic():
+        # Rows another refresh has locked are skipped, so concurrent
+        # refreshes work on disjoint batches
+        ids = list(
+            YieldForecast.objects.filter(supply_projected=False)
+            .select_for_update(skip_locked=True)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0, False
+        # Only rows this update changes are counted. Without row locks
+        # (SQLite) a concurrent refresh can have taken some; then start over.
+        if YieldForecast.objects.filter(id__in=ids, supply_projected=False).update(supply_projected=True) != len(ids):
+            raise _ClaimConflict
+
+        # Forecasts without a crop cannot mature; they are only marked
+        groups = (
+            YieldForecast.objects.filter(id__in=ids, crop__isnull=False)
+            .annotate(day=TruncDate('created_at'))
+            .values('region', 'canonical_region__slug', 'crop_id', 'crop__maturity_days', 'day')
+            .annotate(total=Sum('forecast_yield'), area=Sum('hectares'), n=Count('id'))
+            .order_by()
+        )
+        deltas: Dict[tuple, list] = {}
+        for g in groups:
+            key = (
+                g['canonical_region__slug'] or region_key(g['region']),
+                g['crop_id'],
+                week_start(g['day'] + timedelta(days=g['crop__maturity_days'])),
+            )
+            delta = deltas.setdefault(key, [Decimal('0'), Decimal('0'), 0])
+            delta[0] += g['total']
+            delta[1] += g['area']
+            delta[2] += g['n']
+        _add_to_buckets(deltas)
+    return len(ids), len(ids) == batch_size
+
+
+def _add_to_buckets(deltas: Dict[tuple, list]) -> None:
+    if not deltas:
+        return
+    existing = {
+        (row.region, row.crop_id, row.harvest_week): row
+        for row in SupplyProjection.objects.select_for_update().filter(
+            region__in={k[0] for k in deltas},
+            crop_id__in={k[1] for k in deltas},
+            harvest_week__in={k[2] for k in deltas},
+        )
+    }
+    now = timezone.now()
+    updated, created = [], []
+    for key, (total, area, n) in deltas.items():
+        row = existing.get(key)
+        if row is None:
+            created.append(SupplyProjection(
+                region=key[0], crop_id=key[1], harvest_week=key[2],
+                expected_yield=total, hectares=area, forecasts=n,
+            ))
+            continue
+        row.expected_yield += total
+        row.hectares += area
+        row.forecasts += n
+        row.updated_at = now
+        updated.append(row)
+    SupplyProjection.objects.bulk_update(
+        updated, ['expected_yield', 'hectares', 'forecasts', 'updated_at'], batch_size=1000
+    )
+    SupplyProjection.objects.bulk_create(created, batch_size=1000)
+
+
+def refresh_supply_projection(max_batches: int = None, batch_size: int = None) -> Tuple[int, bool]:
+    """
+    Add pending forecasts to the projection, ``batch_size`` per transaction,
+    for at most ``max_batches`` batches (all by default). Returns the number
+    projected and whether forecasts may still be pending. Safe to run from
+    several processes at once: each batch claims its rows in the database.
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, 'YIELD_SUPPLY_REFRESH_BATCH', 5000)
+    projected, more, batches, conflicts = 0, True, 0, 0
+    while more and (max_batches is None or batches < max_batches):
+        try:
+            done, more = _project_batch(batch_size)
+        except (IntegrityError, _ClaimConflict):
+            # Two refreshes created the same bucket, or claimed the same rows;
+            # the other one has committed by now
+            conflicts += 1
+            if conflicts > MAX_CONFLICT_RETRIES:
+                raise
+            continue
+        projected += done
+        batches += 1
+    return projected, more
+
+
+def rebuild_supply_projection(batch_size: int = None) -> int:
+    """Recompute the projection from every stored forecast."""
+    with transaction.atomic():
+        SupplyProjection.objects.all().delete()
+        YieldForecast.objects.filter(supply_projected=True).update(supply_projected=False)
+    return refresh_supply_projection(batch_size=batch_size)[0]
@@ -0,0 +1,52 @@
+"""
+Scenario sweeps: the mock forecast over a whole crop x region x season x
+hectares grid (``/api/yield/sweep/``).
+
+The formula is a product of one factor per axis, so the grid is the outer
+product of four vectors, computed by NumPy in one broadcast multiply and
+rounded to two decimals. Float error only matters next to a half cent,
+where it can tip the rounding; those few cells are recomputed with the
+``Decimal`` formula, so every cell equals what ``/api/yield/forecast/``
+returns.
+"""
+from decimal import Decimal
+from typing import List, Sequence
+
+import numpy as np
+
+from .factors import FactorTable
+from .forecast import forecast_yield
+
+# Cells this close to a half cent (relative, with a floor in cents) are
+# recomputed exactly; a generous margin only costs a few extra recomputes
+TIE_TOLERANCE = 1e-9
+
+
+def hectare_steps(start: Decimal, stop: Decimal, step: Decimal) -> List[Decimal]:
+    """``start``, ``start + step``, ... up to and including ``stop``, in exact decimals."""
+    count = int((stop - start) // step) + 1
+    return [start + step * i for i in range(count)]
+
+
+def sweep_grid(table: FactorTable, crop_keys: Sequence[str], region_keys: Sequence[str],
+               seasons: Sequence[str], hectares: Sequence[Decimal]) -> np.ndarray:
+    """
+    Forecast yield of every (crop, region, season, hectares) combination, as
+    an array of shape ``(crops, regions, seasons, hectares)``. Every key must
+    be in ``table``.
+    """
+    base = np.array([table.base_yield_floats[k] for k in crop_keys], dtype=np.float64)
+    regional = np.array([table.region_multiplier_floats[k] for k in region_keys], dtype=np.float64)
+    season = np.array([table.season_factor_floats[k] for k in seasons], dtype=np.float64)
+    area = np.array([float(h) for h in hectares], dtype=np.float64)
+    grid = base[:, None, None, None] * regional[None, :, None, None] * season[None, None, :, None] * area
+
+    cents = grid * 100
+    ties = np.abs(cents - np.floor(cents) - 0.5) < np.maximum(cents * TIE_TOLERANCE, 1e-6)
+    grid = np.round(grid, 2)
+    for c, r, s, h in zip(*np.nonzero(ties)):
+        grid[c, r, s, h] = float(forecast_yield(
+            table.base_yields[crop_keys[c]], table.region_multipliers[region_keys[r]],
+            table.season_factors[seasons[s]], hectares[h],
+        ))
+    return grid
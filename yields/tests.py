@@ -1,14 +1,34 @@
+import json
+import shutil
+import tempfile
+from datetime import date, datetime, time
 from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import QuerySet
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
 
 from crops.models import Crop, Season
-from yields.models import YieldForecast, YieldMethod
+from yields import factors, persistence, regression, supply
+from yields.engines import get_engine
+from yields.models import (
+    FactorKind, SupplyProjection, YieldActual, YieldFactor, YieldFactorSet, YieldForecast, YieldMethod,
+)
 
 
 class YieldForecastTests(APITestCase):
     def setUp(self):
+        cache.clear()
         # Create crops that map to settings base yields
         self.maize = Crop.objects.create(
             name="Maize",
@@ -89,3 +109,567 @@ class YieldForecastTests(APITestCase):
         self.assertEqual(str(yf.forecast_yield), '3.66')
         self.assertEqual(yf.method, YieldMethod.MOCK_V1)
         self.assertIn('base_yield_t_per_ha', yf.factors)
+
+
+class YieldForecastBatchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Kumasi"], recommended_inputs={}, maturity_days=120,
+        )
+        self.rice = Crop.objects.create(
+            name="Rice", season=Season.MAJOR, soil_type="clay",
+            regions=["Tamale"], recommended_inputs={}, maturity_days=110,
+        )
+        self.url = reverse('yield-forecast-batch')
+
+    def test_batch_matches_single_forecasts_and_bulk_saves(self):
+        plots = [
+            {'crop': 'maize', 'region': 'Kumasi', 'season': Season.MAJOR, 'hectares': '2.50'},
+            {'crop': str(self.rice.id), 'region': 'tamale', 'season': Season.MINOR, 'hectares': '1.00'},
+            {'crop': 'Maize', 'region': 'Cape Coast', 'season': Season.ALL, 'hectares': '0.33'},
+        ]
+        factors.current_factors()
+        # Crop lookup, one region query each for factors and linking, stored hashes,
+        # then crop recheck and insert inside a savepoint
+        with self.assertNumQueries(8):
+            res = self.client.post(self.url, {'plots': plots}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        data = res.data['data']
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(data['errors'], [])
+        self.assertEqual(YieldForecast.objects.count(), 3)
+
+        for plot, result in zip(plots, data['results']):
+            single = self.client.get(reverse('yield-forecast'), plot).data['data']
+            self.assertEqual(result['forecast_yield'], single['forecast_yield'])
+            self.assertEqual(result['factors'], single['factors'])
+        self.assertEqual(
+            data['total_forecast_yield'],
+            str(sum(Decimal(r['forecast_yield']) for r in data['results'])),
+        )
+        saved = YieldForecast.objects.get(id=data['results'][1]['id'])
+        self.assertEqual((saved.crop_id, saved.canonical_region.slug), (self.rice.id, 'tamale'))
+
+    def test_unforecastable_plots_are_reported_by_position(self):
+        plots = [
+            {'crop': 'Maize', 'region': 'Kumasi', 'season': Season.MAJOR, 'hectares': '1'},
+            {'crop': 'Unknown', 'region': 'Atlantis', 'season': Season.MAJOR, 'hectares': '1'},
+        ]
+        res = self.client.post(self.url, {'plots': plots}, format='json')
+        data = res.data['data']
+        self.assertEqual([r['index'] for r in data['results']], [0])
+        self.assertEqual(data['errors'][0]['index'], 1)
+        self.assertEqual(set(data['errors'][0]['errors']), {'crop', 'region'})
+
+        res = self.client.post(self.url, {'plots': plots[1:]}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.post(self.url, {'plots': [{'crop': 'Maize', 'hectares': '0'}]}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(YIELD_FORECAST_BATCH_MAX_PLOTS=1):
+            res = self.client.post(self.url, {'plots': plots}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class WriteBehindPersistenceTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Kumasi"], recommended_inputs={}, maturity_days=120,
+        )
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def forecast(self, region="Kumasi"):
+        return YieldForecast(
+            crop=self.maize, crop_name="Maize", region=region, season=Season.MAJOR,
+            hectares=Decimal("1.00"), forecast_yield=Decimal("2.75"), factors={}, method=YieldMethod.MOCK_V1,
+        )
+
+    def test_memory_mode_defers_insert_until_flush(self):
+        settings = {
+            'YIELD_FORECAST_PERSISTENCE': persistence.MEMORY,
+            'YIELD_FORECAST_FLUSH_INTERVAL': 3600,
+        }
+        with self.settings(**settings):
+            self.addCleanup(persistence.get_forecast_writer().close)
+            res = self.client.get(reverse('yield-forecast'), {
+                'crop': 'Maize', 'region': 'Kumasi', 'season': Season.MAJOR, 'hectares': '1.00'
+            })
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertIsNone(res.data['data']['id'])
+            self.assertEqual(YieldForecast.objects.count(), 0)
+            self.assertEqual(persistence.persistence_stats()['depth'], 1)
+
+            self.assertEqual(persistence.get_forecast_writer().flush(), 1)
+            self.assertEqual(persistence.persistence_stats()['depth'], 0)
+        saved = YieldForecast.objects.get()
+        self.assertEqual((saved.crop_id, saved.canonical_region.slug), (self.maize.id, 'kumasi'))
+
+    def test_failed_flush_keeps_rows(self):
+        writer = persistence.ForecastWriter(persistence.MEMORY, background=False)
+        writer.add([self.forecast(), self.forecast()])
+        with mock.patch('yields.persistence.insert_forecasts', side_effect=RuntimeError("db down")):
+            self.assertEqual(writer.flush(), 0)
+        self.assertEqual((writer.stats()['depth'], writer.stats()['failed_flushes']), (2, 1))
+        self.assertEqual(writer.flush(), 2)
+        self.assertEqual(YieldForecast.objects.count(), 2)
+
+    def test_spool_survives_and_replays_dead_workers(self):
+        writer = persistence.ForecastWriter(persistence.SPOOL, spool_dir=self.tmp, background=False)
+        writer.add([self.forecast()])
+        self.assertEqual(len(writer.spool_path.read_text().splitlines()), 1)
+
+        # A spool left behind by a worker that no longer exists
+        orphan = Path(self.tmp) / f"forecasts-999999999{persistence.SPOOL_SUFFIX}"
+        orphan.write_text(json.dumps(persistence._to_row(self.forecast("Tamale"))) + "\n")
+
+        self.assertEqual(writer.flush(), 2)
+        self.assertEqual(sorted(YieldForecast.objects.values_list('region', flat=True)), ["Kumasi", "Tamale"])
+        self.assertEqual(list(Path(self.tmp).iterdir()), [])
+
+
+class ForecastDeduplicationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Kumasi"], recommended_inputs={}, maturity_days=120,
+        )
+        self.url = reverse('yield-forecast')
+        self.query = {'crop': 'Maize', 'region': 'Kumasi', 'season': Season.MAJOR, 'hectares': '2.50'}
+
+    def test_repeat_query_returns_stored_forecast(self):
+        first = self.client.get(self.url, self.query).data['data']
+        self.assertIsNotNone(first['id'])
+
+        again = self.client.get(self.url, {**self.query, 'crop': str(self.maize.id), 'hectares': '2.5'}).data['data']
+        self.assertEqual((again['id'], again['generated_at']), (first['id'], first['generated_at']))
+        # Without the cache the unique column finds it
+        cache.clear()
+        self.assertEqual(self.client.get(self.url, self.query).data['data']['id'], first['id'])
+        self.assertEqual(YieldForecast.objects.count(), 1)
+        self.assertEqual(len(YieldForecast.objects.get().input_hash), 64)
+
+        other = self.client.get(self.url, {**self.query, 'hectares': '3.00'}).data['data']
+        self.assertNotEqual(other['id'], first['id'])
+        with self.settings(YIELD_REGION_MULTIPLIERS={'Kumasi': 2.0}):
+            changed = self.client.get(self.url, self.query).data['data']
+        self.assertNotEqual(changed['id'], first['id'])
+        self.assertEqual(YieldForecast.objects.count(), 3)
+
+    def test_persist_false_computes_without_writing(self):
+        res = self.client.get(self.url, {**self.query, 'persist': 'false'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual((res.data['data']['id'], res.data['data']['forecast_yield']), (None, '6.88'))
+        res = self.client.post(reverse('yield-forecast-batch'), {'plots': [self.query], 'persist': False}, format='json')
+        self.assertIsNone(res.data['data']['results'][0]['id'])
+        self.assertEqual(YieldForecast.objects.count(), 0)
+
+    def test_batch_stores_duplicate_plots_once(self):
+        plots = [self.query, {**self.query, 'crop': 'maize'}, {**self.query, 'season': Season.MINOR}]
+        results = self.client.post(reverse('yield-forecast-batch'), {'plots': plots}, format='json').data['data']['results']
+        self.assertEqual(results[0]['id'], results[1]['id'])
+        self.assertNotEqual(results[0]['id'], results[2]['id'])
+        self.assertEqual(YieldForecast.objects.count(), 2)
+        self.assertEqual(self.client.get(self.url, self.query).data['data']['id'], results[0]['id'])
+
+    def test_concurrent_insert_of_same_forecast_reads_winner(self):
+        self.client.get(self.url, self.query)
+        winner = YieldForecast.objects.get()
+        cache.clear()
+        duplicate = YieldForecast.objects.get()
+        duplicate.pk = None
+        # The other writer's row is not visible yet when this one looks
+        with mock.patch('yields.persistence._stored_forecasts', side_effect=[{}, {
+            winner.input_hash: {'id': winner.id, 'created_at': winner.created_at.isoformat()},
+        }]):
+            stored = persistence.persist_forecasts([duplicate])
+        self.assertEqual(stored[winner.input_hash]['id'], winner.id)
+        self.assertEqual(YieldForecast.objects.count(), 1)
+
+
+class YieldFactorTableTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(factors.reset_factor_table)
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Kumasi"], recommended_inputs={}, maturity_days=120,
+        )
+        self.url = reverse('yield-forecast')
+        self.query = {'crop': 'Maize', 'region': 'Kumasi', 'season': Season.MAJOR, 'hectares': '2.00'}
+
+    def forecast(self):
+        return self.client.get(self.url, self.query).data['data']
+
+    def test_settings_defaults_until_published(self):
+        table = factors.current_factors()
+        self.assertEqual((table.version, table.base_yields['maize']), (0, Decimal('2.5')))
+        self.assertEqual(table.region_multipliers['cape-coast'], Decimal('0.8'))
+        with self.assertRaises(TypeError):
+            table.base_yields['maize'] = Decimal('9')
+        self.assertEqual(self.forecast()['forecast_yield'], '5.50')
+
+    def test_published_version_is_loaded_once_and_used(self):
+        defaults = factors.settings_factor_table().as_dict()
+        defaults[FactorKind.BASE_YIELD]['maize'] = 3.0
+        factor_set = factors.publish_factor_set(defaults, note="survey")
+        self.assertEqual(factor_set.version, 1)
+
+        table = factors.current_factors()
+        self.assertEqual((table.version, table.base_yields['maize']), (1, Decimal('3.0')))
+        with self.assertNumQueries(0):
+            self.assertIs(factors.current_factors(), table)
+        result = self.forecast()
+        self.assertEqual((result['forecast_yield'], result['factors']['base_yield_t_per_ha']), ('6.60', 3.0))
+
+        # Rolling back to the defaults re-imported as v2
+        factors.publish_factor_set(factors.settings_factor_table().as_dict())
+        self.assertEqual(self.forecast()['forecast_yield'], '5.50')
+        factors.activate_factor_set(factor_set)
+        self.assertEqual(self.forecast()['forecast_yield'], '6.60')
+        self.assertEqual(YieldFactorSet.objects.filter(is_active=True).get(), factor_set)
+
+    def test_editing_active_factor_reloads_table(self):
+        factors.publish_factor_set(factors.settings_factor_table().as_dict())
+        self.assertEqual(factors.current_factors().season_factors['major'], Decimal('1'))
+        factor = YieldFactor.objects.get(kind=FactorKind.SEASON, key='major')
+        factor.value = Decimal('0.5')
+        factor.save()
+        self.assertEqual(factors.current_factors().season_factors['major'], Decimal('0.5'))
+
+    def test_workers_without_the_bump_check_the_database(self):
+        # A worker with its own local-memory cache never sees another's bump
+        with self.settings(YIELD_FACTORS_CHECK_INTERVAL=0):
+            table = factors.current_factors()
+            with self.assertNumQueries(1):
+                self.assertIs(factors.current_factors(), table)
+            with mock.patch('yields.factors.bump_on_commit'), mock.patch('yields.signals.bump_on_commit'):
+                factor_set = factors.publish_factor_set(factors.settings_factor_table().as_dict())
+                self.assertEqual(factors.current_factors().version, 1)
+                factor = factor_set.factors.get(kind=FactorKind.SEASON, key='major')
+                factor.value = Decimal('0.5')
+                factor.save()
+                self.assertEqual(factors.current_factors().season_factors['major'], Decimal('0.5'))
+
+        with self.settings(YIELD_FACTORS_CHECK_INTERVAL=3600):
+            with mock.patch('yields.factors.bump_on_commit'), mock.patch('yields.signals.bump_on_commit'):
+                factors.current_factors()
+                factors.publish_factor_set(factors.settings_factor_table().as_dict())
+                self.assertEqual(factors.current_factors().version, 1)
+
+    def test_publish_command_merges_file_and_rolls_back(self):
+        changes = Path(tempfile.mkdtemp()) / "changes.json"
+        self.addCleanup(shutil.rmtree, changes.parent, ignore_errors=True)
+        changes.write_text(json.dumps({'base_yield': {'Maize': 4}, 'region': {'Cape Coast': 1.0}}))
+
+        call_command('publish_yield_factors', '--if-empty', stdout=mock.Mock())
+        call_command('publish_yield_factors', '--if-empty', stdout=mock.Mock())
+        call_command('publish_yield_factors', '--file', str(changes), stdout=mock.Mock())
+        table = factors.current_factors()
+        self.assertEqual(table.version, 2)
+        self.assertEqual((table.base_yields['maize'], table.region_multipliers['cape-coast']), (4, 1))
+        self.assertEqual(table.region_multipliers['kumasi'], Decimal('1.1'))
+
+        call_command('publish_yield_factors', '--activate', '1', stdout=mock.Mock())
+        self.assertEqual(factors.current_factors().base_yields['maize'], Decimal('2.5'))
+
+
+class YieldSweepTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Kumasi"], recommended_inputs={}, maturity_days=120,
+        )
+        self.rice = Crop.objects.create(
+            name="Rice", season=Season.MAJOR, soil_type="clay",
+            regions=["Tamale"], recommended_inputs={}, maturity_days=110,
+        )
+        self.url = reverse('yield-sweep')
+
+    def test_grid_matches_single_forecasts(self):
+        params = {
+            'crop': f'maize,{self.rice.id}', 'region': 'Kumasi,Cape Coast', 'season': 'major,minor',
+            'hectares_min': '1', 'hectares_max': '2.5', 'hectares_step': '0.75',
+        }
+        factors.current_factors()
+        # One query each for the crops and the regions
+        with self.assertNumQueries(2):
+            res = self.client.get(self.url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        data = res.data['data']
+        self.assertEqual(data['axes'], {
+            'crop': ['Maize', 'Rice'], 'region': ['Kumasi', 'Cape Coast'],
+            'season': ['major', 'minor'], 'hectares': ['1.00', '1.75', '2.50'],
+        })
+        self.assertEqual(data['shape'], [2, 2, 2, 3])
+        self.assertEqual(data['factors']['regional_multiplier'], [1.1, 0.8])
+
+        for c, crop in enumerate(data['axes']['crop']):
+            for r, region in enumerate(data['axes']['region']):
+                for s, season in enumerate(data['axes']['season']):
+                    for h, hectares in enumerate(data['axes']['hectares']):
+                        single = self.client.get(reverse('yield-forecast'), {
+                            'crop': crop, 'region': region, 'season': season, 'hectares': hectares, 'persist': 'false',
+                        }).data['data']
+                        self.assertEqual(
+                            Decimal(str(data['forecast_yield'][c][r][s][h])), Decimal(single['forecast_yield'])
+                        )
+        self.assertEqual(YieldForecast.objects.count(), 0)
+
+    def test_defaults_to_every_region_and_season(self):
+        data = self.client.get(self.url, {'crop': 'Maize', 'hectares_min': '2'}).data['data']
+        table = factors.current_factors()
+        self.assertEqual(data['axes']['region'], list(table.region_multipliers))
+        self.assertEqual(data['axes']['season'], [Season.MAJOR, Season.MINOR, Season.ALL])
+        self.assertEqual(data['shape'], [1, len(table.region_multipliers), 3, 1])
+
+    def test_factor_table_is_read_once(self):
+        table = factors.current_factors()
+        with mock.patch('yields.serializers.current_factors', return_value=table) as in_serializer, \
+                mock.patch('yields.views.current_factors', return_value=table) as in_view:
+            res = self.client.get(self.url, {'crop': 'Maize', 'region': 'Kumasi', 'season': 'major',
+                                             'hectares_min': '1'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual((in_view.call_count, in_serializer.call_count), (1, 0))
+
+    def test_validation(self):
+        for params in (
+            {'hectares_min': '1'},
+            {'crop': 'Maize,Unknown', 'hectares_min': '1'},
+            {'crop': 'Maize', 'region': 'Atlantis', 'hectares_min': '1'},
+            {'crop': 'Maize', 'season': 'dry', 'hectares_min': '1'},
+            {'crop': 'Maize', 'hectares_min': '2', 'hectares_max': '1'},
+            {'crop': 'Maize', 'hectares_min': '1', 'hectares_step': '0'},
+        ):
+            res = self.client.get(self.url, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, params)
+        with self.settings(YIELD_SWEEP_MAX_CELLS=10):
+            res = self.client.get(self.url, {'crop': 'Maize', 'region': 'Kumasi', 'hectares_min': '1',
+                                             'hectares_max': '4'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class YieldModelRegistryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Kumasi"], recommended_inputs={}, maturity_days=120,
+        )
+        self.model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_dir, ignore_errors=True)
+        self.query = {'crop': 'Maize', 'region': 'Kumasi', 'season': Season.MAJOR, 'hectares': '2.00',
+                      'method': YieldMethod.REGRESSION_V1}
+
+    def rate(self, model, crop='maize', region='kumasi', season=Season.MAJOR):
+        return model.predict_rates(
+            np.array([model.crop_index[crop]]), np.array([model.region_index[region]]),
+            np.array([model.season_index[season]]),
+        )[0]
+
+    def test_fit_reproduces_factors_and_follows_actuals(self):
+        model = regression.train(factors.current_factors())
+        self.assertAlmostEqual(self.rate(model), 2.5 * 1.1 * 1.0, places=3)
+        self.assertAlmostEqual(self.rate(model, 'rice', 'cape-coast', Season.MINOR), 4.2 * 0.8 * 0.85, places=3)
+
+        for _ in range(20):
+            YieldActual.objects.create(crop=self.maize, crop_name="Maize", region="Kumasi", season=Season.MAJOR,
+                                       hectares=Decimal("2.00"), actual_yield=Decimal("11.00"))
+        trained = regression.train(factors.current_factors())
+        self.assertEqual(trained.meta['actuals'], 20)
+        self.assertGreater(self.rate(trained), 4.5)
+        # Unrelated combinations only move through the shared season effect
+        self.assertLess(abs(self.rate(trained, 'rice', 'tamale') / self.rate(model, 'rice', 'tamale') - 1), 0.05)
+
+    def test_artifact_versions_round_trip(self):
+        model = regression.train(factors.current_factors())
+        self.assertEqual(regression.save_artifact(model, self.model_dir).name, 'regression-v1.npz')
+        self.assertEqual(regression.save_artifact(model, self.model_dir).name, 'regression-v2.npz')
+        loaded = regression.load_artifact(Path(self.model_dir))
+        self.assertEqual((loaded.version, loaded.crops), (2, model.crops))
+        np.testing.assert_allclose(loaded.crop_coef, model.crop_coef)
+        self.assertEqual(regression.load_artifact(Path(self.model_dir), version=1).version, 1)
+        self.assertIsNone(regression.load_artifact(Path(self.model_dir) / 'missing'))
+
+    def test_regression_method_through_endpoints(self):
+        with self.settings(YIELD_MODEL_DIR=self.model_dir):
+            res = self.client.get(reverse('yield-forecast'), self.query)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+            call_command('train_yield_model', stdout=mock.Mock())
+            get_engine(YieldMethod.REGRESSION_V1).load(reload=True)
+            single = self.client.get(reverse('yield-forecast'), self.query).data['data']
+            self.assertEqual(single['method'], YieldMethod.REGRESSION_V1)
+            self.assertEqual(single['factors']['model_version'], 1)
+            self.assertAlmostEqual(float(single['forecast_yield']), 5.5, places=1)
+
+            plots = [{k: v for k, v in self.query.items() if k != 'method'}]
+            batch = self.client.post(reverse('yield-forecast-batch'), {
+                'plots': plots, 'method': YieldMethod.REGRESSION_V1,
+            }, format='json').data['data']
+            self.assertEqual(batch['results'][0]['forecast_yield'], single['forecast_yield'])
+            self.assertEqual(batch['results'][0]['id'], single['id'])
+            mock_result = self.client.get(reverse('yield-forecast'), {**self.query, 'method': 'mock_v1'}).data['data']
+            self.assertNotEqual(mock_result['id'], single['id'])
+        self.assertEqual(
+            sorted(YieldForecast.objects.values_list('method', flat=True)),
+            [YieldMethod.MOCK_V1, YieldMethod.REGRESSION_V1],
+        )
+
+    def test_benchmark_runs_without_trained_model(self):
+        out = StringIO()
+        with self.settings(YIELD_MODEL_DIR=self.model_dir):
+            call_command('benchmark_yield_models', '--plots', '50', '--repeat', '1', stdout=out)
+        self.assertIn('mock_v1', out.getvalue())
+        self.assertIn('regression_v1', out.getvalue())
+
+
+class SupplyProjectionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.maize = Crop.objects.create(
+            name="Maize", season=Season.MAJOR, soil_type="loamy",
+            regions=["Kumasi"], recommended_inputs={}, maturity_days=120,
+        )
+        self.rice = Crop.objects.create(
+            name="Rice", season=Season.MAJOR, soil_type="clay",
+            regions=["Tamale"], recommended_inputs={}, maturity_days=110,
+        )
+        self.url = reverse('yield-supply')
+
+    def _forecast(self, crop, region, forecast_yield, day, hectares='1.00'):
+        forecast = YieldForecast.objects.create(
+            crop=crop, crop_name=crop.name if crop else 'Unknown', region=region, season=Season.MAJOR,
+            hectares=Decimal(hectares), forecast_yield=Decimal(forecast_yield),
+        )
+        YieldForecast.objects.filter(pk=forecast.pk).update(
+            created_at=timezone.make_aware(datetime.combine(day, time(12)))
+        )
+        return forecast
+
+    def test_forecasts_are_bucketed_by_harvest_week(self):
+        # 2026-01-07 + 120 days = 2026-05-07 (Thursday) -> week of 2026-05-04
+        self._forecast(self.maize, 'Kumasi', '10.00', date(2026, 1, 7), '2.00')
+        self._forecast(self.maize, 'kumasi ', '5.50', date(2026, 1, 9))
+        # 2026-01-07 + 110 days = 2026-04-27 (Monday)
+        self._forecast(self.rice, 'Tamale', '7.25', date(2026, 1, 7))
+        self._forecast(None, 'Tamale', '3.00', date(2026, 1, 7))
+
+        self.assertEqual(supply.refresh_supply_projection(), (4, False))
+        rows = {
+            (p.region, p.crop_id, p.harvest_week): (p.expected_yield, p.hectares, p.forecasts)
+            for p in SupplyProjection.objects.all()
+        }
+        self.assertEqual(rows, {
+            ('kumasi', self.maize.id, date(2026, 5, 4)): (Decimal('15.50'), Decimal('3.00'), 2),
+            ('tamale', self.rice.id, date(2026, 4, 27)): (Decimal('7.25'), Decimal('1.00'), 1),
+        })
+        self.assertFalse(YieldForecast.objects.filter(supply_projected=False).exists())
+
+    def test_repeat_queries_count_once(self):
+        query = {'crop': 'Maize', 'region': 'Kumasi', 'season': Season.MAJOR, 'hectares': '2.00'}
+        first = self.client.get(reverse('yield-forecast'), query).data['data']
+        supply.refresh_supply_projection()
+        # A repeat reads the stored forecast and writes nothing
+        with CaptureQueriesContext(connection) as queries:
+            again = self.client.get(reverse('yield-forecast'), query).data['data']
+        self.assertFalse([q['sql'] for q in queries if not q['sql'].startswith('SELECT')])
+        self.assertEqual(again['id'], first['id'])
+        self.assertEqual(supply.refresh_supply_projection(), (0, False))
+        bucket = SupplyProjection.objects.get()
+        self.assertEqual((bucket.expected_yield, bucket.forecasts), (Decimal(first['forecast_yield']), 1))
+
+    def test_refresh_is_incremental(self):
+        self._forecast(self.maize, 'Kumasi', '10.00', date(2026, 1, 7))
+        self._forecast(self.maize, 'Kumasi', '4.00', date(2026, 1, 8))
+        self._forecast(self.maize, 'Kumasi', '1.00', date(2026, 1, 8))
+        self.assertEqual(supply.refresh_supply_projection(max_batches=1, batch_size=2), (2, True))
+        self.assertEqual(supply.refresh_supply_projection(batch_size=2), (1, False))
+        self.assertEqual(supply.refresh_supply_projection(), (0, False))
+
+        self._forecast(self.maize, 'Kumasi', '2.00', date(2026, 1, 9))
+        supply.refresh_supply_projection()
+        bucket = SupplyProjection.objects.get()
+        self.assertEqual((bucket.expected_yield, bucket.forecasts), (Decimal('17.00'), 4))
+
+    def test_conflicting_refresh_is_retried_without_double_counting(self):
+        self._forecast(self.maize, 'Kumasi', '10.00', date(2026, 1, 7))
+        self._forecast(self.maize, 'Kumasi', '4.00', date(2026, 1, 8))
+        real_update = QuerySet.update
+        raced = []
+
+        def racing_update(queryset, **kwargs):
+            if queryset.model is YieldForecast and not raced:
+                # Another refresh marks the batch between our select and update
+                raced.append(real_update(YieldForecast.objects.all(), supply_projected=True))
+            return real_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            self.assertEqual(supply.refresh_supply_projection(), (2, False))
+        self.assertEqual(raced, [2])
+        bucket = SupplyProjection.objects.get()
+        self.assertEqual((bucket.expected_yield, bucket.forecasts), (Decimal('14.00'), 2))
+
+        self._forecast(self.maize, 'Kumasi', '1.00', date(2026, 1, 9))
+        real_add = supply._add_to_buckets
+
+        def add_after_losing_a_race(deltas):
+            if add.call_count == 1:
+                # Another refresh created the same bucket first
+                raise IntegrityError
+            real_add(deltas)
+
+        with mock.patch.object(supply, '_add_to_buckets', side_effect=add_after_losing_a_race) as add:
+            self.assertEqual(supply.refresh_supply_projection(), (1, False))
+        self.assertEqual(add.call_count, 2)
+        bucket.refresh_from_db()
+        self.assertEqual((bucket.expected_yield, bucket.forecasts), (Decimal('15.00'), 3))
+
+    def test_rebuild_follows_maturity_changes(self):
+        self._forecast(self.maize, 'Kumasi', '10.00', date(2026, 1, 7))
+        supply.refresh_supply_projection()
+        Crop.objects.filter(pk=self.maize.pk).update(maturity_days=90)
+        out = StringIO()
+        call_command('refresh_supply_projection', '--rebuild', stdout=out)
+        self.assertIn('1 forecasts', out.getvalue())
+        # 2026-01-07 + 90 days = 2026-04-07 -> week of 2026-04-06
+        self.assertEqual(
+            list(SupplyProjection.objects.values_list('harvest_week', 'expected_yield')),
+            [(date(2026, 4, 6), Decimal('10.00'))],
+        )
+
+    def test_endpoint_filters_range_and_refreshes_pending(self):
+        self._forecast(self.maize, 'Kumasi', '10.00', date(2026, 1, 7))
+        self._forecast(self.rice, 'Tamale', '7.25', date(2026, 1, 7))
+        self._forecast(self.maize, 'Tamale', '3.00', date(2026, 3, 2))
+
+        res = self.client.get(self.url, {'week_from': '2026-04-01', 'week_to': '2026-05-31'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        data = res.data['data']
+        self.assertTrue(data['complete'])
+        # Widened to whole weeks
+        self.assertEqual((data['week_from'], data['week_to']), ('2026-03-30', '2026-05-25'))
+        self.assertEqual(data['results'], [
+            {'region': 'tamale', 'crop': 'Rice', 'harvest_week': '2026-04-27',
+             'expected_yield': 7.25, 'hectares': 1.0, 'forecasts': 1},
+            {'region': 'kumasi', 'crop': 'Maize', 'harvest_week': '2026-05-04',
+             'expected_yield': 10.0, 'hectares': 1.0, 'forecasts': 1},
+        ])
+
+        res = self.client.get(self.url, {
+            'region': 'Tamale', 'crop': 'maize', 'week_from': '2026-01-01', 'week_to': '2026-12-31',
+        })
+        self.assertEqual(
+            [(r['region'], r['crop'], r['harvest_week']) for r in res.data['data']['results']],
+            [('tamale', 'Maize', '2026-06-29')],
+        )
+
+        res = self.client.get(self.url, {'week_from': '2026-05-01', 'week_to': '2026-04-01'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.get(self.url, {'crop': 'Cassava'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
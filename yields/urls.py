@@ -1,6 +1,9 @@
 from django.urls import path
-from .views import YieldForecastView
+from .views import YieldForecastBatchView, YieldForecastView, YieldSupplyView, YieldSweepView
 
 urlpatterns = [
     path('forecast/', YieldForecastView.as_view(), name='yield-forecast'),
+    path('forecast/batch/', YieldForecastBatchView.as_view(), name='yield-forecast-batch'),
+    path('sweep/', YieldSweepView.as_view(), name='yield-sweep'),
+    path('supply/', YieldSupplyView.as_view(), name='yield-supply'),
 ]
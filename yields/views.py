@@ -1,14 +1,25 @@
 from decimal import Decimal, InvalidOperation
 from django.conf import settings
 from django.http import JsonResponse
+from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from rest_framework import status
 import logging
 
 from core.exceptions import APIResponse
-from .serializers import YieldForecastQuerySerializer, YieldForecastResponseSerializer
-from .models import YieldForecast, YieldMethod
+from crops.models import Season
+from .serializers import (
+    YieldForecastBatchSerializer, YieldForecastQuerySerializer, YieldForecastResponseSerializer,
+    YieldSupplyQuerySerializer, YieldSweepQuerySerializer,
+)
+from .factors import current_factors, region_factor_key
+from .engines import get_engine
+from .forecast import forecast_input_hash, forecast_plots
+from .persistence import persist_forecasts
+from .supply import refresh_supply_projection
+from .sweep import hectare_steps, sweep_grid
+from .models import SupplyProjection, YieldForecast, YieldMethod
 
 logger = logging.getLogger(__name__)
 
@@ -31,38 +42,22 @@ class YieldForecastView(APIView):
             season = serializer.validated_data['season']
             hectares = serializer.validated_data['hectares']
 
-            # Deterministic factors with error handling
-            base_map = getattr(settings, 'YIELD_BASE_YIELDS', {})
-            region_map = getattr(settings, 'YIELD_REGION_MULTIPLIERS', {})
-            season_map = getattr(settings, 'YIELD_SEASON_FACTORS', {})
-
+            method = serializer.validated_data['method']
+            engine = get_engine(method)
             crop_key = crop_obj.name.lower()
-            region_key = region.lower()
-            
-            if crop_key not in base_map:
-                return APIResponse.error(
-                    message=f"Yield data not available for crop: {crop_obj.name}",
-                    status_code=status.HTTP_404_NOT_FOUND
-                )
-            
-            if region_key not in region_map:
-                return APIResponse.error(
-                    message=f"Yield data not available for region: {region}",
-                    status_code=status.HTTP_404_NOT_FOUND
-                )
-            
-            if season not in season_map:
+            region_key = region_factor_key(region)
+
+            unsupported = engine.unsupported(crop_key, region_key, season)
+            if unsupported:
+                field = next(iter(unsupported))
+                value = {'crop': crop_obj.name, 'region': region, 'season': season}.get(field, method)
                 return APIResponse.error(
-                    message=f"Yield data not available for season: {season}",
+                    message=f"Yield data not available for {field}: {value}",
                     status_code=status.HTTP_404_NOT_FOUND
                 )
 
             try:
-                base = Decimal(str(base_map[crop_key]))
-                regional_multiplier = Decimal(str(region_map[region_key]))
-                season_factor = Decimal(str(season_map[season]))
-                
-                forecast = (base * regional_multiplier * season_factor * hectares).quantize(Decimal('0.01'))
+                [forecast], [factors] = engine.forecast([crop_key], [region_key], [season], [hectares])
             except (InvalidOperation, ValueError) as e:
                 logger.error(f"Calculation error in yield forecast: {e}")
                 return APIResponse.error(
@@ -70,15 +65,11 @@ class YieldForecastView(APIView):
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
 
-            factors = {
-                'base_yield_t_per_ha': float(base),
-                'regional_multiplier': float(regional_multiplier),
-                'season_factor': float(season_factor),
-            }
-
-            # Persist forecast
+            # Identical queries share one stored forecast; only new ones are written
+            input_hash = forecast_input_hash(method, crop_obj.id, region_key, season, hectares, factors)
+            stored = None
             try:
-                yf = YieldForecast.objects.create(
+                stored = persist_forecasts([YieldForecast(
                     crop=crop_obj,
                     crop_name=crop_obj.name,
                     region=region,
@@ -86,22 +77,24 @@ class YieldForecastView(APIView):
                     hectares=hectares,
                     forecast_yield=forecast,
                     factors=factors,
-                    method=YieldMethod.MOCK_V1,
-                )
+                    method=method,
+                    input_hash=input_hash,
+                )], persist=serializer.validated_data['persist']).get(input_hash)
             except Exception as e:
                 logger.error(f"Error saving yield forecast: {e}")
                 # Continue without saving if there's a DB error
 
             response_data = {
-                'id': yf.id if 'yf' in locals() else None,
+                'id': stored['id'] if stored else None,
                 'crop': crop_obj.name,
                 'region': region,
                 'season': season,
                 'hectares': str(hectares),
                 'forecast_yield': str(forecast),
                 'factors': factors,
+                'method': method,
                 'confidence': 'high',  # Mock confidence level
-                'generated_at': yf.created_at.isoformat() if 'yf' in locals() else None
+                'generated_at': (stored and stored['created_at']) or timezone.now().isoformat()
             }
             
             return APIResponse.success(
@@ -115,3 +108,234 @@ class YieldForecastView(APIView):
                 message="An unexpected error occurred while generating forecast",
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class YieldForecastBatchView(APIView):
+    """
+    Forecast many plots in one request.
+
+    POST ``{"plots": [{"crop": ..., "region": ..., "season": ..., "hectares": ...}, ...]}``.
+    Crops are resolved with one query, forecasts are computed in one pass and
+    the ones not stored yet are saved with one ``bulk_create``. Plots that
+    cannot be forecast are listed under ``errors`` by position; the rest are
+    still returned. ``"persist": false`` computes without saving.
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        try:
+            serializer = YieldForecastBatchSerializer(data=request.data)
+            if not serializer.is_valid():
+                return APIResponse.error(
+                    message="Invalid parameters provided",
+                    details=serializer.errors,
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+            plots = serializer.validated_data['plots']
+
+            max_plots = getattr(settings, 'YIELD_FORECAST_BATCH_MAX_PLOTS', 500)
+            if len(plots) > max_plots:
+                return APIResponse.error(
+                    message=f"Too many plots requested ({len(plots)}); the limit is {max_plots}",
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+
+            method = serializer.validated_data['method']
+            forecasts, errors = forecast_plots(plots, get_engine(method))
+            if not forecasts:
+                return APIResponse.error(
+                    message="None of the plots can be forecast",
+                    details={'plots': errors},
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+
+            # Identical plots share one stored forecast; only new ones are written
+            stored = {}
+            try:
+                stored = persist_forecasts([
+                    YieldForecast(
+                        crop=f['crop'],
+                        crop_name=f['crop'].name,
+                        region=f['region'],
+                        season=f['season'],
+                        hectares=f['hectares'],
+                        forecast_yield=f['forecast_yield'],
+                        factors=f['factors'],
+                        method=method,
+                        input_hash=f['input_hash'],
+                    )
+                    for f in forecasts
+                ], persist=serializer.validated_data['persist'])
+            except Exception as e:
+                logger.error(f"Error saving batch yield forecasts: {e}")
+                # Continue without saving if there's a DB error
+
+            generated_at = timezone.now().isoformat()
+            results = []
+            for f in forecasts:
+                entry = stored.get(f['input_hash'])
+                results.append({
+                    'index': f['index'],
+                    'id': entry['id'] if entry else None,
+                    'crop': f['crop'].name,
+                    'region': f['region'],
+                    'season': f['season'],
+                    'hectares': str(f['hectares']),
+                    'forecast_yield': str(f['forecast_yield']),
+                    'factors': f['factors'],
+                    'method': method,
+                    'confidence': 'high',  # Mock confidence level
+                    'generated_at': (entry and entry['created_at']) or generated_at
+                })
+
+            return APIResponse.success(
+                data={
+                    'count': len(results),
+                    'total_forecast_yield': str(sum((f['forecast_yield'] for f in forecasts), Decimal('0.00'))),
+                    'results': results,
+                    'errors': errors,
+                },
+                message="Yield forecasts generated successfully"
+            )
+
+        except Exception as e:
+            logger.error(f"Unexpected error in batch yield forecast: {e}")
+            return APIResponse.error(
+                message="An unexpected error occurred while generating forecasts",
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class YieldSweepView(APIView):
+    """
+    Forecasts for every combination of crops, regions, seasons and a range
+    of hectares, computed as one NumPy outer product and returned as a
+    matrix with its axis labels. Nothing is saved.
+
+    GET ``?crop=maize,rice&region=Kumasi,Tamale&season=major&hectares_min=1&hectares_max=10&hectares_step=0.5``.
+    ``forecast_yield[c][r][s][h]`` is the forecast for ``axes.crop[c]``,
+    ``axes.region[r]``, ``axes.season[s]`` and ``axes.hectares[h]``.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            # Validated and computed with the same table, even if another
+            # factor set is activated meanwhile
+            table = current_factors()
+            serializer = YieldSweepQuerySerializer(data=request.query_params, context={'factors': table})
+            if not serializer.is_valid():
+                return APIResponse.error(
+                    message="Invalid parameters provided",
+                    details=serializer.errors,
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+            data = serializer.validated_data
+
+            crops = data['crop']
+            regions = data.get('region') or [(key, key) for key in table.region_multipliers]
+            seasons = data.get('season') or [s for s in Season.values if s in table.season_factors]
+            step = data['hectares_step']
+            cells = len(crops) * len(regions) * len(seasons) * (
+                int((data['hectares_max'] - data['hectares_min']) // step) + 1
+            )
+            max_cells = getattr(settings, 'YIELD_SWEEP_MAX_CELLS', 100000)
+            if cells > max_cells:
+                return APIResponse.error(
+                    message=f"Sweep too large ({cells} forecasts); the limit is {max_cells}",
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+            hectares = hectare_steps(data['hectares_min'], data['hectares_max'], step)
+
+            crop_keys = [crop.name.lower() for crop in crops]
+            region_keys = [key for _, key in regions]
+            grid = sweep_grid(table, crop_keys, region_keys, seasons, hectares)
+
+            return APIResponse.success(
+                data={
+                    'method': YieldMethod.MOCK_V1,
+                    'factors_version': table.version,
+                    'axes': {
+                        'crop': [crop.name for crop in crops],
+                        'region': [name for name, _ in regions],
+                        'season': seasons,
+                        'hectares': [str(h) for h in hectares],
+                    },
+                    'shape': list(grid.shape),
+                    'factors': {
+                        'base_yield_t_per_ha': [table.base_yield_floats[k] for k in crop_keys],
+                        'regional_multiplier': [table.region_multiplier_floats[k] for k in region_keys],
+                        'season_factor': [table.season_factor_floats[s] for s in seasons],
+                    },
+                    'forecast_yield': grid.tolist(),
+                },
+                message="Yield sweep generated successfully"
+            )
+
+        except Exception as e:
+            logger.error(f"Unexpected error in yield sweep: {e}")
+            return APIResponse.error(
+                message="An unexpected error occurred while generating the sweep",
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class YieldSupplyView(APIView):
+    """
+    Expected harvest per region, crop and week, from the stored forecasts
+    (see :mod:`yields.supply`).
+
+    GET ``?region=Kumasi,Tamale&crop=maize&week_from=2026-01-05&week_to=2026-03-30``.
+    Pending forecasts are projected first, at most ``YIELD_SUPPLY_REFRESH_BATCH``
+    of them; ``complete`` is false while more are still waiting.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            serializer = YieldSupplyQuerySerializer(data=request.query_params)
+            if not serializer.is_valid():
+                return APIResponse.error(
+                    message="Invalid parameters provided",
+                    details=serializer.errors,
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+            data = serializer.validated_data
+
+            _, pending = refresh_supply_projection(max_batches=1)
+
+            rows = SupplyProjection.objects.filter(harvest_week__range=(data['week_from'], data['week_to']))
+            if data.get('region'):
+                rows = rows.filter(region__in=data['region'])
+            if data.get('crop'):
+                rows = rows.filter(crop_id__in=data['crop'])
+            rows = rows.values_list('region', 'crop__name', 'harvest_week', 'expected_yield', 'hectares', 'forecasts')
+
+            results = [
+                {
+                    'region': region,
+                    'crop': crop,
+                    'harvest_week': harvest_week.isoformat(),
+                    'expected_yield': float(expected_yield),
+                    'hectares': float(hectares),
+                    'forecasts': forecasts,
+                }
+                for region, crop, harvest_week, expected_yield, hectares, forecasts in rows
+            ]
+            return APIResponse.success(
+                data={
+                    'week_from': data['week_from'].isoformat(),
+                    'week_to': data['week_to'].isoformat(),
+                    'complete': not pending,
+                    'count': len(results),
+                    'results': results,
+                },
+                message="Supply projection retrieved successfully"
+            )
+
+        except Exception as e:
+            logger.error(f"Unexpected error in yield supply projection: {e}")
+            return APIResponse.error(
+                message="An unexpected error occurred while retrieving the supply projection",
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )